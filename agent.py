@@ -15,6 +15,7 @@ from livekit.agents import Agent, AgentSession, JobContext, JobProcess, WorkerOp
 from livekit.plugins import bey, cartesia, deepgram, openai, silero
 
 from app.config import get_settings
+from app.data.questions import session_questions
 
 # LiveKit SDK reads LIVEKIT_URL, LIVEKIT_API_KEY, LIVEKIT_API_SECRET
 # directly from os.environ — load_dotenv() is required here
@@ -46,6 +47,15 @@ BEY_AVATAR_FEMALE_MODELS = [
 ]
 
 
+# Formules demandées à l'API avec le seul format de référence (30 ml) : le
+# détail des notes est conservé, les blocs 10 / 50 ml ne transitent ni par le
+# LLM ni par le data channel.
+FORMULA_SIZES = {"sizes": "30ml"}
+
+# Remplaçants proposés au LLM : les mieux notés pour la session, sans description
+AVAILABLE_INGREDIENTS_PAGE = {"limit": 5, "compact": "true"}
+
+
 def pick_avatar(gender: str) -> str:
     models = BEY_AVATAR_FEMALE_MODELS if gender == "female" else BEY_AVATAR_MALE_MODELS
     if not models:
@@ -463,11 +473,15 @@ async def entrypoint(ctx: JobContext):
     logger.info(f"[SESSION_ID] session_id={session_id}")
 
     http = httpx.AsyncClient(base_url=settings.backend_url, timeout=30.0)
-    logger.info(f"[HTTP] Récupération session depuis {settings.backend_url}/api/session/{session_id}")
+    logger.info(f"[HTTP] Récupération session depuis {settings.backend_url}/api/session/{session_id}/snapshot")
 
     for attempt in range(5):
         try:
-            resp = await http.get(f"/api/session/{session_id}")
+            # Une seule lecture de la session ; jeu de questions développé localement depuis sa clé (question_set)
+            resp = await http.get(
+                f"/api/session/{session_id}/snapshot",
+                params={"fields": "meta,state", "questions": "false"},
+            )
             logger.info(f"[HTTP] Tentative {attempt + 1}/5 — status={resp.status_code}")
             if resp.status_code == 200:
                 break
@@ -480,10 +494,12 @@ async def entrypoint(ctx: JobContext):
         await http.aclose()
         return
 
-    config = resp.json()
-    logger.info(f"[SESSION] Config reçue — language={config.get('language')} mode={config.get('mode')} input_mode={config.get('input_mode')} questions={len(config.get('questions', []))}")
+    snapshot = resp.json()
+    config = snapshot["meta"]
+    config["questions"] = session_questions(config)
+    logger.info(f"[SESSION] Config reçue — language={config.get('language')} mode={config.get('mode')} input_mode={config.get('input_mode')} questions={len(config.get('questions', []))} state={snapshot['state']['state']}")
 
-    if "language" not in config or "questions" not in config:
+    if "language" not in config or not config["questions"]:
         logger.error(f"[SESSION] ❌ Données incomplètes — clés reçues: {list(config.keys())}")
         await http.aclose()
         return
@@ -759,6 +775,7 @@ async def entrypoint(ctx: JobContext):
             "question_id": question_id,
             "top_2": top_2,
             "bottom_2": bottom_2,
+            "preview": resp.json().get("preview"),
         })
 
         # Avancer à la question suivante ou à la phase intensité
@@ -778,6 +795,7 @@ async def entrypoint(ctx: JobContext):
         resp = await http.post(
             f"/api/session/{session_id}/generate-formulas",
             json={"formula_type": formula_type},
+            params=FORMULA_SIZES,
         )
         if resp.status_code != 200:
             detail = resp.json().get("detail", "Unable to generate formulas" if is_en else "Impossible de générer les formules")
@@ -799,6 +817,7 @@ async def entrypoint(ctx: JobContext):
         resp = await http.post(
             f"/api/session/{session_id}/select-formula",
             json={"formula_index": formula_index},
+            params=FORMULA_SIZES,
         )
         if resp.status_code != 200:
             detail = resp.json().get("detail", "Error" if is_en else "Erreur")
@@ -813,9 +832,12 @@ async def entrypoint(ctx: JobContext):
         return await advance_to(AgentPhase.CUSTOMIZATION)
 
     @function_tool()
-    async def get_available_ingredients(note_type: str):
-        """Returns available ingredients for a note type (top, heart, base), filtered by user allergies. Call BEFORE suggesting replacements. / Retourne les ingrédients disponibles filtrés par allergies. Appeler AVANT de proposer des remplacements."""
-        resp = await http.get(f"/api/session/{session_id}/available-ingredients/{note_type}")
+    async def get_available_ingredients(note_type: str, cursor: str | None = None):
+        """Returns the best-scoring replacement ingredients for a note type (top, heart, base), filtered by user allergies. Call BEFORE suggesting replacements; pass next_cursor to get more. / Retourne les meilleurs ingrédients de remplacement filtrés par allergies. Appeler AVANT de proposer des remplacements ; passer next_cursor pour en avoir d'autres."""
+        resp = await http.get(
+            f"/api/session/{session_id}/available-ingredients/{note_type}",
+            params={**AVAILABLE_INGREDIENTS_PAGE, **({"cursor": cursor} if cursor else {})},
+        )
         if resp.status_code != 200:
             detail = resp.json().get("detail", "Error" if is_en else "Erreur")
             return f"Error: {detail}" if is_en else f"Erreur: {detail}"
@@ -828,6 +850,7 @@ async def entrypoint(ctx: JobContext):
         resp = await http.post(
             f"/api/session/{session_id}/replace-note",
             json={"note_type": note_type, "old_note": old_note, "new_note": new_note},
+            params=FORMULA_SIZES,
         )
         if resp.status_code != 200:
             detail = resp.json().get("detail", "Error" if is_en else "Erreur")
@@ -849,6 +872,7 @@ async def entrypoint(ctx: JobContext):
         resp = await http.post(
             f"/api/session/{session_id}/change-formula-type",
             json={"formula_type": formula_type},
+            params=FORMULA_SIZES,
         )
         if resp.status_code != 200:
             detail = resp.json().get("detail", "Error" if is_en else "Erreur")
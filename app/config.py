@@ -47,6 +47,30 @@ class Settings(BaseSettings):
     # PrintNode
     printnode_api_key: str = ""
 
+    # Catalogue coffret : intervalle de surveillance du XLSX et du mapping (0 = désactivé)
+    catalog_watch_interval: int = 30
+
+    # Pool d'exécution des traitements CPU (formules, PDF) : thread | process | inline
+    worker_pool_kind: str = "thread"
+    worker_pool_size: int = 0  # 0 = un worker par CPU, 4 au plus
+    worker_queue_size: int = 64
+
+    # Session store : memory (process local) | redis (partagé entre workers et répliques)
+    session_store_backend: str = "memory"
+    redis_url: str = "redis://localhost:6379/0"
+    session_ttl: int = 3600  # secondes d'inactivité avant expiration (0 = jamais, memory)
+    session_max_count: int = 2000  # sessions en mémoire au plus, LRU évincée au-delà (0 = pas de plafond)
+    session_sweep_interval: int = 60  # secondes entre deux passes d'expiration
+    session_evict_delete_room: bool = False  # supprime la room LiveKit d'une session évincée
+    # Journal local du backend memory : sessions rechargées au redémarrage ("" = désactivé)
+    session_journal_dir: str = ""
+    session_journal_fsync_interval: float = 0.2  # secondes entre deux fsync (fenêtre de perte en cas de crash)
+    session_journal_compact_bytes: int = 4_000_000  # taille du segment au-delà de laquelle un instantané est écrit
+    # Événements de session poussés en SSE (GET /api/session/{id}/events)
+    session_events_history: int = 256  # derniers événements gardés par session pour la reprise (Last-Event-ID)
+    session_events_queue_size: int = 64  # événements en attente par abonné avant rattrapage depuis l'historique
+    session_events_heartbeat: int = 15  # secondes sans événement avant un commentaire keepalive
+
     @property
     def voice_mapping(self) -> dict[str, dict[str, str]]:
         return {
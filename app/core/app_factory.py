@@ -2,13 +2,16 @@ import asyncio
 from contextlib import asynccontextmanager
 from pathlib import Path
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy import text
 
+from app.config import get_settings
 from app.database.connection import engine
-from app.routers import mail, sessions, customers, teams, lookup, ping, printers
+from app.routers import mail, sessions, customers, teams, lookup, ping, printers, diagnostics
+from app.services import catalog_service, session_service, session_store, worker_pool
 
 _STATIC_DIR = Path(__file__).resolve().parent.parent / "static"
 _DB_KEEPALIVE_INTERVAL = 3600  # 1 heure
@@ -24,15 +27,62 @@ async def _db_keepalive():
             print(f"[keepalive] DB ping failed: {e}")
 
 
+async def _watch_catalog(interval: int):
+    """Recharge le catalogue quand le XLSX ou le mapping de scoring change sur disque."""
+    while True:
+        await asyncio.sleep(interval)
+        if not catalog_service.sources_changed():
+            continue
+        try:
+            info = await asyncio.to_thread(catalog_service.reload_catalog)
+            print(f"[catalog] rechargé : {info['previous_version']} → {info['version']}")
+        except Exception as e:
+            print(f"[catalog] rechargement échoué, version précédente conservée : {e}")
+
+
+async def _sweep_sessions(interval: int):
+    """Évince périodiquement les sessions inactives (voir session_store)."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            evicted = await session_store.run(session_store.sweep)
+            if evicted:
+                print(f"[sessions] {len(evicted)} session(s) expirée(s)")
+        except Exception as e:
+            print(f"[sessions] expiration échouée : {e}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    task = asyncio.create_task(_db_keepalive())
+    catalog_service.load_catalog()
+    # Backend de la configuration, sauf s'il a déjà été installé (benchmarks)
+    session_store.get_backend()
+    # Après le catalogue : les formules du journal sont relues avec son index
+    session_store.recover()
+    settings = get_settings()
+    if settings.session_evict_delete_room:
+        session_service.delete_rooms_on_eviction(asyncio.get_running_loop())
+    worker_pool.start()
+    tasks = [asyncio.create_task(_db_keepalive())]
+    watch_interval = settings.catalog_watch_interval
+    if watch_interval > 0:
+        tasks.append(asyncio.create_task(_watch_catalog(watch_interval)))
+    if settings.session_sweep_interval > 0:
+        tasks.append(asyncio.create_task(_sweep_sessions(settings.session_sweep_interval)))
     yield
-    task.cancel()
+    for task in tasks:
+        task.cancel()
+    worker_pool.shutdown()
+    session_store.close()
+
+
+async def _worker_pool_saturated(request: Request, exc: worker_pool.WorkerPoolSaturated) -> JSONResponse:
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
 
 
 def create_app() -> FastAPI:
     app = FastAPI(title="Lilo Backend", lifespan=lifespan)
+    app.add_exception_handler(worker_pool.WorkerPoolSaturated, _worker_pool_saturated)
 
     app.add_middleware(
         CORSMiddleware,
@@ -49,6 +99,7 @@ def create_app() -> FastAPI:
     app.include_router(lookup.router)
     app.include_router(ping.router)
     app.include_router(printers.router)
+    app.include_router(diagnostics.router)
     app.mount("/static", StaticFiles(directory=_STATIC_DIR), name="static")
 
     return app
@@ -0,0 +1,23 @@
+# Alias des allergènes réglementaires (onglet ALLERGENS du coffret).
+# Clé : nom canonique tel qu'il apparaît dans le XLSX.
+# Valeurs : orthographes alternatives (français, variantes courantes).
+# La comparaison est insensible à la casse, aux accents et à la ponctuation.
+
+ALLERGEN_ALIASES = {
+    "Alpha-isomethyl ionone": ["alpha-isométhyl ionone", "isomethyl ionone", "ionone"],
+    "Amyl cinnamal": ["amylcinnamal", "aldéhyde amylcinnamique"],
+    "Amylcinnamyl alcohol": ["amyl cinnamyl alcohol", "alcool amylcinnamique", "alcool amylcinnamylique"],
+    "Anise alcohol": ["anisyl alcohol", "alcool anisique", "alcool anisylique"],
+    "Benzyl salicylate": ["salicylate de benzyle"],
+    "Cinnamyl alcohol": ["alcool cinnamique", "alcool cinnamylique"],
+    "Citral": [],
+    "Citronellol": [],
+    "Coumarin": ["coumarine"],
+    "Eugenol": ["eugénol"],
+    "Evernia prunastri (Oak moss)": ["evernia prunastri", "oak moss", "oakmoss", "mousse de chêne"],
+    "Farnesol": ["farnésol"],
+    "Geraniol": ["géraniol"],
+    "Isoeugenol": ["isoeugénol"],
+    "Limonene": ["limonène", "d-limonene"],
+    "Linalool": ["linalol"],
+}
@@ -0,0 +1,26 @@
+# Boosters du coffret et mots-clés associés.
+# Le booster d'une formule est celui dont le plus de mots-clés apparaissent
+# dans le nom, la famille ou la description des notes sélectionnées.
+# Les mots-clés sont en minuscules et sans espace.
+
+BOOSTERS = [
+    {
+        "name": "Floral",
+        "keywords": ["fleur", "rose", "jasmin", "muguet", "floral", "flower",
+                      "pétale", "bouquet", "pivoine", "iris", "ylang",
+                      "néroli", "magnolia", "tubéreuse", "gardénia"],
+    },
+    {
+        "name": "Ambre doux",
+        "keywords": ["ambre", "vanille", "oriental", "chaud", "doux", "warm",
+                      "amber", "gourmand", "caramel", "miel", "tonka",
+                      "baume", "résine", "encens", "oud", "boisé"],
+    },
+    {
+        "name": "Musc blanc sec",
+        "keywords": ["musc", "propre", "frais", "clean", "musk", "coton",
+                      "savon", "linge", "poudré", "aldéhyde", "blanc",
+                      "minéral", "ozonic", "aquatique", "agrume",
+                      "bergamote", "citron", "pamplemousse"],
+    },
+]
@@ -174,3 +174,42 @@ QUESTIONS_FR = [
         "choices": ["Comprendre", "Reconnaitre", "Immaginer", "s'évader", "s'intérroger", "s'émmerveiller"],
     },
 ]
+
+
+# ── Jeux de questions partagés ────────────────────────────────────────
+#
+# 2 langues × 12 tailles : chaque jeu est enrichi une fois, à l'import, et
+# référencé par sa clé ("fr:12") dans les métadonnées de session (question_set).
+# Les jeux d'une langue sont des tranches de la même liste : les questions
+# elles-mêmes ne sont présentes qu'une fois. Partagés : ne pas les modifier.
+
+def question_set_key(language: str, count: int) -> str:
+    pool = QUESTIONS_FR if language == "fr" else QUESTIONS_EN
+    return f"{'fr' if language == 'fr' else 'en'}:{min(count, len(pool))}"
+
+
+def _build_question_sets() -> dict[str, list]:
+    sets = {}
+    for language, pool in (("fr", QUESTIONS_FR), ("en", QUESTIONS_EN)):
+        enriched = _enrich_questions(pool)
+        for count in range(1, len(enriched) + 1):
+            sets[question_set_key(language, count)] = enriched[:count]
+    return sets
+
+
+QUESTION_SETS: dict[str, list] = _build_question_sets()
+
+
+def session_questions(meta: dict) -> list:
+    """Questions d'une session : jeu référencé par question_set, ou liste
+    complète stockée telle quelle (sessions créées avant les jeux partagés)."""
+    if "questions" in meta:
+        return meta["questions"]
+    return QUESTION_SETS.get(meta.get("question_set"), [])
+
+
+def with_questions(meta: dict) -> dict:
+    """Métadonnées (ou réponses) d'une session avec la liste des questions développée."""
+    if "questions" in meta:
+        return meta
+    return {**meta, "questions": session_questions(meta)}
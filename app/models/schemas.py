@@ -2,6 +2,8 @@ from typing import Any, Literal
 
 from pydantic import BaseModel, Field
 
+from app.services.formula_search import DEFAULT_FORMULA_COUNT, MAX_FORMULA_COUNT, DiversityOptions
+
 
 class StartSessionRequest(BaseModel):
     language: Literal["fr", "en"] = "fr"
@@ -33,12 +35,23 @@ class SaveProfileRequest(BaseModel):
     value: str
 
 
-class GenerateFormulasRequest(BaseModel):
+class FormulaDiversityFields(BaseModel):
+    """Nombre de formules proposées et contraintes de diversité entre elles."""
+    count: int = Field(default=DEFAULT_FORMULA_COUNT, ge=1, le=MAX_FORMULA_COUNT)
+    # Notes communes permises entre deux formules (0 : aucune)
+    max_overlap: int = Field(default=0, ge=0, le=8)
+    distinct_profiles: bool = True
+
+    def diversity(self) -> DiversityOptions:
+        return DiversityOptions(self.count, self.max_overlap, self.distinct_profiles)
+
+
+class GenerateFormulasRequest(FormulaDiversityFields):
     formula_type: Literal["frais", "mix", "puissant"] | None = None
 
 
 class SelectFormulaRequest(BaseModel):
-    formula_index: int  # 0 ou 1
+    formula_index: int  # rang dans les formules générées (0 = la meilleure)
 
 
 class ChangeFormulaTypeRequest(BaseModel):
@@ -62,7 +75,7 @@ class BatchAnswerItem(BaseModel):
     bottom_2: list[str]
 
 
-class BatchGenerateRequest(BaseModel):
+class BatchGenerateRequest(FormulaDiversityFields):
     language: Literal["fr", "en"] = "fr"
     gender: str
     age: str
@@ -71,6 +84,16 @@ class BatchGenerateRequest(BaseModel):
     answers: list[BatchAnswerItem]
 
 
+class BulkGenerateItem(FormulaDiversityFields):
+    """Une ligne du flux NDJSON de /formulas/generate-bulk."""
+    id: str | None = None
+    language: Literal["fr", "en"] = "fr"
+    has_allergies: Literal["oui", "non"] = "non"
+    allergies: str | None = None
+    formula_type: Literal["frais", "mix", "puissant"] | None = None
+    answers: list[BatchAnswerItem]
+
+
 class SendFormulaMailRequest(BaseModel):
     email: str
     language: Literal["fr", "en"] = "fr"
@@ -94,7 +117,7 @@ class MultiParticipant(BaseModel):
     answers: list[BatchAnswerItem]
 
 
-class MultiGenerateRequest(BaseModel):
+class MultiGenerateRequest(FormulaDiversityFields):
     language: Literal["fr", "en"] = "fr"
     participants: list[MultiParticipant]
 
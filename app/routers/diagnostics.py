@@ -0,0 +1,40 @@
+import asyncio
+
+from fastapi import APIRouter, HTTPException
+
+from app.services import catalog_service, formula_service, session_store, worker_pool
+
+router = APIRouter(prefix="/api/diagnostics", tags=["diagnostics"])
+
+
+@router.get("/catalog")
+async def catalog_diagnostics():
+    """Version du catalogue coffret chargé et durée de chargement."""
+    return catalog_service.get_catalog_info()
+
+
+@router.post("/catalog/reload")
+async def reload_catalog():
+    """Recharge le XLSX et le mapping de scoring sans redémarrer le worker."""
+    try:
+        return await asyncio.to_thread(catalog_service.reload_catalog)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Rechargement impossible, version précédente conservée : {e}")
+
+
+@router.get("/formula-cache")
+async def formula_cache_diagnostics():
+    """Compteurs du cache LRU des formules générées."""
+    return formula_service.get_formula_cache_stats()
+
+
+@router.get("/workers")
+async def worker_pool_diagnostics():
+    """Profondeur de file, tâches en cours et temps d'attente du pool d'exécution."""
+    return worker_pool.stats()
+
+
+@router.get("/sessions")
+async def session_store_diagnostics():
+    """Sessions suivies par le session store et évictions (expiration, plafond)."""
+    return await session_store.run(session_store.stats)
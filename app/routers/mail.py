@@ -1,9 +1,11 @@
+import asyncio
+
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import HTMLResponse, Response
 from pydantic import BaseModel
 
 from app.models.schemas import SendMailRequest
-from app.services import mail_service, session_store
+from app.services import mail_service, session_store, worker_pool
 
 
 class TestMailRequest(BaseModel):
@@ -13,27 +15,27 @@ router = APIRouter(prefix="/api", tags=["mail"])
 
 
 def _get_formula_or_404(session_id: str) -> dict:
-    if session_store.get_session_meta(session_id) is None:
+    session = session_store.get_snapshot(session_id)
+    if not session.exists:
         raise HTTPException(status_code=404, detail="Session not found")
-    formula = session_store.get_selected_formula(session_id)
-    if formula is None:
+    if session.selected_formula is None:
         raise HTTPException(status_code=404, detail="No formula selected for this session")
-    return formula
+    return session.selected_formula.to_dict()
 
 
 @router.get("/session/{session_id}/mail", response_class=HTMLResponse)
 async def get_mail(session_id: str):
     """Return the mail HTML for in-browser display."""
-    formula = _get_formula_or_404(session_id)
-    html = mail_service.generate_mail_html(session_id, formula)
+    formula = await session_store.run(_get_formula_or_404, session_id)
+    html = await worker_pool.run_portable(mail_service.generate_mail_html, session_id, formula)
     return HTMLResponse(content=html)
 
 
 @router.get("/session/{session_id}/mail/download")
 async def download_mail(session_id: str):
     """Return the mail as a downloadable PDF."""
-    formula = _get_formula_or_404(session_id)
-    pdf_bytes = mail_service.generate_mail_pdf(session_id, formula)
+    formula = await session_store.run(_get_formula_or_404, session_id)
+    pdf_bytes = await worker_pool.run_portable(mail_service.generate_mail_pdf, session_id, formula)
     return Response(
         content=pdf_bytes,
         media_type="application/pdf",
@@ -45,7 +47,7 @@ async def download_mail(session_id: str):
 async def test_mail(body: TestMailRequest):
     """Test SMTP connection and send a simple test email."""
     try:
-        mail_service.send_test_mail(body.to)
+        await asyncio.to_thread(mail_service.send_test_mail, body.to)
     except RuntimeError as exc:
         raise HTTPException(status_code=503, detail=str(exc))
     except Exception as exc:
@@ -56,9 +58,9 @@ async def test_mail(body: TestMailRequest):
 @router.post("/session/{session_id}/mail/send")
 async def send_mail(session_id: str, body: SendMailRequest):
     """Send the mail HTML directly in the body of an email."""
-    formula = _get_formula_or_404(session_id)
+    formula = await session_store.run(_get_formula_or_404, session_id)
     try:
-        mail_service.send_mail(body.to, session_id, formula)
+        await asyncio.to_thread(mail_service.send_mail, body.to, session_id, formula)
     except RuntimeError as exc:
         raise HTTPException(status_code=503, detail=str(exc))
     except Exception as exc:
@@ -13,6 +13,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.config import get_settings
 from app.database.connection import get_db
 from app.database import crud
+from app.services import worker_pool
 
 router = APIRouter(prefix="/printers", tags=["printers"])
 
@@ -362,7 +363,7 @@ async def print_formula(body: PrintFormulaRequest, db: AsyncSession = Depends(ge
 
     try:
         from app.services.pdf_service import generate_formula_pdf
-        pdf_bytes = generate_formula_pdf(body.formula.model_dump())
+        pdf_bytes = await worker_pool.run_portable(generate_formula_pdf, body.formula.model_dump())
 
         if printer.protocol == "printnode":
             if not printer.printnode_id:
@@ -374,7 +375,7 @@ async def print_formula(body: PrintFormulaRequest, db: AsyncSession = Depends(ge
             await _print_cups_pdf(printer.cups_name, pdf_bytes)
         else:
             raise HTTPException(status_code=400, detail=f"Protocole non supporté pour PDF : {printer.protocol}")
-    except HTTPException:
+    except (HTTPException, worker_pool.WorkerPoolSaturated):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur impression: {str(e)}")
@@ -402,7 +403,7 @@ async def print_multi_formulas(body: PrintMultiFormulaRequest, db: AsyncSession
     try:
         from app.services.pdf_service import generate_formula_pdf
         for formula in body.formulas:
-            pdf_bytes = generate_formula_pdf(formula.model_dump())
+            pdf_bytes = await worker_pool.run_portable(generate_formula_pdf, formula.model_dump())
             if printer.protocol == "printnode":
                 if not printer.printnode_id:
                     raise HTTPException(status_code=400, detail="printnode_id manquant sur l'imprimante")
@@ -413,7 +414,7 @@ async def print_multi_formulas(body: PrintMultiFormulaRequest, db: AsyncSession
                 await _print_cups_pdf(printer.cups_name, pdf_bytes)
             else:
                 raise HTTPException(status_code=400, detail=f"Protocole non supporté pour PDF : {printer.protocol}")
-    except HTTPException:
+    except (HTTPException, worker_pool.WorkerPoolSaturated):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur impression: {str(e)}")
@@ -1,15 +1,18 @@
-import unicodedata
+import asyncio
+import json
 import logging
-from datetime import date
+from datetime import date, datetime
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
-from fastapi.responses import Response
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database.connection import get_db
 from app.database import crud
 from app.models.schemas import (
     BatchGenerateRequest,
+    BulkGenerateItem,
     ChangeFormulaTypeRequest,
     GenerateFormulasRequest,
     MultiGenerateRequest,
@@ -24,12 +27,18 @@ from app.models.schemas import (
     StartSessionResponse,
 )
 from app.config import get_settings
-from app.data.questions import QUESTIONS_EN, QUESTIONS_FR, _enrich_questions
-from app.services import formula_service, livekit_service, mail_service, pdf_service, session_store, session_service
+from app.data.questions import QUESTION_SETS, question_set_key, session_questions, with_questions
+from app.services import catalog_service, formula_service, livekit_service, mail_service, pdf_service, session_store, session_service, worker_pool
+from app.services.formula_model import SizesView, jsonable, stored_sizes
+from app.services.session_backends import SessionRecord
+from app.services.session_events import SessionEvent
 
 router = APIRouter(prefix="/api", tags=["sessions"])
 logger = logging.getLogger("lylo.sessions_api")
 
+# Nombre de lignes NDJSON scorées ensemble par /formulas/generate-bulk
+_BULK_BATCH_SIZE = 500
+
 
 @router.post("/session/start", response_model=StartSessionResponse)
 async def start_session(body: StartSessionRequest, db: AsyncSession = Depends(get_db)):
@@ -80,94 +89,122 @@ async def start_session(body: StartSessionRequest, db: AsyncSession = Depends(ge
     return result
 
 
+def _etag(version: int, variant: str = "") -> str:
+    """ETag d'une représentation de la session ; variant distingue les formes d'une même version."""
+    return f'"{version}{variant}"'
+
+
+def _not_modified(request: Request, version: int | None, variant: str = "") -> Response | None:
+    """304 si le client a déjà la version courante de la session (If-None-Match)."""
+    if version is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    etag = _etag(version, variant)
+    candidates = {tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")}
+    if etag in candidates or "*" in candidates:
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+
 @router.get("/session/{session_id}")
-async def get_session(session_id: str):
-    session = session_service.get_session(session_id)
+async def get_session(session_id: str, request: Request, questions: bool = True):
+    """Métadonnées de la session ; ETag = version de la session (304 si inchangée).
+
+    questions=false : seule la clé du jeu de questions (question_set) est
+    renvoyée, à développer côté client (voir app.data.questions).
+    """
+    variant = "" if questions else "-q"
+    version = await session_store.run(session_store.get_session_version, session_id)
+    if (cached := _not_modified(request, version, variant)) is not None:
+        return cached
+    session = await session_store.run(session_service.get_session, session_id)
     if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
-    return session
+    return JSONResponse(with_questions(session) if questions else session, headers={"ETag": _etag(version, variant)})
 
 
 @router.delete("/session/{session_id}")
 async def delete_session(session_id: str, db: AsyncSession = Depends(get_db)):
-    meta = session_store.get_session_meta(session_id)
+    meta = await session_store.run(session_store.get_session_meta, session_id)
     if meta is None:
         raise HTTPException(status_code=404, detail="Session not found")
     room_name = meta.get("room_name", f"room_{session_id}")
-    session_store.delete_session(session_id)
+    await session_store.run(session_store.delete_session, session_id)
     await livekit_service.delete_room(room_name)
     return {"status": "ok", "session_id": session_id}
 
 
-@router.get("/session_list")
-async def session_list():
-    return session_service.list_session_ids()
+# Taille de page par défaut / maximale des listes de sessions
+_SESSION_PAGE = 100
+_SESSION_PAGE_MAX = 500
 
 
-def _normalize(s: str) -> str:
-    """Lowercase + supprime les accents pour comparaison souple."""
-    return "".join(
-        c for c in unicodedata.normalize("NFD", s.lower())
-        if unicodedata.category(c) != "Mn"
-    )
+def _session_filters(
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    language: str | None = None,
+    mode: str | None = None,
+) -> dict:
+    """Filtres communs des listes de sessions (dates ISO 8601, UTC si sans fuseau)."""
+    return {"created_after": created_after, "created_before": created_before, "language": language, "mode": mode}
 
 
-def _canonical_choice(submitted: str, valid_labels: list[str]) -> str:
-    """Retourne le label canonique le plus proche parmi valid_labels.
-
-    Ordre de priorité :
-    1. Correspondance exacte (insensible à la casse/accents)
-    2. Correspondance du préfixe avant " - " (insensible à la casse/accents)
-    3. Le label canonique dont le préfixe normalisé contient le texte soumis
-    4. Valeur soumise inchangée si aucun match
-    """
-    norm_submitted = _normalize(submitted)
-    # Préfixe soumis (avant " - ")
-    submitted_prefix = norm_submitted.split(" - ")[0].strip()
-
-    for label in valid_labels:
-        if _normalize(label) == norm_submitted:
-            return label
+def _session_page(limit: int, cursor: str | None, filters: dict, questions: bool = False) -> tuple[list[dict], str | None]:
+    try:
+        return session_store.list_sessions(limit, cursor, questions=questions, **filters)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-    for label in valid_labels:
-        label_prefix = _normalize(label).split(" - ")[0].strip()
-        if label_prefix == submitted_prefix:
-            return label
 
-    for label in valid_labels:
-        label_prefix = _normalize(label).split(" - ")[0].strip()
-        if submitted_prefix in label_prefix or label_prefix in submitted_prefix:
-            return label
+@router.get("/session_list")
+async def session_list(
+    limit: int = Query(_SESSION_PAGE, ge=1, le=_SESSION_PAGE_MAX),
+    cursor: str | None = None,
+    filters: dict = Depends(_session_filters),
+):
+    """Identifiants des sessions actives par date de création ; next_cursor pour la page suivante."""
+    sessions, next_cursor = await session_store.run(_session_page, limit, cursor, filters)
+    return {"session_ids": [s["session_id"] for s in sessions], "next_cursor": next_cursor}
 
-    return submitted
 
+def _normalize_choices(question_id: int, choices: list[str], valid_labels: list[str]) -> list[str]:
+    """Ramène chaque choix soumis (FR ou EN, toute variante) au label canonique de la session.
 
-def _normalize_choices(choices: list[str], valid_labels: list[str]) -> list[str]:
-    return [_canonical_choice(c, valid_labels) for c in choices]
+    La résolution passe par la table précompilée (voir choice_index) ; un choix
+    non reconnu est conservé tel quel.
+    """
+    choice_index = catalog_service.get_choice_index()
+    normalized = []
+    for choice in choices:
+        index = choice_index.resolve(question_id, choice)
+        if index is not None and index < len(valid_labels):
+            normalized.append(valid_labels[index])
+        else:
+            normalized.append(choice)
+    return normalized
 
 
-@router.post("/session/{session_id}/save-answer")
-async def save_answer(session_id: str, body: SaveAnswerRequest):
-    if not session_store.is_profile_complete(session_id):
+def _save_answer(session_id: str, body: SaveAnswerRequest) -> dict:
+    session = session_store.get_snapshot(session_id)
+    if not session.profile_complete:
         raise HTTPException(
             status_code=400,
             detail="Profile incomplete, cannot save answers yet",
         )
 
     # Récupérer les choix valides pour cette question depuis la session
-    meta = session_store.get_session_meta(session_id)
+    meta = session.meta
     top_2 = body.top_2
     bottom_2 = body.bottom_2
     if meta:
-        questions = meta.get("questions", [])
+        questions = session_questions(meta)
         question = next((q for q in questions if q["id"] == body.question_id), None)
         if question:
             valid_labels = [
                 c["label"] if isinstance(c, dict) else c
                 for c in question.get("choices", [])
             ]
-            top_2 = _normalize_choices(top_2, valid_labels)
-            bottom_2 = _normalize_choices(bottom_2, valid_labels)
+            top_2 = _normalize_choices(body.question_id, top_2, valid_labels)
+            bottom_2 = _normalize_choices(body.question_id, bottom_2, valid_labels)
 
     session_store.save_answer(
         session_id=session_id,
@@ -176,64 +213,203 @@ async def save_answer(session_id: str, body: SaveAnswerRequest):
         top_2=top_2,
         bottom_2=bottom_2,
     )
-    return {"status": "ok"}
+    preview = formula_service.record_answer_scores(session_id, body.question_id, top_2, bottom_2)
+    return {"status": "ok", "preview": preview}
+
+
+@router.post("/session/{session_id}/save-answer")
+async def save_answer(session_id: str, body: SaveAnswerRequest):
+    # Lecture de la session, écriture et scores en un seul passage dans le store
+    return await session_store.run(_save_answer, session_id, body)
 
 
 @router.get("/session/{session_id}/answers")
-async def get_answers(session_id: str):
-    data = session_store.get_session_answers(session_id)
+async def get_answers(session_id: str, request: Request, questions: bool = True):
+    """Métadonnées et réponses ; ETag = version de la session (304 si inchangée)."""
+    variant = "" if questions else "-q"
+    version = await session_store.run(session_store.get_session_version, session_id)
+    if (cached := _not_modified(request, version, variant)) is not None:
+        return cached
+    data = await session_store.run(session_store.get_session_answers, session_id)
     if data is None:
         raise HTTPException(status_code=404, detail="Session not found")
-    return data
+    return JSONResponse(with_questions(data) if questions else data, headers={"ETag": _etag(version, variant)})
+
+
+@router.get("/session/{session_id}/preview")
+async def get_preview(session_id: str):
+    if await session_store.run(session_store.get_session_meta, session_id) is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return await session_store.run(formula_service.get_profile_preview, session_id)
+
+
+def _save_profile(session_id: str, body: SaveProfileRequest) -> dict:
+    session_store.save_user_profile(session_id, body.field, body.value)
+    session = session_store.get_snapshot(session_id)
+    response = {
+        "status": "ok",
+        "state": session.state,
+        "profile_complete": session.profile_complete,
+        "missing_fields": session.missing_profile_fields,
+    }
+    if body.field == "allergies":
+        # Saisies non reconnues : l'agent peut demander une précision à l'utilisateur
+        response["unmatched_allergens"] = formula_service.get_unmatched_allergens(body.value)
+    return response
 
 
 @router.post("/session/{session_id}/save-profile")
 async def save_profile(session_id: str, body: SaveProfileRequest):
-    session_store.save_user_profile(session_id, body.field, body.value)
-    complete = session_store.is_profile_complete(session_id)
-    missing = session_store.get_missing_profile_fields(session_id)
-    state = "questionnaire" if complete else "collecting_profile"
+    return await session_store.run(_save_profile, session_id, body)
+
+
+def _state_view(session: SessionRecord) -> dict:
     return {
-        "status": "ok",
-        "state": state,
-        "profile_complete": complete,
-        "missing_fields": missing,
+        "state": session.state,
+        "profile_complete": session.profile_complete,
+        "missing_fields": session.missing_profile_fields,
+        "mail_available": session.selected_formula is not None,
     }
 
 
 @router.get("/session/{session_id}/state")
 async def get_state(session_id: str):
-    state = session_store.get_session_state(session_id)
-    complete = session_store.is_profile_complete(session_id)
-    missing = session_store.get_missing_profile_fields(session_id)
-    mail_available = session_store.get_selected_formula(session_id) is not None
-    return {
-        "state": state,
-        "profile_complete": complete,
-        "missing_fields": missing,
-        "mail_available": mail_available,
-    }
+    # Une seule lecture de la session pour les quatre champs
+    return _state_view(await session_store.run(session_store.get_snapshot, session_id))
+
+
+# Parties de GET /session/{id}/snapshot, dans l'ordre de la réponse
+_SNAPSHOT_FIELDS = ("meta", "profile", "answers", "state", "generated_formulas", "selected_formula")
+_FORMULA_FIELDS = {"generated_formulas", "selected_formula"}
+
+
+@router.get("/session/{session_id}/snapshot")
+async def get_session_snapshot(
+    session_id: str,
+    request: Request,
+    fields: str | None = None,
+    questions: bool = True,
+    sizes: SizesView = "all",
+):
+    """Métadonnées, profil, réponses, état et formules en une seule lecture du store.
+
+    Remplace les appels séparés à /session/{id}, /profile, /answers et /state :
+    toutes les parties viennent de la même version de la session.
+    fields : parties à renvoyer, séparées par des virgules (toutes par défaut).
+    questions et sizes : comme GET /session/{id} et les routes de formules.
+    ETag = version de la session et forme demandée (304 si inchangée).
+    """
+    requested = set(_SNAPSHOT_FIELDS) if fields is None else {f.strip() for f in fields.split(",") if f.strip()}
+    if unknown := requested - set(_SNAPSHOT_FIELDS):
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    selected = [name for name in _SNAPSHOT_FIELDS if name in requested]
+
+    session = await session_store.run(session_store.get_snapshot, session_id)
+    if not session.exists:
+        raise HTTPException(status_code=404, detail="Session not found")
+    variant = f"-snapshot:{'+'.join(selected)}"
+    if "meta" in requested and not questions:
+        variant += ":q"
+    if requested & _FORMULA_FIELDS:
+        # Avec Redis, les formules sont relues avec le catalogue courant
+        variant += f":{sizes}:{catalog_service.current().version}"
+    if (cached := _not_modified(request, session.version, variant)) is not None:
+        return cached
+
+    body = {"session_id": session_id, "version": session.version}
+    for name in selected:
+        if name == "meta":
+            body["meta"] = with_questions(session.meta) if questions else session.meta
+        elif name == "profile":
+            body["profile"] = session.profile
+        elif name == "answers":
+            body["answers"] = session.answers
+        elif name == "state":
+            body["state"] = _state_view(session)
+        elif name == "generated_formulas":
+            formulas = session.generated_formulas
+            body["generated_formulas"] = jsonable(list(formulas), sizes) if formulas is not None else None
+        else:
+            body["selected_formula"] = jsonable(session.selected_formula, sizes)
+    return JSONResponse(body, headers={"ETag": _etag(session.version, variant)})
+
+
+@router.get("/session/{session_id}/events")
+async def session_events(session_id: str, request: Request, after: int | None = Query(None, ge=0)):
+    """Changements de la session en Server-Sent Events, à la place du polling de /state, /answers et /profile.
+
+    Événements : profile_update, answer_saved, formulas_generated,
+    formula_selected, puis session_deleted / session_expired en fin de flux.
+    id = numéro de séquence dans la session ; reprise après after (ou l'en-tête
+    Last-Event-ID envoyé par EventSource à la reconnexion). "reset" : les
+    événements manqués ne sont plus disponibles, l'état est à relire.
+    """
+    if after is None and (last_event_id := request.headers.get("last-event-id")):
+        try:
+            after = int(last_event_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+    if await session_store.run(session_store.get_session_version, session_id) is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    subscription = session_store.subscribe(session_id, after)
+    heartbeat = get_settings().session_events_heartbeat
+
+    async def events():
+        try:
+            # Point de départ : numéro à renvoyer en after si la connexion coupe avant le premier événement
+            yield SessionEvent(subscription.last_seq, "ready", json.dumps({"seq": subscription.last_seq})).sse()
+            while True:
+                try:
+                    event = await subscription.get(heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    return
+                yield event.sse()
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/session/{session_id}/profile")
 async def get_profile(session_id: str):
-    profile = session_store.get_user_profile(session_id)
+    profile = await session_store.run(session_store.get_user_profile, session_id)
     if profile is None:
         raise HTTPException(status_code=404, detail="Profile not found")
     return profile
 
 
+def _formulas_json(fn, sizes: SizesView, *args, **kwargs) -> dict:
+    """Appelle fn dans un worker et convertit ses formules en JSON sur place.
+
+    Les routes renvoient ensuite une JSONResponse : le jsonable_encoder de
+    FastAPI, plus coûteux que la génération elle-même, ne passe pas sur la boucle.
+    """
+    return jsonable(fn(*args, **kwargs), sizes)
+
+
 @router.post("/session/{session_id}/generate-formulas")
-async def generate_formulas(session_id: str, body: GenerateFormulasRequest = GenerateFormulasRequest()):
-    if not session_store.is_profile_complete(session_id):
+async def generate_formulas(
+    session_id: str, body: GenerateFormulasRequest = GenerateFormulasRequest(), sizes: SizesView = "all",
+):
+    if not await session_store.run(session_store.is_profile_complete, session_id):
         raise HTTPException(
             status_code=400,
             detail="Profile incomplete, cannot generate formulas",
         )
-    result = formula_service.generate_formulas(session_id, force_type=body.formula_type)
+    result = await worker_pool.run(
+        _formulas_json, formula_service.generate_formulas, sizes, session_id,
+        force_type=body.formula_type, options=body.diversity(),
+    )
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
-    return result
+    return JSONResponse(result)
 
 
 def _send_formula_mail_bg(session_id: str, formula: dict) -> None:
@@ -264,15 +440,18 @@ def _send_formula_mail_bg(session_id: str, formula: dict) -> None:
 @router.post("/session/{session_id}/select-formula")
 async def select_formula(
     session_id: str, body: SelectFormulaRequest, background_tasks: BackgroundTasks,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db), sizes: SizesView = "all",
 ):
-    result = formula_service.select_formula(session_id, body.formula_index)
+    result = await session_store.run(formula_service.select_formula, session_id, body.formula_index)
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
 
-    formula = result["formula"]
-    meta = session_store.get_session_meta(session_id) or {}
-    profile = session_store.get_user_profile(session_id) or {}
+    selected = result["formula"]
+    formula = selected.to_dict()
+    result["formula"] = selected.to_dict(sizes) if sizes != "all" else formula
+    session = await session_store.run(session_store.get_snapshot, session_id)
+    meta = session.meta or {}
+    profile = session.profile
     db_formula = await crud.create_generated_formula(
         db,
         session_id=session_id,
@@ -281,7 +460,7 @@ async def select_formula(
         top_notes=formula.get("top_notes"),
         heart_notes=formula.get("heart_notes"),
         base_notes=formula.get("base_notes"),
-        sizes=formula.get("sizes"),
+        sizes=stored_sizes(formula),
         customer_name=profile.get("name"),
         customer_email=meta.get("customer_email"),
         language=meta.get("language"),
@@ -289,20 +468,31 @@ async def select_formula(
     result["reference"] = db_formula.reference
 
     background_tasks.add_task(_send_formula_mail_bg, session_id, formula)
-    return result
+    return JSONResponse(result)
 
 
 @router.post("/session/{session_id}/change-formula-type")
-async def change_formula_type(session_id: str, body: ChangeFormulaTypeRequest):
-    result = formula_service.change_selected_formula_type(session_id, body.formula_type)
+async def change_formula_type(session_id: str, body: ChangeFormulaTypeRequest, sizes: SizesView = "all"):
+    result = await worker_pool.run(
+        _formulas_json, formula_service.change_selected_formula_type, sizes, session_id, body.formula_type,
+    )
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
-    return result
+    return JSONResponse(result)
 
 
 @router.get("/session/{session_id}/available-ingredients/{note_type}")
-async def available_ingredients(session_id: str, note_type: str):
-    result = formula_service.get_available_ingredients(session_id, note_type)
+async def available_ingredients(
+    session_id: str,
+    note_type: str,
+    limit: int | None = Query(None, ge=1, le=50),
+    cursor: str | None = None,
+    compact: bool = False,
+):
+    """Remplaçants classés par score de la session ; limit + cursor pour paginer."""
+    result = await session_store.run(
+        formula_service.get_available_ingredients, session_id, note_type, limit, cursor, compact,
+    )
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
     return result
@@ -311,33 +501,34 @@ async def available_ingredients(session_id: str, note_type: str):
 @router.post("/session/{session_id}/replace-note")
 async def replace_note(
     session_id: str, body: ReplaceNoteRequest, background_tasks: BackgroundTasks,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_db), sizes: SizesView = "all",
 ):
-    result = formula_service.replace_note(
-        session_id, body.note_type, body.old_note, body.new_note
+    result = await worker_pool.run(
+        formula_service.replace_note, session_id, body.note_type, body.old_note, body.new_note
     )
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
-    formula = session_store.get_selected_formula(session_id)
-    if formula:
-        await crud.update_generated_formula_by_session(
-            db,
-            session_id=session_id,
-            top_notes=formula.get("top_notes"),
-            heart_notes=formula.get("heart_notes"),
-            base_notes=formula.get("base_notes"),
-            sizes=formula.get("sizes"),
-        )
-        background_tasks.add_task(_send_formula_mail_bg, session_id, formula)
-    return result
+    selected = result["formula"]
+    formula = selected.to_dict()
+    result["formula"] = selected.to_dict(sizes) if sizes != "all" else formula
+    await crud.update_generated_formula_by_session(
+        db,
+        session_id=session_id,
+        top_notes=formula.get("top_notes"),
+        heart_notes=formula.get("heart_notes"),
+        base_notes=formula.get("base_notes"),
+        sizes=stored_sizes(formula),
+    )
+    background_tasks.add_task(_send_formula_mail_bg, session_id, formula)
+    return JSONResponse(result)
 
 
 @router.get("/session/{session_id}/formula/pdf")
 async def get_formula_pdf(session_id: str):
-    formula = session_store.get_selected_formula(session_id)
+    formula = await session_store.run(session_store.get_selected_formula, session_id)
     if formula is None:
         raise HTTPException(status_code=404, detail="No formula selected for this session")
-    pdf_bytes = pdf_service.generate_formula_pdf(formula)
+    pdf_bytes = await worker_pool.run_portable(pdf_service.generate_formula_pdf, formula.to_dict())
     return Response(
         content=pdf_bytes,
         media_type="application/pdf",
@@ -346,22 +537,52 @@ async def get_formula_pdf(session_id: str):
 
 
 @router.get("/sessions/all-answers")
-async def get_all_answers():
-    return session_store.get_all_sessions()
+async def get_all_answers(
+    limit: int = Query(_SESSION_PAGE, ge=1, le=_SESSION_PAGE_MAX),
+    cursor: str | None = None,
+    questions: bool = False,
+    filters: dict = Depends(_session_filters),
+):
+    """Réponses des sessions actives par date de création, page par page (usage interne/analytics)."""
+    sessions, next_cursor = await session_store.run(_session_page, limit, cursor, filters, questions)
+    return {"sessions": sessions, "next_cursor": next_cursor}
+
+
+@router.get("/sessions/all-answers/stream")
+async def stream_all_answers(
+    cursor: str | None = None,
+    questions: bool = False,
+    filters: dict = Depends(_session_filters),
+):
+    """Même contenu que /sessions/all-answers en flux NDJSON, une session par ligne.
+
+    Les sessions sont lues page par page dans un thread : le flux ne tient
+    jamais toutes les sessions en mémoire.
+    """
+    if cursor:
+        try:
+            session_store.decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    def lines():
+        for session in session_store.iter_sessions(cursor=cursor, questions=questions, **filters):
+            yield json.dumps(session, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 @router.get("/questions")
 async def get_questions(count: int = 12, language: str = "fr"):
     if not 1 <= count <= 12:
         raise HTTPException(status_code=400, detail="count doit être entre 1 et 12")
-    questions = QUESTIONS_FR if language == "fr" else QUESTIONS_EN
-    return {"questions": _enrich_questions(questions[:count])}
+    return {"questions": QUESTION_SETS[question_set_key(language, count)]}
 
 
 @router.post("/formulas/send-mail")
 async def send_formula_mail(body: SendFormulaMailRequest, background_tasks: BackgroundTasks):
     try:
-        mail_service.send_formula_mail_stateless(body.email, body.formula, body.language)
+        await asyncio.to_thread(mail_service.send_formula_mail_stateless, body.email, body.formula, body.language)
     except Exception as e:
         print(f"[mail] Erreur envoi: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -373,6 +594,7 @@ async def list_formulas(
     search: str = "",
     page: int = 1,
     limit: int = 50,
+    sizes: SizesView = "all",
     db: AsyncSession = Depends(get_db),
 ):
     skip = (max(page, 1) - 1) * limit
@@ -391,7 +613,13 @@ async def list_formulas(
                 "top_notes": r.top_notes,
                 "heart_notes": r.heart_notes,
                 "base_notes": r.base_notes,
-                "sizes": r.sizes,
+                **formula_service.expand_stored_sizes(
+                    r.formula_type,
+                    {"top_notes": r.top_notes, "heart_notes": r.heart_notes, "base_notes": r.base_notes},
+                    r.language,
+                    r.sizes,
+                    sizes,
+                ),
                 "customer_name": r.customer_name,
                 "customer_email": r.customer_email,
                 "language": r.language,
@@ -413,7 +641,7 @@ async def save_formula(body: SaveFormulaRequest, db: AsyncSession = Depends(get_
         top_notes=formula.get("top_notes"),
         heart_notes=formula.get("heart_notes"),
         base_notes=formula.get("base_notes"),
-        sizes=formula.get("sizes"),
+        sizes=stored_sizes(formula),
         customer_name=body.customer_name,
         customer_email=body.customer_email,
         language=body.language,
@@ -422,7 +650,7 @@ async def save_formula(body: SaveFormulaRequest, db: AsyncSession = Depends(get_
 
 
 @router.post("/formulas/generate")
-async def batch_generate_formulas(body: BatchGenerateRequest):
+async def batch_generate_formulas(body: BatchGenerateRequest, sizes: SizesView = "all"):
     answers = {
         str(a.question_id): {
             "question": a.question_text,
@@ -431,20 +659,24 @@ async def batch_generate_formulas(body: BatchGenerateRequest):
         }
         for a in body.answers
     }
-    result = formula_service.generate_formulas_stateless(
+    result = await worker_pool.run_portable(
+        _formulas_json,
+        formula_service.generate_formulas_stateless,
+        sizes,
         answers=answers,
         language=body.language,
         has_allergies=body.has_allergies,
         user_allergens_raw=body.allergies or "",
+        options=body.diversity(),
     )
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
-    return result
+    return JSONResponse(result)
 
 
 @router.post("/formulas/generate-multi")
-async def multi_generate_formulas(body: MultiGenerateRequest):
-    """Génère 2 formules pour chaque participant (mode visuel multi-utilisateurs)."""
+async def multi_generate_formulas(body: MultiGenerateRequest, sizes: SizesView = "all"):
+    """Génère les formules de chaque participant (mode visuel multi-utilisateurs)."""
     results = []
     for participant in body.participants:
         answers = {
@@ -455,11 +687,15 @@ async def multi_generate_formulas(body: MultiGenerateRequest):
             }
             for a in participant.answers
         }
-        result = formula_service.generate_formulas_stateless(
+        result = await worker_pool.run_portable(
+            _formulas_json,
+            formula_service.generate_formulas_stateless,
+            sizes,
             answers=answers,
             language=body.language,
             has_allergies=participant.has_allergies,
             user_allergens_raw=participant.allergies or "",
+            options=body.diversity(),
         )
         if "error" in result:
             raise HTTPException(status_code=400, detail=f"[{participant.color}] {result['error']}")
@@ -467,7 +703,93 @@ async def multi_generate_formulas(body: MultiGenerateRequest):
             "color": participant.color,
             "formulas": result.get("formulas", []),
         })
-    return {"participants": results}
+    return JSONResponse({"participants": results})
+
+
+def _format_validation_error(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in err['loc']) or 'body'}: {err['msg']}"
+        for err in e.errors()
+    )
+
+
+def _run_bulk_batch(lines: list[tuple[int, bytes]], sizes: SizesView = "all") -> bytes:
+    """Valide un lot de lignes NDJSON, génère leurs formules et sérialise une ligne par item."""
+    batch: list[tuple[int, BulkGenerateItem | None, str | None]] = []
+    for index, line in lines:
+        try:
+            batch.append((index, BulkGenerateItem.model_validate_json(line), None))
+        except ValidationError as e:
+            batch.append((index, None, _format_validation_error(e)))
+
+    valid = [(index, item) for index, item, _ in batch if item is not None]
+    results = formula_service.generate_formulas_bulk([
+        {
+            "answers": {
+                str(a.question_id): {
+                    "question": a.question_text,
+                    "top_2": a.top_2,
+                    "bottom_2": a.bottom_2,
+                }
+                for a in item.answers
+            },
+            "language": item.language,
+            "has_allergies": item.has_allergies,
+            "user_allergens_raw": item.allergies or "",
+            "force_type": item.formula_type,
+            "options": item.diversity(),
+        }
+        for _, item in valid
+    ])
+    by_index = {index: (item, result) for (index, item), result in zip(valid, results)}
+
+    out = []
+    for index, item, error in batch:
+        if item is None:
+            entry = {"index": index, "id": None, "error": error}
+        else:
+            entry = {"index": index, "id": item.id, **by_index[index][1]}
+        out.append(json.dumps(jsonable(entry, sizes), ensure_ascii=False, default=list))
+    return ("\n".join(out) + "\n").encode("utf-8")
+
+
+def _bulk_saturated(lines: list[tuple[int, bytes]], error: str) -> bytes:
+    """Lignes d'erreur d'un lot refusé par le pool en cours de flux (statut déjà envoyé)."""
+    return "".join(
+        json.dumps({"index": index, "id": None, "error": error}, ensure_ascii=False) + "\n" for index, _ in lines
+    ).encode("utf-8")
+
+
+@router.post("/formulas/generate-bulk")
+async def bulk_generate_formulas(request: Request, sizes: SizesView = "all"):
+    """Génère les formules de chaque ligne d'un flux NDJSON de jeux de réponses.
+
+    Corps : une ligne JSON par participant (voir BulkGenerateItem).
+    Réponse : flux NDJSON, une ligne par item dans l'ordre d'entrée, avec
+    `formulas` ou `error` — une ligne invalide n'interrompt pas le flux.
+    Chaque lot passe par le pool d'exécution : pool saturé → 503 sur le
+    premier lot ; sur un lot suivant, ses items reçoivent une ligne `error`.
+    """
+    # Le corps est lu entièrement avant de répondre : StreamingResponse écoute
+    # les déconnexions sur le même canal ASGI que request.stream().
+    body = await request.body()
+    lines = [line for line in body.splitlines() if line.strip()]
+    batches = [
+        list(enumerate(lines[start:start + _BULK_BATCH_SIZE], start))
+        for start in range(0, len(lines), _BULK_BATCH_SIZE)
+    ]
+    # Premier lot avant la réponse : une saturation du pool est encore un 503
+    first = await worker_pool.run(_run_bulk_batch, batches[0], sizes) if batches else b""
+
+    async def results():
+        yield first
+        for batch in batches[1:]:
+            try:
+                yield await worker_pool.run(_run_bulk_batch, batch, sizes)
+            except worker_pool.WorkerPoolSaturated as e:
+                yield _bulk_saturated(batch, str(e))
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
 
 
 @router.post("/formulas/save-multi")
@@ -484,7 +806,7 @@ async def save_multi_formulas(body: SaveMultiFormulaRequest, db: AsyncSession =
             top_notes=formula.get("top_notes"),
             heart_notes=formula.get("heart_notes"),
             base_notes=formula.get("base_notes"),
-            sizes=formula.get("sizes"),
+            sizes=stored_sizes(formula),
             customer_name=sel.customer_name,
             customer_email=sel.customer_email,
             language=body.language,
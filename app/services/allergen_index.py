@@ -0,0 +1,125 @@
+"""Index des allergènes du coffret sous forme de masques de bits.
+
+Chaque ingrédient du catalogue occupe un bit. Pour chaque allergène, le masque
+réunit les ingrédients qui le contiennent ; bloquer les allergies d'un
+utilisateur revient donc à un OU binaire des masques correspondants.
+Les saisies libres sont comparées à une table d'alias normalisée
+(casse, accents et ponctuation ignorés).
+"""
+
+import difflib
+import logging
+import re
+import unicodedata
+from dataclasses import dataclass, field
+
+from app.data.allergen_aliases import ALLERGEN_ALIASES
+
+logger = logging.getLogger("lylo.allergens")
+
+# Taille max du cache des saisies déjà analysées
+_MATCH_CACHE_SIZE = 4096
+
+
+def normalize_allergen(text: str) -> str:
+    """Minuscules, sans accents, ponctuation remplacée par des espaces."""
+    text = "".join(
+        c for c in unicodedata.normalize("NFD", text.lower())
+        if unicodedata.category(c) != "Mn"
+    )
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text).split())
+
+
+def split_allergies(raw: str) -> list[str]:
+    """Découpe une saisie libre d'allergies (séparateurs « , » et « ; »)."""
+    return [a.strip() for a in raw.replace(",", ";").split(";") if a.strip()]
+
+
+@dataclass(frozen=True, slots=True)
+class AllergenIndex:
+    catalog_version: str
+    # bit i → nom EN de l'ingrédient i du catalogue
+    ingredient_names: tuple[str, ...]
+    # allergène canonique → masque des ingrédients qui le contiennent
+    allergen_masks: dict[str, int]
+    # alias normalisé → allergène canonique
+    aliases: dict[str, str]
+    # recherche en une passe des alias dans une saisie libre
+    alias_pattern: re.Pattern
+    _match_cache: dict[str, tuple[int, tuple[str, ...]]] = field(default_factory=dict)
+
+    def match(self, raw: str) -> tuple[int, tuple[str, ...]]:
+        """Analyse une saisie libre → (masque des ingrédients bloqués, saisies sans correspondance)."""
+        cached = self._match_cache.get(raw)
+        if cached is not None:
+            return cached
+
+        mask = 0
+        unmatched: list[str] = []
+        for part in split_allergies(raw):
+            key = normalize_allergen(part)
+            allergen = self.aliases.get(key)
+            if allergen is not None:
+                mask |= self.allergen_masks[allergen]
+                continue
+            # Saisie composée (« linalool et coumarine ») : alias contenus dans le texte
+            found = self.alias_pattern.findall(key) if key else []
+            if not found:
+                unmatched.append(part)
+            for alias in found:
+                mask |= self.allergen_masks[self.aliases[alias]]
+
+        result = (mask, tuple(unmatched))
+        if len(self._match_cache) >= _MATCH_CACHE_SIZE:
+            self._match_cache.clear()
+        self._match_cache[raw] = result
+        return result
+
+    def names(self, mask: int) -> set[str]:
+        """Noms des ingrédients dont le bit est levé dans le masque."""
+        return {name for i, name in enumerate(self.ingredient_names) if mask >> i & 1}
+
+
+def _match_ingredient(sheet_name: str, by_key: dict[str, int]) -> int | None:
+    """Retrouve l'ingrédient du catalogue correspondant à un nom de l'onglet ALLERGENS."""
+    key = normalize_allergen(sheet_name).replace(" ", "")
+    if key in by_key:
+        return by_key[key]
+    close = difflib.get_close_matches(key, list(by_key), n=1, cutoff=0.9)
+    if close:
+        return by_key[close[0]]
+    return None
+
+
+def build_allergen_index(catalog: dict) -> AllergenIndex:
+    """Construit l'index des allergènes à partir du catalogue compilé."""
+    ingredient_names = tuple(ing["name"] for ing in catalog["ingredients"])
+    by_key = {normalize_allergen(name).replace(" ", ""): i for i, name in enumerate(ingredient_names)}
+
+    allergen_masks: dict[str, int] = {}
+    for sheet_name, allergens in catalog["allergen_map"].items():
+        bit = _match_ingredient(sheet_name, by_key)
+        if bit is None:
+            logger.warning("[allergens] ingrédient '%s' de l'onglet ALLERGENS absent du coffret", sheet_name)
+            continue
+        if ingredient_names[bit] != sheet_name:
+            logger.info("[allergens] '%s' (ALLERGENS) rapproché de '%s'", sheet_name, ingredient_names[bit])
+        for allergen in allergens:
+            allergen_masks[allergen] = allergen_masks.get(allergen, 0) | (1 << bit)
+
+    aliases: dict[str, str] = {}
+    for allergen in allergen_masks:
+        aliases[normalize_allergen(allergen)] = allergen
+        for alias in ALLERGEN_ALIASES.get(allergen, []):
+            aliases[normalize_allergen(alias)] = allergen
+
+    alternatives = sorted(aliases, key=len, reverse=True)
+    alias_pattern = re.compile(r"\b(?:" + "|".join(re.escape(a) for a in alternatives) + r")\b")
+
+    return AllergenIndex(
+        catalog_version=catalog["version"],
+        ingredient_names=ingredient_names,
+        allergen_masks=allergen_masks,
+        aliases=aliases,
+        alias_pattern=alias_pattern,
+    )
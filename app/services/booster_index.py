@@ -0,0 +1,117 @@
+"""Scoring des boosters par mots-clés, précalculé par ingrédient.
+
+Tous les mots-clés de BOOSTERS sont compilés en un automate d'Aho-Corasick :
+le texte d'un ingrédient (nom, famille, description) est parcouru une seule
+fois et chaque mot-clé trouvé allume un bit. Au chargement du catalogue, on
+garde pour chaque ingrédient le masque de ses mots-clés ; le score d'un
+booster pour une formule est alors le nombre de bits du OU des masques des
+notes sélectionnées, restreint aux mots-clés du booster. Un mot-clé compte
+une fois par formule, comme avec la recherche sur le texte concaténé.
+"""
+
+from collections import deque
+from dataclasses import dataclass
+
+from app.services.formula_model import Ingredient
+
+_TEXT_FIELDS = ("name", "family", "description")
+
+
+class KeywordAutomaton:
+    """Automate d'Aho-Corasick : mot-clé → masque de bits, recherche en une passe."""
+
+    __slots__ = ("_goto", "_fail", "_out")
+
+    def __init__(self, patterns: dict[str, int]):
+        self._goto: list[dict[str, int]] = [{}]
+        self._out: list[int] = [0]
+
+        for pattern, mask in patterns.items():
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._out.append(0)
+                state = nxt
+            self._out[state] |= mask
+
+        # Liens d'échec (parcours en largeur), sorties héritées du suffixe
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(ch, 0)
+                self._out[nxt] |= self._out[self._fail[nxt]]
+
+    def scan(self, text: str) -> int:
+        """OU des masques de tous les mots-clés présents dans text."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        found = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            found |= out[state]
+        return found
+
+
+@dataclass(frozen=True, slots=True)
+class BoosterIndex:
+    boosters: tuple[dict, ...]
+    # masque des mots-clés de chaque booster (même ordre que boosters)
+    booster_masks: tuple[int, ...]
+    automaton: KeywordAutomaton
+    # nom EN → masque des mots-clés présents dans le texte de l'ingrédient
+    ingredient_hits: dict[str, int]
+
+    def note_hits(self, note: Ingredient) -> int:
+        hits = self.ingredient_hits.get(note.name)
+        if hits is None:
+            hits = self.automaton.scan(_note_text(note.detail("en")))
+        return hits
+
+    def rank(self, hits: int, count: int) -> list[dict]:
+        """Boosters triés par nombre de mots-clés trouvés (ordre de BOOSTERS à égalité)."""
+        scored = [
+            (booster, (hits & mask).bit_count())
+            for booster, mask in zip(self.boosters, self.booster_masks)
+        ]
+        scored.sort(key=lambda x: x[1], reverse=True)
+        return [b for b, _ in scored[:count]]
+
+
+def _note_text(note: dict) -> str:
+    # Les mots-clés ne contiennent pas d'espace : ils ne peuvent pas chevaucher deux champs
+    return " ".join(note[f].lower() for f in _TEXT_FIELDS if note.get(f))
+
+
+def build_booster_index(catalog: dict, boosters: list[dict]) -> BoosterIndex:
+    """Compile les mots-clés des boosters et précalcule les correspondances par ingrédient."""
+    patterns: dict[str, int] = {}
+    booster_masks: list[int] = []
+    bit = 0
+    for booster in boosters:
+        mask = 0
+        for keyword in booster["keywords"]:
+            # Un bit par (booster, mot-clé) : un mot-clé partagé compte pour chacun
+            patterns[keyword] = patterns.get(keyword, 0) | (1 << bit)
+            mask |= 1 << bit
+            bit += 1
+        booster_masks.append(mask)
+
+    automaton = KeywordAutomaton(patterns)
+    return BoosterIndex(
+        boosters=tuple(boosters),
+        booster_masks=tuple(booster_masks),
+        automaton=automaton,
+        ingredient_hits={ing["name"]: automaton.scan(_note_text(ing)) for ing in catalog["ingredients"]},
+    )
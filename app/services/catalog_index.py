@@ -0,0 +1,97 @@
+"""Index du catalogue du coffret.
+
+Construit une seule fois par version du catalogue : ingrédients par catégorie
+(triés par position), par nom EN / FR et par position, ainsi que les poids de
+profil de chaque ingrédient (profile_1 → 2, profile_2 → 1). Les fonctions
+chaudes du moteur de formules (sélection des notes, dérivation du profil,
+remplacement de note) s'appuient sur ces structures au lieu de reparcourir la
+liste des ingrédients.
+"""
+
+import heapq
+from dataclasses import dataclass
+
+from app.data.choice_profile_mapping import INGREDIENT_EN_TO_FR
+from app.services.formula_model import Ingredient
+
+CATEGORIES = ("top", "heart", "base")
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogIndex:
+    version: str
+    # catégorie → ingrédients triés par position
+    by_category: dict[str, tuple[Ingredient, ...]]
+    # nom EN → ingrédient
+    by_name: dict[str, Ingredient]
+    # position (T001, H004…) → ingrédient
+    by_position: dict[str, Ingredient]
+    # (catégorie, nom EN ou FR en minuscules) → ingrédient
+    by_lower_name: dict[tuple[str, str], Ingredient]
+    # nom EN → ((profil, poids), …) dans l'ordre profile_1, profile_2
+    profile_weights: dict[str, tuple[tuple[str, int], ...]]
+
+    def top_k(
+        self,
+        category: str,
+        scores: dict[str, float],
+        k: int,
+        skip: set[str],
+    ) -> list[Ingredient]:
+        """Les k meilleurs ingrédients d'une catégorie (score décroissant, puis position).
+
+        Si tous les scores sont nuls, l'ordre de position sert de fallback.
+        """
+        candidates = [ing for ing in self.by_category.get(category, ()) if ing.name not in skip]
+        return heapq.nsmallest(k, candidates, key=lambda ing: (-scores.get(ing.name, 0), ing.position))
+
+    def find(self, category: str, name: str) -> Ingredient | None:
+        """Ingrédient d'une catégorie par nom EN ou FR (insensible à la casse)."""
+        return self.by_lower_name.get((category, name.lower()))
+
+    def translate(self, name: str, language: str) -> str:
+        ingredient = self.by_name.get(name)
+        return ingredient.display_name(language) if ingredient else name
+
+
+def build_catalog_index(catalog: dict) -> CatalogIndex:
+    """Construit les index du catalogue compilé (voir catalog_service)."""
+    ingredients = [
+        Ingredient(
+            position=ing["position"],
+            name=ing["name"],
+            family=ing["family"],
+            description=ing["description"],
+            note_type=ing["note_type"],
+            profile_1=ing["profile_1"],
+            profile_2=ing["profile_2"],
+            name_fr=INGREDIENT_EN_TO_FR.get(ing["name"], ing["name"]),
+        )
+        for ing in sorted(catalog["ingredients"], key=lambda ing: ing["position"])
+    ]
+
+    by_category: dict[str, list[Ingredient]] = {cat: [] for cat in CATEGORIES}
+    by_lower_name: dict[tuple[str, str], Ingredient] = {}
+    profile_weights: dict[str, tuple[tuple[str, int], ...]] = {}
+
+    for ing in ingredients:
+        by_category.setdefault(ing.note_type, []).append(ing)
+        # Nom EN prioritaire en cas de collision avec une traduction
+        by_lower_name.setdefault((ing.note_type, ing.name.lower()), ing)
+        profile_weights[ing.name] = tuple(
+            (profile, weight)
+            for profile, weight in ((ing.profile_1, 2), (ing.profile_2, 1))
+            if profile
+        )
+
+    for ing in ingredients:
+        by_lower_name.setdefault((ing.note_type, ing.name_fr.lower()), ing)
+
+    return CatalogIndex(
+        version=catalog["version"],
+        by_category={cat: tuple(items) for cat, items in by_category.items()},
+        by_name={ing.name: ing for ing in ingredients},
+        by_position={ing.position: ing for ing in ingredients},
+        by_lower_name=by_lower_name,
+        profile_weights=profile_weights,
+    )
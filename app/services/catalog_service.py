@@ -0,0 +1,375 @@
+"""Catalogue du coffret précompilé.
+
+Le fichier `Coffret-description.xlsx` est compilé une seule fois en un artefact
+JSON compact (`coffret_catalog.json`) versionné par le hash SHA-256 du XLSX.
+Au démarrage, le backend charge l'artefact sans ouvrir openpyxl ; si le hash
+du XLSX ne correspond plus, l'artefact est recompilé automatiquement.
+
+Le catalogue, le mapping de scoring et tous leurs index forment un snapshot
+immuable, remplacé d'un bloc au rechargement (`reload_catalog`, déclenché par
+l'endpoint d'administration ou la surveillance des fichiers). Les traitements
+en cours gardent le snapshot avec lequel ils ont démarré (voir `pinned`).
+
+Recompilation manuelle :
+    python -m app.services.catalog_service
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+from app.data.boosters import BOOSTERS
+from app.services.allergen_index import AllergenIndex, build_allergen_index
+from app.services.booster_index import BoosterIndex, build_booster_index
+from app.services.catalog_index import CatalogIndex, build_catalog_index
+from app.services.choice_index import ChoiceIndex, build_choice_index
+from app.services.scoring_matrix import ScoringMatrix, build_scoring_matrix
+
+logger = logging.getLogger("lylo.catalog")
+
+# ── Chemins ───────────────────────────────────────────────────────────
+_DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+_XLSX_PATH = _DATA_DIR / "Coffret-description.xlsx"
+_CATALOG_PATH = _DATA_DIR / "coffret_catalog.json"
+_NOTE_SCORING_PATH = _DATA_DIR / "note_scoring_mapping.json"
+
+# Incrémenter si la structure de l'artefact change (force une recompilation)
+CATALOG_FORMAT = 1
+
+# ── Normalisation des noms de profils ─────────────────────────────────
+_PROFILE_NORMALIZE = {
+    "stratégist": "Strategist",
+    "strategist": "Strategist",
+    "disrupteur": "Disruptor",
+    "disruptor": "Disruptor",
+    "trail blazer": "Trailblazer",
+    "trailblazer": "Trailblazer",
+    "visionary": "Visionary",
+    "visionnary": "Visionary",
+    "innovator": "Innovator",
+    "creator": "Creator",
+    "influencer": "Influencer",
+    "icon": "Icon",
+    "cosy": "Cosy",
+}
+
+
+def _normalize_profile(raw: str | None) -> str | None:
+    if not raw:
+        return None
+    return _PROFILE_NORMALIZE.get(raw.strip().lower(), raw.strip())
+
+
+# ── Compilation du XLSX ───────────────────────────────────────────────
+
+def _file_hash(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _parse_xlsx(xlsx_path: Path) -> tuple[list[dict], dict[str, list[str]]]:
+    """Parse le XLSX et retourne les ingrédients + allergènes."""
+    import openpyxl  # uniquement nécessaire pour compiler l'artefact
+
+    wb = openpyxl.load_workbook(xlsx_path, read_only=True, data_only=True)
+
+    ws = wb[wb.sheetnames[0]]
+    ingredients = []
+
+    note_ranges = [
+        ("top", 7, 16),
+        ("heart", 21, 30),
+        ("base", 35, 44),
+    ]
+
+    for note_type, start, end in note_ranges:
+        for row in ws.iter_rows(min_row=start, max_row=end, min_col=1, max_col=8):
+            position = row[0].value
+            if not position:
+                continue
+            ingredients.append({
+                "position": position,
+                "name": row[1].value,
+                "family": row[2].value,
+                "description": row[3].value,
+                "note_type": note_type,
+                "profile_1": _normalize_profile(row[6].value),
+                "profile_2": _normalize_profile(row[7].value),
+            })
+
+    ws2 = wb["ALLERGENS"]
+
+    allergen_blocks = [
+        (4, 6, 31),
+        (33, 35, 60),
+        (62, 64, 89),
+    ]
+
+    allergen_map: dict[str, set[str]] = defaultdict(set)
+
+    for header_row, data_start, data_end in allergen_blocks:
+        header_cells = list(ws2.iter_rows(
+            min_row=header_row, max_row=header_row,
+            min_col=2, max_col=11,
+        ))[0]
+        col_to_ingredient = {}
+        for cell in header_cells:
+            if cell.value:
+                col_to_ingredient[cell.column] = cell.value.strip()
+
+        for row in ws2.iter_rows(
+            min_row=data_start, max_row=data_end,
+            min_col=1, max_col=11,
+        ):
+            allergen_name = row[0].value
+            if not allergen_name:
+                continue
+            allergen_name = allergen_name.strip()
+            for cell in row[1:]:
+                if cell.value and str(cell.value).strip().lower() == "x":
+                    ingredient_name = col_to_ingredient.get(cell.column)
+                    if ingredient_name:
+                        allergen_map[ingredient_name].add(allergen_name)
+
+    wb.close()
+
+    return ingredients, {name: sorted(allergens) for name, allergens in allergen_map.items()}
+
+
+def compile_catalog(xlsx_path: Path = _XLSX_PATH, output_path: Path | None = _CATALOG_PATH) -> dict:
+    """Compile le XLSX en artefact catalogue et l'écrit sur disque si output_path est fourni."""
+    source_hash = _file_hash(xlsx_path)
+    ingredients, allergen_map = _parse_xlsx(xlsx_path)
+
+    catalog = {
+        "format": CATALOG_FORMAT,
+        "version": source_hash[:12],
+        "source_hash": source_hash,
+        "compiled_at": datetime.now(timezone.utc).isoformat(),
+        "ingredients": ingredients,
+        "allergen_map": allergen_map,
+    }
+
+    if output_path is not None:
+        try:
+            output_path.write_text(
+                json.dumps(catalog, ensure_ascii=False, separators=(",", ":")),
+                encoding="utf-8",
+            )
+        except OSError as e:
+            # Système de fichiers en lecture seule : on garde la version en mémoire
+            logger.warning("[catalog] impossible d'écrire %s: %s", output_path, e)
+
+    return catalog
+
+
+# ── Chargement ────────────────────────────────────────────────────────
+
+@dataclass(frozen=True, slots=True)
+class CatalogSnapshot:
+    """Catalogue + mapping de scoring et tous leurs index, publiés ensemble.
+
+    La version combine le hash du XLSX et celui du mapping : elle change dès
+    que l'un des deux fichiers change.
+    """
+
+    version: str
+    catalog: dict
+    catalog_index: CatalogIndex
+    allergen_index: AllergenIndex
+    booster_index: BoosterIndex
+    note_mapping: dict
+    choice_index: ChoiceIndex
+    scoring_matrix: ScoringMatrix
+    # (mtime_ns, taille) des fichiers sources, pour détecter un changement
+    source_signature: tuple
+    info: dict
+
+
+_snapshot: CatalogSnapshot | None = None
+_reload_lock = threading.Lock()
+# Snapshot figé pour le traitement en cours (voir pinned)
+_pinned: ContextVar[CatalogSnapshot | None] = ContextVar("catalog_snapshot", default=None)
+
+
+def _read_artifact(path: Path) -> dict | None:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _source_signature() -> tuple:
+    signature = []
+    for path in (_XLSX_PATH, _NOTE_SCORING_PATH):
+        try:
+            stat = path.stat()
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def load_catalog() -> dict:
+    """Construit un snapshot complet depuis les fichiers et le publie atomiquement.
+
+    L'artefact est recompilé si le XLSX a changé. En cas d'erreur (fichier
+    illisible, JSON invalide…), l'exception remonte et le snapshot en place
+    reste actif.
+    """
+    global _snapshot
+    started = time.perf_counter()
+    signature = _source_signature()
+
+    artifact = _read_artifact(_CATALOG_PATH)
+    source = "artifact"
+
+    if _XLSX_PATH.exists():
+        current_hash = _file_hash(_XLSX_PATH)
+        if (
+            artifact is None
+            or artifact.get("format") != CATALOG_FORMAT
+            or artifact.get("source_hash") != current_hash
+        ):
+            logger.info("[catalog] artefact absent ou obsolète, recompilation depuis %s", _XLSX_PATH.name)
+            artifact = compile_catalog()
+            source = "xlsx"
+    elif artifact is None:
+        raise FileNotFoundError(f"Ni {_CATALOG_PATH} ni {_XLSX_PATH} n'existent")
+
+    mapping_bytes = _NOTE_SCORING_PATH.read_bytes()
+    note_mapping = json.loads(mapping_bytes)
+    mapping_hash = hashlib.sha256(mapping_bytes).hexdigest()
+    version = f"{artifact['version']}-{mapping_hash[:8]}"
+
+    catalog_index = build_catalog_index(artifact)
+    allergen_index = build_allergen_index(artifact)
+    booster_index = build_booster_index(artifact, BOOSTERS)
+    choice_index = build_choice_index(note_mapping)
+    scoring_matrix = build_scoring_matrix(artifact, note_mapping, version=version)
+
+    load_ms = (time.perf_counter() - started) * 1000
+    snapshot = CatalogSnapshot(
+        version=version,
+        catalog=artifact,
+        catalog_index=catalog_index,
+        allergen_index=allergen_index,
+        booster_index=booster_index,
+        note_mapping=note_mapping,
+        choice_index=choice_index,
+        scoring_matrix=scoring_matrix,
+        source_signature=signature,
+        info={
+            "version": version,
+            "catalog_version": artifact["version"],
+            "source_hash": artifact["source_hash"],
+            "mapping_hash": mapping_hash,
+            "compiled_at": artifact["compiled_at"],
+            "source": source,
+            "loaded_at": datetime.now(timezone.utc).isoformat(),
+            "load_ms": round(load_ms, 3),
+            "ingredients": len(artifact["ingredients"]),
+        },
+    )
+    _snapshot = snapshot
+    logger.info(
+        "[catalog] version=%s chargée depuis %s en %.1f ms",
+        version, source, load_ms,
+    )
+    return snapshot.catalog
+
+
+def reload_catalog() -> dict:
+    """Recharge le catalogue et le mapping sans redémarrer le worker.
+
+    Les traitements en cours gardent le snapshot avec lequel ils ont démarré.
+    """
+    with _reload_lock:
+        previous = _snapshot.version if _snapshot else None
+        load_catalog()
+    info = get_catalog_info()
+    info["previous_version"] = previous
+    return info
+
+
+def sources_changed() -> bool:
+    """True si le XLSX ou le mapping a été modifié depuis le dernier chargement."""
+    return _snapshot is not None and _source_signature() != _snapshot.source_signature
+
+
+def current() -> CatalogSnapshot:
+    """Snapshot figé pour le traitement en cours, sinon le dernier publié."""
+    snapshot = _pinned.get()
+    if snapshot is not None:
+        return snapshot
+    if _snapshot is None:
+        with _reload_lock:
+            if _snapshot is None:
+                load_catalog()
+    return _snapshot
+
+
+@contextmanager
+def pinned():
+    """Fige le snapshot courant pendant un traitement (utilisable en décorateur).
+
+    Un rechargement pendant le traitement n'affecte pas celui-ci : toutes les
+    lectures du catalogue voient la même version.
+    """
+    token = _pinned.set(current())
+    try:
+        yield _pinned.get()
+    finally:
+        _pinned.reset(token)
+
+
+def get_catalog() -> dict:
+    return current().catalog
+
+
+def get_catalog_index() -> CatalogIndex:
+    """Index par catégorie / nom / position, construit au chargement du catalogue."""
+    return current().catalog_index
+
+
+def get_allergen_index() -> AllergenIndex:
+    """Index allergène → masque d'ingrédients, construit au chargement du catalogue."""
+    return current().allergen_index
+
+
+def get_booster_index() -> BoosterIndex:
+    """Mots-clés de boosters précalculés par ingrédient."""
+    return current().booster_index
+
+
+def get_note_scoring_mapping() -> dict:
+    return current().note_mapping
+
+
+def get_choice_index() -> ChoiceIndex:
+    """Table de résolution des choix (FR/EN/mapping → position canonique)."""
+    return current().choice_index
+
+
+def get_scoring_matrix() -> ScoringMatrix:
+    """Matrice de scoring compilée pour la version courante du catalogue et du mapping."""
+    return current().scoring_matrix
+
+
+def get_catalog_info() -> dict:
+    """Version et métriques de chargement du catalogue actuellement en mémoire."""
+    return dict(_snapshot.info) if _snapshot else {"version": None, "loaded_at": None}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    compiled = compile_catalog()
+    print(f"Catalogue compilé : version={compiled['version']} ingrédients={len(compiled['ingredients'])} → {_CATALOG_PATH}")
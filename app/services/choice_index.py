@@ -0,0 +1,146 @@
+"""Table de résolution des choix du questionnaire.
+
+Compilée une seule fois à partir de QUESTIONS_FR, QUESTIONS_EN,
+EN_TO_FR_CHOICES et note_scoring_mapping.json. Chaque orthographe acceptée
+d'un choix (libellé FR/EN complet, préfixe avant " - ", clé courte FR, clé du
+mapping de scoring), normalisée sans casse ni accents, pointe vers un
+identifiant canonique : la position du choix dans la question.
+
+Partagée par l'API (normalisation des réponses dans save_answer) et par le
+moteur de formules (_score_notes).
+"""
+
+import logging
+import unicodedata
+from dataclasses import dataclass, field
+
+from app.data.questions import EN_TO_FR_CHOICES, QUESTIONS_EN, QUESTIONS_FR
+
+logger = logging.getLogger("lylo.choices")
+
+# Taille max du cache des saisies résolues par le chemin lent (inclusion)
+_FALLBACK_CACHE_SIZE = 4096
+
+
+def normalize_choice(text: str) -> str:
+    """Lowercase + supprime les accents pour comparaison souple."""
+    return "".join(
+        c for c in unicodedata.normalize("NFD", text.lower())
+        if unicodedata.category(c) != "Mn"
+    ).strip()
+
+
+def _prefix(normalized: str) -> str:
+    return normalized.split(" - ")[0].strip()
+
+
+@dataclass(frozen=True, slots=True)
+class ChoiceIndex:
+    # (question_id, variante normalisée) → position du choix
+    lookup: dict[tuple[int, str], int]
+    # (question_id, position) → clé du choix dans note_scoring_mapping.json
+    mapping_keys: dict[tuple[int, int], str]
+    # langue → question_id → libellés dans l'ordre
+    labels: dict[str, dict[int, list[str]]]
+    # question_id → [(préfixe normalisé, position)] pour le chemin lent
+    prefixes: dict[int, list[tuple[str, int]]]
+    _fallback_cache: dict[tuple[int, str], int | None] = field(default_factory=dict)
+
+    def resolve(self, question_id: int, submitted: str) -> int | None:
+        """Position canonique d'un choix soumis (FR ou EN, toute variante), ou None.
+
+        Ordre de priorité :
+        1. Libellé complet ou variante connue (insensible à la casse/accents)
+        2. Préfixe avant " - "
+        3. Préfixe d'un libellé contenant le texte soumis (ou l'inverse)
+        """
+        norm = normalize_choice(submitted)
+        index = self.lookup.get((question_id, norm))
+        if index is not None:
+            return index
+        index = self.lookup.get((question_id, _prefix(norm)))
+        if index is not None:
+            return index
+        return self._resolve_by_inclusion(question_id, _prefix(norm))
+
+    def _resolve_by_inclusion(self, question_id: int, submitted_prefix: str) -> int | None:
+        if not submitted_prefix:
+            return None
+        cache_key = (question_id, submitted_prefix)
+        if cache_key in self._fallback_cache:
+            return self._fallback_cache[cache_key]
+
+        result = None
+        for label_prefix, index in self.prefixes.get(question_id, []):
+            if submitted_prefix in label_prefix or label_prefix in submitted_prefix:
+                result = index
+                break
+
+        if len(self._fallback_cache) >= _FALLBACK_CACHE_SIZE:
+            self._fallback_cache.clear()
+        self._fallback_cache[cache_key] = result
+        return result
+
+    def label(self, question_id: int, index: int, language: str) -> str | None:
+        labels = self.labels.get(language, self.labels["fr"]).get(question_id, [])
+        return labels[index] if index < len(labels) else None
+
+    def mapping_key(self, question_id: int, index: int) -> str | None:
+        return self.mapping_keys.get((question_id, index))
+
+
+def build_choice_index(note_mapping: dict) -> ChoiceIndex:
+    """Compile la table de résolution des choix pour les 2 langues et le mapping de scoring."""
+    labels = {
+        "fr": {q["id"]: list(q["choices"]) for q in QUESTIONS_FR},
+        "en": {q["id"]: list(q["choices"]) for q in QUESTIONS_EN},
+    }
+
+    lookup: dict[tuple[int, str], int] = {}
+    mapping_keys: dict[tuple[int, int], str] = {}
+    prefixes: dict[int, list[tuple[str, int]]] = {}
+
+    def add(qid: int, variant: str, index: int) -> None:
+        key = (qid, normalize_choice(variant))
+        existing = lookup.setdefault(key, index)
+        if existing != index:
+            logger.warning("[choices] variante ambiguë q=%s '%s' (%s / %s)", qid, variant, existing, index)
+
+    # Libellés complets d'abord : ils priment sur les préfixes en cas de collision
+    for lang in ("fr", "en"):
+        for qid, choices in labels[lang].items():
+            for index, label in enumerate(choices):
+                add(qid, label, index)
+
+    for lang in ("fr", "en"):
+        for qid, choices in labels[lang].items():
+            for index, label in enumerate(choices):
+                label_prefix = _prefix(normalize_choice(label))
+                add(qid, label_prefix, index)
+                prefixes.setdefault(qid, []).append((label_prefix, index))
+
+    # Clés courtes FR utilisées historiquement par le scoring
+    for qid, en_to_fr in EN_TO_FR_CHOICES.items():
+        en_labels = labels["en"].get(qid, [])
+        for en_label, fr_key in en_to_fr.items():
+            if en_label in en_labels:
+                add(qid, fr_key, en_labels.index(en_label))
+
+    # Clés du mapping de scoring : correspondance par libellé, préfixe, puis position
+    for qid_str, question in note_mapping.get("questions", {}).items():
+        qid = int(qid_str)
+        for position, mapping_key in enumerate(question.get("choices", {})):
+            norm = normalize_choice(mapping_key)
+            index = lookup.get((qid, norm), lookup.get((qid, _prefix(norm))))
+            if index is None:
+                index = position
+                logger.info("[choices] clé de mapping q=%s '%s' rattachée par position (%s)", qid, mapping_key, index)
+            mapping_keys[(qid, index)] = mapping_key
+            add(qid, mapping_key, index)
+
+    return ChoiceIndex(
+        lookup=lookup,
+        mapping_keys=mapping_keys,
+        labels=labels,
+        prefixes=prefixes,
+    )
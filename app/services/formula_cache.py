@@ -0,0 +1,71 @@
+"""Cache LRU borné des formules générées.
+
+Les clés sont des formes canoniques des entrées de génération (réponses
+résolues, ingrédients bloqués, langue, type forcé). Le cache est vidé dès que
+la version du catalogue change. Les valeurs sont des formules immuables
+(voir formula_model) : elles sont stockées et retournées telles quelles,
+sans copie.
+"""
+
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Hashable
+
+
+class FormulaCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = Lock()
+        self._version: str | None = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_version(self, version: str) -> None:
+        if version != self._version:
+            if self._data:
+                self.invalidations += 1
+                self._data.clear()
+            self._version = version
+
+    def get(self, key: Hashable, version: str) -> Any | None:
+        with self._lock:
+            self._check_version(version)
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any, version: str) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._check_version(version)
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "catalog_version": self._version,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
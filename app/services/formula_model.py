@@ -0,0 +1,229 @@
+"""Représentation interne des formules.
+
+Les ingrédients sont des enregistrements immuables, construits une fois par
+version du catalogue (voir catalog_index) et partagés par référence entre
+toutes les formules. Une formule ne garde que son profil, son type, ses notes
+et son booster : les noms traduits, le détail des notes et les quantités par
+format sont dérivés à la sérialisation (to_dict), à la frontière de l'API,
+et seulement pour les formats demandés (voir SizesView).
+"""
+
+from dataclasses import dataclass, replace
+from typing import Literal
+
+NOTE_KEYS = ("top_notes", "heart_notes", "base_notes")
+CATEGORY_TO_KEY = {"top": "top_notes", "heart": "heart_notes", "base": "base_notes"}
+SIZES_ML = (10, 30, 50)
+
+# Formats renvoyés par l'API (paramètre de requête ?sizes=) :
+#   all      → details + les 3 blocs sizes (forme historique)
+#   10ml…    → details + un seul bloc sizes
+#   compact  → noms des notes, booster et ml par catégorie, sans details ni sizes
+SizesView = Literal["all", "10ml", "30ml", "50ml", "compact"]
+
+# ── Configuration des types de formules ──────────────────────────────
+#
+# Tableau des formules :
+#
+# Frais/léger  (3T + 3H + 2B)
+#   10ml : top=1ml  heart=1ml  base=2ml  booster=1ml   → total=10ml  (+1ml booster=11ml)
+#   30ml : top=3ml  heart=3ml  base=6ml  booster=3ml   → total=30ml  (+3ml booster=33ml)
+#   50ml : top=5ml  heart=5ml  base=10ml booster=5ml   → total=50ml  (+5ml booster=55ml)
+#
+# Mix          (2T + 3H + 2B)  — le booster "remplace" la note de tête manquante
+#   10ml : top=1ml  heart=1ml  base=2ml  booster=1ml   → notes=9ml   total=10ml
+#   30ml : top=3ml  heart=3ml  base=6ml  booster=3ml   → notes=27ml  total=30ml
+#   50ml : top=5ml  heart=5ml  base=10ml booster=5ml   → notes=45ml  total=50ml
+#
+# Puissant/fort (2T + 2H + 3B)
+#   10ml : top=1ml  heart=1ml  base=2ml  booster=1ml   → total=10ml  (+1ml booster=11ml)
+#   30ml : top=2ml  heart=4ml  base=6ml  booster=3ml   → total=30ml  (+3ml booster=33ml)
+#   50ml : top=4ml  heart=6ml  base=10ml booster=5ml   → total=50ml  (+5ml booster=55ml)
+
+FORMULA_TYPE_CONFIGS: dict[str, dict] = {
+    "frais": {
+        "note_counts": {"top": 3, "heart": 3, "base": 2},
+        "sizes": {
+            10: {"top_ml": 1, "heart_ml": 1, "base_ml": 2, "booster_ml": 1},
+            30: {"top_ml": 3, "heart_ml": 3, "base_ml": 6, "booster_ml": 3},
+            50: {"top_ml": 5, "heart_ml": 5, "base_ml": 10, "booster_ml": 5},
+        },
+    },
+    "mix": {
+        "note_counts": {"top": 2, "heart": 3, "base": 2},
+        "sizes": {
+            10: {"top_ml": 1, "heart_ml": 1, "base_ml": 2, "booster_ml": 1},
+            30: {"top_ml": 3, "heart_ml": 3, "base_ml": 6, "booster_ml": 3},
+            50: {"top_ml": 5, "heart_ml": 5, "base_ml": 10, "booster_ml": 5},
+        },
+    },
+    "puissant": {
+        "note_counts": {"top": 2, "heart": 2, "base": 3},
+        "sizes": {
+            10: {"top_ml": 1, "heart_ml": 1, "base_ml": 2, "booster_ml": 1},
+            30: {"top_ml": 2, "heart_ml": 4, "base_ml": 6, "booster_ml": 3},
+            50: {"top_ml": 4, "heart_ml": 6, "base_ml": 10, "booster_ml": 5},
+        },
+    },
+}
+
+
+def size_quantities(formula_type: str) -> dict[str, dict[str, int]]:
+    """ml par catégorie de note et par format ({"10ml": {"top_ml": 1, …}, …})."""
+    sizes = FORMULA_TYPE_CONFIGS[formula_type]["sizes"]
+    return {f"{ml}ml": dict(sizes[ml]) for ml in SIZES_ML}
+
+
+def size_block(
+    formula_type: str,
+    language: str,
+    notes: dict[str, tuple["Ingredient", ...]],
+    booster: str,
+    target_ml: int,
+) -> dict:
+    """Quantités en ml de chaque note pour un format (10 / 30 / 50)."""
+    config = FORMULA_TYPE_CONFIGS[formula_type]["sizes"][target_ml]
+    result = {"target_ml": target_ml, "formula_type": formula_type}
+    for key, ml_key in zip(NOTE_KEYS, ("top_ml", "heart_ml", "base_ml")):
+        result[key] = [
+            {**note.detail(language), "ml": config[ml_key]}
+            for note in notes.get(key, ())
+        ]
+    result["boosters"] = [{"name": booster, "ml": config["booster_ml"]}]
+    return result
+
+
+def view_sizes(view: SizesView) -> tuple[int, ...]:
+    return SIZES_ML if view == "all" else (int(view.removesuffix("ml")),)
+
+
+def stored_sizes(formula: dict) -> dict:
+    """Colonne sizes d'une formule en base : seul le booster est conservé.
+
+    Les ml se déduisent du type de formule et le détail des notes du catalogue
+    (voir formula_service.expand_stored_sizes). Une formule d'un type inconnu
+    est conservée telle quelle.
+    """
+    sizes = formula.get("sizes") or {}
+    if formula.get("formula_type") not in FORMULA_TYPE_CONFIGS:
+        return sizes
+    booster = formula.get("booster") or sizes.get("booster")
+    if booster is None:
+        for block in sizes.values():
+            if isinstance(block, dict) and block.get("boosters"):
+                booster = block["boosters"][0].get("name")
+                break
+    return {"booster": booster}
+
+
+@dataclass(frozen=True, slots=True)
+class Ingredient:
+    position: str
+    name: str  # nom EN (référence des scores, allergènes, exclusions)
+    family: str
+    description: str
+    note_type: str
+    profile_1: str | None
+    profile_2: str | None
+    name_fr: str
+
+    def display_name(self, language: str) -> str:
+        return self.name_fr if language == "fr" else self.name
+
+    def detail(self, language: str) -> dict:
+        return {
+            "position": self.position,
+            "name": self.display_name(language),
+            "family": self.family,
+            "description": self.description,
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class Formula:
+    profile: str
+    formula_type: str
+    description: str
+    language: str
+    top_notes: tuple[Ingredient, ...]
+    heart_notes: tuple[Ingredient, ...]
+    base_notes: tuple[Ingredient, ...]
+    booster: str
+    catalog_version: str
+
+    def notes(self, key: str) -> tuple[Ingredient, ...]:
+        return getattr(self, key)
+
+    def note_names(self) -> set[str]:
+        """Noms EN de toutes les notes de la formule."""
+        return {note.name for key in NOTE_KEYS for note in self.notes(key)}
+
+    def with_note(self, key: str, index: int, ingredient: Ingredient) -> "Formula":
+        notes = list(self.notes(key))
+        notes[index] = ingredient
+        return replace(self, **{key: tuple(notes)})
+
+    def size(self, target_ml: int) -> dict:
+        """Quantités en ml pour un format (10 / 30 / 50)."""
+        notes = {key: self.notes(key) for key in NOTE_KEYS}
+        return size_block(self.formula_type, self.language, notes, self.booster, target_ml)
+
+    def to_dict(self, sizes: SizesView = "all") -> dict:
+        """Forme JSON de l'API. Par défaut (sizes="all"), inchangée depuis les formules en dict."""
+        names = {
+            key: [note.display_name(self.language) for note in self.notes(key)]
+            for key in NOTE_KEYS
+        }
+        head = {
+            "profile": self.profile,
+            "formula_type": self.formula_type,
+            "description": self.description,
+            **names,
+        }
+        if sizes == "compact":
+            return {
+                **head,
+                "booster": self.booster,
+                "quantities": size_quantities(self.formula_type),
+                "catalog_version": self.catalog_version,
+            }
+        return {
+            **head,
+            "details": {
+                key: [note.detail(self.language) for note in self.notes(key)]
+                for key in NOTE_KEYS
+            },
+            "sizes": {f"{ml}ml": self.size(ml) for ml in view_sizes(sizes)},
+            "catalog_version": self.catalog_version,
+        }
+
+    def to_record(self) -> dict:
+        """Forme stockée hors du process (session store Redis) : positions des notes."""
+        return {
+            "profile": self.profile,
+            "formula_type": self.formula_type,
+            "description": self.description,
+            "language": self.language,
+            **{key: [note.position for note in self.notes(key)] for key in NOTE_KEYS},
+            "booster": self.booster,
+            "catalog_version": self.catalog_version,
+        }
+
+    @classmethod
+    def from_record(cls, record: dict, by_position: dict[str, Ingredient]) -> "Formula":
+        """Inverse de to_record ; KeyError si une position manque au catalogue."""
+        return cls(**{
+            **record,
+            **{key: tuple(by_position[position] for position in record[key]) for key in NOTE_KEYS},
+        })
+
+
+def jsonable(value, sizes: SizesView = "all"):
+    """Remplace récursivement les Formula d'une réponse de service par leur forme JSON."""
+    if isinstance(value, Formula):
+        return value.to_dict(sizes)
+    if isinstance(value, dict):
+        return {k: jsonable(v, sizes) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [jsonable(v, sizes) for v in value]
+    return value
@@ -0,0 +1,204 @@
+"""Recherche de la meilleure combinaison de notes sous contraintes.
+
+Chaque catégorie (top / heart / base) fournit ses candidats triés par score
+décroissant ; une combinaison prend k notes par catégorie et vaut la somme
+des scores de ses notes. Deux niveaux :
+
+  - SubsetStream : les sous-ensembles de k candidats d'une catégorie, dans
+    l'ordre des sommes décroissantes, produits à la demande. Le meilleur est
+    (0, 1, …, k-1) ; les successeurs d'un sous-ensemble décalent un de ses
+    indices d'un cran. Chaque sous-ensemble porte un coût (vecteur d'entiers).
+  - best_combination : recherche best-first (A*) sur les catégories. Les
+    coûts s'additionnent coordonnée par coordonnée ; une branche dont une
+    coordonnée dépasse le plafond est coupée. Les sous-ensembles d'une
+    catégorie sont regroupés par coût ; le majorant d'une branche est le
+    meilleur total que les catégories restantes peuvent atteindre avec la
+    capacité restante (mémoïsé par catégorie et capacité). Les combinaisons complètes sortent
+    donc par total décroissant, et seules celles qui battent la réponse sont
+    soumises à build.
+
+À égalité de total, la première entrée ajoutée à la file passe d'abord : le
+résultat est déterministe.
+"""
+
+import heapq
+from dataclasses import dataclass
+from itertools import combinations, count
+from typing import Callable, Sequence, TypeVar
+
+T = TypeVar("T")
+
+# Nombre de formules demandé par défaut (formule principale + alternative)
+DEFAULT_FORMULA_COUNT = 2
+MAX_FORMULA_COUNT = 6
+
+
+@dataclass(frozen=True, slots=True)
+class DiversityOptions:
+    """Contraintes de diversité entre les formules proposées.
+
+    max_overlap : nombre maximal de notes partagées entre deux formules
+    (0 : aucune note commune, comme la paire historique).
+    distinct_profiles : chaque formule prend un profil différent des précédentes.
+    """
+
+    count: int = DEFAULT_FORMULA_COUNT
+    max_overlap: int = 0
+    distinct_profiles: bool = True
+
+
+class SubsetStream:
+    """Sous-ensembles de k indices d'une liste de scores triés, par somme décroissante."""
+
+    __slots__ = ("_scores", "_k", "_cost", "_heap", "_seen", "_groups", "items")
+
+    def __init__(
+        self,
+        scores: Sequence[float],
+        k: int,
+        cost: Callable[[tuple[int, ...]], tuple[int, ...]] | None = None,
+    ):
+        self._scores = scores
+        self._k = min(k, len(scores))
+        self._cost = cost
+        first = tuple(range(self._k))
+        self._heap = [(-self._sum(first), first)]
+        self._seen = {first}
+        self._groups: dict[tuple[int, ...], list[tuple[float, tuple[int, ...]]]] | None = None
+        # (somme, indices, coût) déjà dépilés, par rang
+        self.items: list[tuple[float, tuple[int, ...], tuple[int, ...]]] = []
+
+    def _sum(self, indices: tuple[int, ...]) -> float:
+        # Recalculée plutôt que mise à jour par différence : pas de dérive sur les égalités
+        return sum(self._scores[i] for i in indices)
+
+    def get(self, rank: int) -> tuple[float, tuple[int, ...], tuple[int, ...]] | None:
+        """Le sous-ensemble de rang donné, ou None si le flux est épuisé."""
+        scores, heap, seen = self._scores, self._heap, self._seen
+        while len(self.items) <= rank:
+            if not heap:
+                return None
+            neg_total, indices = heapq.heappop(heap)
+            for j, i in enumerate(indices):
+                limit = indices[j + 1] if j + 1 < len(indices) else len(scores)
+                if i + 1 < limit:
+                    successor = indices[:j] + (i + 1,) + indices[j + 1:]
+                    if successor not in seen:
+                        seen.add(successor)
+                        heapq.heappush(heap, (-self._sum(successor), successor))
+            self.items.append((-neg_total, indices, self._cost(indices) if self._cost else ()))
+        return self.items[rank]
+
+    def groups(self) -> list[tuple[tuple[int, ...], Callable[[int], tuple | None]]]:
+        """(coût, accès par rang) par groupe de même coût, chaque groupe par somme décroissante.
+
+        Sans fonction de coût, un seul groupe parcouru à la demande ; sinon le
+        flux est matérialisé une fois pour regrouper ses sous-ensembles.
+        """
+        if self._cost is None:
+            return [((), self.get)]
+        if self._groups is None:
+            # Tri direct de toutes les combinaisons : même ordre que le tas (somme, puis indices)
+            ordered = sorted(
+                ((self._sum(indices), indices) for indices in combinations(range(len(self._scores)), self._k)),
+                key=lambda item: (-item[0], item[1]),
+            )
+            self.items = [(total, indices, self._cost(indices)) for total, indices in ordered]
+            self._heap.clear()
+            self._groups = {}
+            for total, indices, cost in self.items:
+                self._groups.setdefault(cost, []).append((total, indices))
+        # Groupes dans l'ordre de leur meilleur sous-ensemble (l'ordre des items)
+        return [
+            (cost, lambda rank, entries=entries: entries[rank] if rank < len(entries) else None)
+            for cost, entries in self._groups.items()
+        ]
+
+
+def _consume(capacity: tuple[int, ...], cost: tuple[int, ...]) -> tuple[int, ...] | None:
+    """Capacité restante après un coût ; None si une coordonnée passe sous zéro."""
+    left = tuple(a - b for a, b in zip(capacity, cost))
+    return None if left and min(left) < 0 else left
+
+
+def best_combination(
+    streams: Sequence[SubsetStream],
+    build: Callable[[tuple[tuple[int, ...], ...]], T | None],
+    max_cost: int = 0,
+    budget: int | None = None,
+) -> T | None:
+    """Résultat de build() pour la combinaison de total maximal qu'il accepte.
+
+    build reçoit les indices choisis dans chaque flux et renvoie None pour
+    refuser la combinaison. Les coûts des sous-ensembles s'additionnent
+    coordonnée par coordonnée ; aucune coordonnée ne doit dépasser max_cost.
+    budget borne le nombre d'entrées dépilées (None une fois épuisé).
+    """
+    heads = [stream.get(0) for stream in streams]
+    if any(head is None for head in heads):
+        return None
+    # Cas courant : la meilleure combinaison sans contrainte respecte déjà le plafond
+    head_cost = [sum(spent) for spent in zip(*(head[2] for head in heads))]
+    if not head_cost or max(head_cost) <= max_cost:
+        result = build(tuple(head[1] for head in heads))
+        if result is not None:
+            return result
+
+    levels = [stream.groups() for stream in streams]
+    width = next((len(cost) for groups in levels for cost, _ in groups), 0)
+    bounds: dict[tuple[int, tuple[int, ...]], float] = {}
+
+    def bound(c: int, capacity: tuple[int, ...]) -> float:
+        """Meilleur total des catégories c et suivantes sans dépasser la capacité (-inf : impossible)."""
+        if c == len(levels):
+            return 0.0
+        key = (c, capacity)
+        if key not in bounds:
+            best_rest = float("-inf")
+            for group_cost, entry in levels[c]:
+                left = _consume(capacity, group_cost)
+                if left is not None:
+                    best_rest = max(best_rest, entry(0)[0] + bound(c + 1, left))
+            bounds[key] = best_rest
+        return bounds[key]
+
+    # File de priorité (A*) : priorité = total engagé + majorant des catégories restantes.
+    # Une entrée désigne le sous-ensemble de rang donné d'un groupe, après un préfixe ;
+    # son frère (rang suivant) n'est ajouté qu'une fois l'entrée dépilée.
+    heap: list[tuple] = []
+    order = count()
+
+    def push(c: int, group: int, rank: int, total: float, rest: float, capacity: tuple[int, ...], prefix: tuple) -> None:
+        item = levels[c][group][1](rank)
+        if item is not None:
+            heapq.heappush(heap, (-(total + item[0] + rest), next(order), c, group, rank, total, rest, capacity, prefix))
+
+    def expand(c: int, total: float, capacity: tuple[int, ...], prefix: tuple) -> None:
+        for group, (group_cost, _) in enumerate(levels[c]):
+            left = _consume(capacity, group_cost)
+            if left is not None and (rest := bound(c + 1, left)) > float("-inf"):
+                push(c, group, 0, total, rest, left, prefix)
+
+    try:
+        expand(0, 0.0, (max_cost,) * width, ())
+        steps = 0
+        while heap:
+            _, _, c, group, rank, total, rest, capacity, prefix = heapq.heappop(heap)
+            steps += 1
+            if budget is not None and steps > budget:
+                return None
+            push(c, group, rank + 1, total, rest, capacity, prefix)
+
+            item = levels[c][group][1](rank)
+            selection = prefix + (item[1],)
+            if c + 1 < len(levels):
+                expand(c + 1, total + item[0], capacity, selection)
+            else:
+                # Feuilles dépilées par total décroissant : la première acceptée est la meilleure
+                result = build(selection)
+                if result is not None:
+                    return result
+        return None
+    finally:
+        # bound se référence lui-même : cycle rompu sans attendre le ramasse-miettes
+        bound = None  # noqa: F841
@@ -1,8 +1,11 @@
 """Service de génération de formules de parfum.
 
-Charge les données du coffret (XLSX) une seule fois en mémoire,
-puis génère 2 formules personnalisées à partir des réponses utilisateur.
-Calcule les quantités en ml pour 3 formats (10ml, 30ml, 50ml).
+Charge le catalogue du coffret (précompilé depuis le XLSX) une seule fois en mémoire,
+puis génère des formules personnalisées à partir des réponses utilisateur
+(2 par défaut : la meilleure et une alternative, voir _build_formulas).
+Les formules sont des objets Formula compacts (voir formula_model) : les
+quantités en ml pour les 3 formats (10ml, 30ml, 50ml) sont dérivées à la
+sérialisation.
 
 Architecture :
   1. Réponses questionnaire → scoring direct des notes (note_scoring_mapping.json)
@@ -12,189 +15,39 @@ Architecture :
   5. Calcul des ml selon le tableau des formules
 """
 
+import heapq
 import json
 from collections import defaultdict
-from pathlib import Path
-
-import openpyxl
 
+from app.data.boosters import BOOSTERS
 from app.data.choice_profile_mapping import (
-    INGREDIENT_EN_TO_FR,
     PROFILE_DESCRIPTIONS,
     PROFILE_DESCRIPTIONS_EN,
     PROFILE_GENDERS,
 )
-from app.data.questions import EN_TO_FR_CHOICES
 from app.config import get_settings
-from app.services import mail_service, session_store
-
-# ── Chemins ───────────────────────────────────────────────────────────
-_DATA_DIR = Path(__file__).resolve().parent.parent / "data"
-_XLSX_PATH = _DATA_DIR / "Coffret-description.xlsx"
-_NOTE_SCORING_PATH = _DATA_DIR / "note_scoring_mapping.json"
-
-# ── Cache mémoire (chargé une seule fois) ─────────────────────────────
-_coffret: dict | None = None
-_note_scoring_mapping: dict | None = None
-
-
-# ── Normalisation des noms de profils ─────────────────────────────────
-_PROFILE_NORMALIZE = {
-    "stratégist": "Strategist",
-    "strategist": "Strategist",
-    "disrupteur": "Disruptor",
-    "disruptor": "Disruptor",
-    "trail blazer": "Trailblazer",
-    "trailblazer": "Trailblazer",
-    "visionary": "Visionary",
-    "visionnary": "Visionary",
-    "innovator": "Innovator",
-    "creator": "Creator",
-    "influencer": "Influencer",
-    "icon": "Icon",
-    "cosy": "Cosy",
-}
-
-
-def _normalize_profile(raw: str | None) -> str | None:
-    if not raw:
-        return None
-    return _PROFILE_NORMALIZE.get(raw.strip().lower(), raw.strip())
-
-
-# ── Chargement du XLSX ────────────────────────────────────────────────
-
-def _load_coffret() -> dict:
-    """Parse le XLSX et retourne les ingrédients + allergènes."""
-    wb = openpyxl.load_workbook(_XLSX_PATH, read_only=True, data_only=True)
-
-    ws = wb[wb.sheetnames[0]]
-    ingredients = []
-
-    note_ranges = [
-        ("top", 7, 16),
-        ("heart", 21, 30),
-        ("base", 35, 44),
-    ]
-
-    for note_type, start, end in note_ranges:
-        for row in ws.iter_rows(min_row=start, max_row=end, min_col=1, max_col=8):
-            position = row[0].value
-            if not position:
-                continue
-            ingredients.append({
-                "position": position,
-                "name": row[1].value,
-                "family": row[2].value,
-                "description": row[3].value,
-                "note_type": note_type,
-                "profile_1": _normalize_profile(row[6].value),
-                "profile_2": _normalize_profile(row[7].value),
-            })
-
-    ws2 = wb["ALLERGENS"]
-
-    allergen_blocks = [
-        (4, 6, 31),
-        (33, 35, 60),
-        (62, 64, 89),
-    ]
-
-    allergen_map: dict[str, set[str]] = defaultdict(set)
-
-    for header_row, data_start, data_end in allergen_blocks:
-        header_cells = list(ws2.iter_rows(
-            min_row=header_row, max_row=header_row,
-            min_col=2, max_col=11,
-        ))[0]
-        col_to_ingredient = {}
-        for cell in header_cells:
-            if cell.value:
-                col_to_ingredient[cell.column] = cell.value.strip()
-
-        for row in ws2.iter_rows(
-            min_row=data_start, max_row=data_end,
-            min_col=1, max_col=11,
-        ):
-            allergen_name = row[0].value
-            if not allergen_name:
-                continue
-            allergen_name = allergen_name.strip()
-            for cell in row[1:]:
-                if cell.value and str(cell.value).strip().lower() == "x":
-                    ingredient_name = col_to_ingredient.get(cell.column)
-                    if ingredient_name:
-                        allergen_map[ingredient_name].add(allergen_name)
-
-    wb.close()
+from app.services import catalog_service, mail_service, session_store
+from app.services.catalog_service import _PROFILE_NORMALIZE
+from app.services.formula_cache import FormulaCache
+from app.services.formula_model import (
+    CATEGORY_TO_KEY,
+    FORMULA_TYPE_CONFIGS,
+    NOTE_KEYS,
+    Formula,
+    Ingredient,
+    SizesView,
+    size_block,
+    size_quantities,
+    view_sizes,
+)
+from app.services.formula_search import DiversityOptions, SubsetStream, best_combination
+from app.services.scoring_matrix import ScoringMatrix
 
-    return {
-        "ingredients": ingredients,
-        "allergen_map": dict(allergen_map),
-    }
+# ── Cache LRU des formules générées ───────────────────────────────────
+_FORMULA_CACHE_SIZE = 2048
+_formula_cache = FormulaCache(maxsize=_FORMULA_CACHE_SIZE)
 
 
-def _get_coffret() -> dict:
-    global _coffret
-    if _coffret is None:
-        _coffret = _load_coffret()
-    return _coffret
-
-
-def _get_note_scoring_mapping() -> dict:
-    global _note_scoring_mapping
-    if _note_scoring_mapping is None:
-        with open(_NOTE_SCORING_PATH, encoding="utf-8") as f:
-            _note_scoring_mapping = json.load(f)
-    return _note_scoring_mapping
-
-
-# ── Configuration des types de formules ──────────────────────────────
-#
-# Tableau des formules :
-#
-# Frais/léger  (3T + 3H + 2B)
-#   10ml : top=1ml  heart=1ml  base=2ml  booster=1ml   → total=10ml  (+1ml booster=11ml)
-#   30ml : top=3ml  heart=3ml  base=6ml  booster=3ml   → total=30ml  (+3ml booster=33ml)
-#   50ml : top=5ml  heart=5ml  base=10ml booster=5ml   → total=50ml  (+5ml booster=55ml)
-#
-# Mix          (2T + 3H + 2B)  — le booster "remplace" la note de tête manquante
-#   10ml : top=1ml  heart=1ml  base=2ml  booster=1ml   → notes=9ml   total=10ml
-#   30ml : top=3ml  heart=3ml  base=6ml  booster=3ml   → notes=27ml  total=30ml
-#   50ml : top=5ml  heart=5ml  base=10ml booster=5ml   → notes=45ml  total=50ml
-#
-# Puissant/fort (2T + 2H + 3B)
-#   10ml : top=1ml  heart=1ml  base=2ml  booster=1ml   → total=10ml  (+1ml booster=11ml)
-#   30ml : top=2ml  heart=4ml  base=6ml  booster=3ml   → total=30ml  (+3ml booster=33ml)
-#   50ml : top=4ml  heart=6ml  base=10ml booster=5ml   → total=50ml  (+5ml booster=55ml)
-
-_FORMULA_TYPE_CONFIGS: dict[str, dict] = {
-    "frais": {
-        "note_counts": {"top": 3, "heart": 3, "base": 2},
-        "sizes": {
-            10: {"top_ml": 1, "heart_ml": 1, "base_ml": 2, "booster_ml": 1},
-            30: {"top_ml": 3, "heart_ml": 3, "base_ml": 6, "booster_ml": 3},
-            50: {"top_ml": 5, "heart_ml": 5, "base_ml": 10, "booster_ml": 5},
-        },
-    },
-    "mix": {
-        "note_counts": {"top": 2, "heart": 3, "base": 2},
-        "sizes": {
-            10: {"top_ml": 1, "heart_ml": 1, "base_ml": 2, "booster_ml": 1},
-            30: {"top_ml": 3, "heart_ml": 3, "base_ml": 6, "booster_ml": 3},
-            50: {"top_ml": 5, "heart_ml": 5, "base_ml": 10, "booster_ml": 5},
-        },
-    },
-    "puissant": {
-        "note_counts": {"top": 2, "heart": 2, "base": 3},
-        "sizes": {
-            10: {"top_ml": 1, "heart_ml": 1, "base_ml": 2, "booster_ml": 1},
-            30: {"top_ml": 2, "heart_ml": 4, "base_ml": 6, "booster_ml": 3},
-            50: {"top_ml": 4, "heart_ml": 6, "base_ml": 10, "booster_ml": 5},
-        },
-    },
-}
-
 # Genre du profil → type de formule
 _PROFILE_GENDER_TO_FORMULA_TYPE: dict[str, str] = {
     "masculine": "puissant",
@@ -205,86 +58,47 @@ _PROFILE_GENDER_TO_FORMULA_TYPE: dict[str, str] = {
 
 # ── Scoring des notes ─────────────────────────────────────────────────
 
-def _resolve_en_choice(choice: str, qid: int, q_choices_mapping: dict) -> str:
-    """Résout un choix de réponse (FR ou EN) vers la clé anglaise du mapping."""
-    # Correspondance directe
-    if choice in q_choices_mapping:
-        return choice
-
-    # Correspondance par préfixe (avant " - ")
-    choice_prefix = choice.split(" - ")[0].strip().lower()
-    for key in q_choices_mapping:
-        if key.split(" - ")[0].strip().lower() == choice_prefix:
-            return key
-
-    # Reverse lookup FR → EN via EN_TO_FR_CHOICES
-    en_to_fr = EN_TO_FR_CHOICES.get(qid, {})
-    for en_key, fr_val in en_to_fr.items():
-        if fr_val.lower() == choice.lower():
-            en_prefix = en_key.split(" - ")[0].strip().lower()
-            for mapping_key in q_choices_mapping:
-                if mapping_key.split(" - ")[0].strip().lower() == en_prefix:
-                    return mapping_key
-            return en_key
+def _get_scoring_matrix() -> ScoringMatrix:
+    """Matrice de scoring du snapshot catalogue courant (voir catalog_service)."""
+    return catalog_service.get_scoring_matrix()
 
-    return choice
 
+def _collect_score_rows(answers: dict, matrix: ScoringMatrix) -> tuple[list[int], list[float]]:
+    """Résout les choix répondus en lignes de la matrice, avec leur poids."""
+    choice_index = catalog_service.get_choice_index()
 
-def _score_notes(answers: dict) -> dict[str, dict[str, float]]:
-    """Score toutes les notes du coffret à partir des réponses au questionnaire.
-
-    Scoring par catégorie indépendant (top / heart / base).
-    top_2 choice → poids ×2, bottom_2 choice → poids ×−1.
-    Fallback familles pour les notes sans score direct.
-    """
-    note_mapping = _get_note_scoring_mapping()
-    coffret = _get_coffret()
-
-    # Index des noms de notes par catégorie (noms anglais du coffret)
-    note_by_category: dict[str, set[str]] = {"top": set(), "heart": set(), "base": set()}
-    for ing in coffret["ingredients"]:
-        note_by_category[ing["note_type"]].add(ing["name"])
-
-    scores: dict[str, dict[str, float]] = {
-        "top": defaultdict(float),
-        "heart": defaultdict(float),
-        "base": defaultdict(float),
-    }
+    rows: list[int] = []
+    weights: list[float] = []
 
     for qid_str, answer_data in answers.items():
         qid = int(qid_str)
-        q_choices = note_mapping["questions"].get(str(qid), {}).get("choices", {})
 
         if isinstance(answer_data, str):
             answer_data = json.loads(answer_data)
 
-        def apply_choice(choice: str, weight: float) -> None:
-            en_choice = _resolve_en_choice(choice, qid, q_choices)
-            choice_data = q_choices.get(en_choice, {})
+        for key, weight in (("top_2", 2.0), ("bottom_2", -1.0)):
+            for choice in answer_data.get(key, []):
+                index = choice_index.resolve(qid, choice)
+                if index is None:
+                    continue
+                row = matrix.row(qid, choice_index.mapping_key(qid, index))
+                if row is not None:
+                    rows.append(row)
+                    weights.append(weight)
 
-            # Scores directs sur les notes nommées
-            note_scores = choice_data.get("notes", {})
-            for note_name, score in note_scores.items():
-                for cat, cat_notes in note_by_category.items():
-                    if note_name in cat_notes:
-                        scores[cat][note_name] += score * weight
+    return rows, weights
 
-            # Fallback familles pour les notes non citées directement
-            families = choice_data.get("families", {})
-            if families:
-                for ing in coffret["ingredients"]:
-                    if ing["name"] in note_scores:
-                        continue
-                    fam_score = families.get(ing["family"], 0)
-                    if fam_score:
-                        scores[ing["note_type"]][ing["name"]] += fam_score * weight
 
-        for choice in answer_data.get("top_2", []):
-            apply_choice(choice, weight=2.0)
-        for choice in answer_data.get("bottom_2", []):
-            apply_choice(choice, weight=-1.0)
+def _score_notes(answers: dict) -> dict[str, dict[str, float]]:
+    """Score toutes les notes du coffret à partir des réponses au questionnaire.
 
-    return {cat: dict(s) for cat, s in scores.items()}
+    Scoring par catégorie indépendant (top / heart / base).
+    top_2 choice → poids ×2, bottom_2 choice → poids ×−1.
+    Fallback familles pour les notes sans score direct (intégré à la matrice).
+    """
+    matrix = _get_scoring_matrix()
+    rows, weights = _collect_score_rows(answers, matrix)
+    return matrix.score(rows, weights)
 
 
 # ── Sélection des notes ───────────────────────────────────────────────
@@ -294,49 +108,23 @@ def _select_notes_by_score(
     max_per_cat: int = 3,
     excluded_names: set[str] | None = None,
     blocked_names: set[str] | None = None,
-) -> dict[str, list[dict]]:
+) -> dict[str, list[Ingredient]]:
     """Sélectionne les meilleures notes par catégorie selon les scores.
 
     Si tous les scores sont nuls, utilise l'ordre de position comme fallback.
     """
-    coffret = _get_coffret()
-    excluded = excluded_names or set()
-    blocked = blocked_names or set()
-
-    cat_to_key = {"top": "top_notes", "heart": "heart_notes", "base": "base_notes"}
-    result: dict[str, list[dict]] = {}
-
-    for cat, key in cat_to_key.items():
-        cat_scores = note_scores.get(cat, {})
-        cat_ingredients = [
-            ing for ing in coffret["ingredients"]
-            if ing["note_type"] == cat
-            and ing["name"] not in excluded
-            and ing["name"] not in blocked
-        ]
-
-        # Tri : score décroissant, puis position alphabétique comme tiebreaker
-        sorted_ing = sorted(
-            cat_ingredients,
-            key=lambda x: (-cat_scores.get(x["name"], 0), x["position"]),
-        )
-        selected = sorted_ing[:max_per_cat]
-
-        result[key] = [
-            {
-                "position": ing["position"],
-                "name": ing["name"],
-                "family": ing["family"],
-                "description": ing["description"],
-            }
-            for ing in selected
-        ]
+    index = catalog_service.get_catalog_index()
+    skip = (excluded_names or set()) | (blocked_names or set())
 
-    return result
+    # Top-k par tas : score décroissant, puis position comme tiebreaker
+    return {
+        key: index.top_k(cat, note_scores.get(cat, {}), max_per_cat, skip)
+        for cat, key in CATEGORY_TO_KEY.items()
+    }
 
 
 def _derive_profile_from_notes(
-    selected_notes: dict[str, list[dict]],
+    selected_notes: dict[str, list[Ingredient]],
     excluded_profiles: set[str] | None = None,
 ) -> str:
     """Dérive le profil dominant à partir des notes sélectionnées.
@@ -344,19 +132,15 @@ def _derive_profile_from_notes(
     Utilise les champs profile_1 (poids 2) et profile_2 (poids 1) du XLSX.
     Les profils dans excluded_profiles sont ignorés.
     """
-    coffret = _get_coffret()
-    ing_by_name = {ing["name"]: ing for ing in coffret["ingredients"]}
+    profile_weights = catalog_service.get_catalog_index().profile_weights
     excluded = excluded_profiles or set()
 
     profile_counts: dict[str, int] = defaultdict(int)
-    for key in ("top_notes", "heart_notes", "base_notes"):
+    for key in NOTE_KEYS:
         for note in selected_notes.get(key, []):
-            ing = ing_by_name.get(note["name"])
-            if ing:
-                if ing["profile_1"] and ing["profile_1"] not in excluded:
-                    profile_counts[ing["profile_1"]] += 2
-                if ing["profile_2"] and ing["profile_2"] not in excluded:
-                    profile_counts[ing["profile_2"]] += 1
+            for profile, weight in profile_weights.get(note.name, ()):
+                if profile not in excluded:
+                    profile_counts[profile] += weight
 
     if not profile_counts:
         # Fallback : premier profil connu qui ne soit pas exclu
@@ -374,96 +158,47 @@ def _classify_formula_type(profile_name: str) -> str:
     return _PROFILE_GENDER_TO_FORMULA_TYPE[profile_gender]
 
 
-def _get_blocked_ingredients(user_allergens: list[str] | None) -> set[str]:
-    """Retourne les noms d'ingrédients bloqués en raison des allergènes déclarés."""
-    if not user_allergens:
-        return set()
-    coffret = _get_coffret()
-    allergen_map = coffret["allergen_map"]
-    user_allergens_lower = {a.strip().lower() for a in user_allergens}
-    blocked: set[str] = set()
-    for ingredient_name, allergens in allergen_map.items():
-        if {a.lower() for a in allergens} & user_allergens_lower:
-            blocked.add(ingredient_name)
-    return blocked
+def _resolve_allergies(has_allergies: str, user_allergens_raw: str) -> tuple[set[str], tuple[str, ...]]:
+    """Saisie libre d'allergies → (ingrédients bloqués, saisies sans correspondance).
 
+    Le résultat est mis en cache par saisie dans l'index : un même profil n'est
+    analysé qu'une fois, et un profil modifié est réanalysé automatiquement.
+    """
+    if has_allergies != "oui" or not user_allergens_raw:
+        return set(), ()
+    index = catalog_service.get_allergen_index()
+    mask, unmatched = index.match(user_allergens_raw)
+    return index.names(mask), unmatched
 
-# ── Boosters ─────────────────────────────────────────────────────────
 
-BOOSTERS = [
-    {
-        "name": "Floral",
-        "keywords": ["fleur", "rose", "jasmin", "muguet", "floral", "flower",
-                      "pétale", "bouquet", "pivoine", "iris", "ylang",
-                      "néroli", "magnolia", "tubéreuse", "gardénia"],
-    },
-    {
-        "name": "Ambre doux",
-        "keywords": ["ambre", "vanille", "oriental", "chaud", "doux", "warm",
-                      "amber", "gourmand", "caramel", "miel", "tonka",
-                      "baume", "résine", "encens", "oud", "boisé"],
-    },
-    {
-        "name": "Musc blanc sec",
-        "keywords": ["musc", "propre", "frais", "clean", "musk", "coton",
-                      "savon", "linge", "poudré", "aldéhyde", "blanc",
-                      "minéral", "ozonic", "aquatique", "agrume",
-                      "bergamote", "citron", "pamplemousse"],
-    },
-]
+def _profile_allergies(profile: dict) -> tuple[set[str], tuple[str, ...]]:
+    """Allergies déclarées dans un profil de session (voir _resolve_allergies)."""
+    return _resolve_allergies(profile.get("has_allergies", "non"), profile.get("allergies", ""))
 
 
-def _select_boosters(
-    ingredients: dict[str, list[dict]],
-    count: int = 1,
-) -> list[dict]:
-    """Sélectionne les meilleurs boosters par scoring de mots-clés sur les notes."""
-    text_parts: list[str] = []
-    for note_key in ("top_notes", "heart_notes", "base_notes"):
-        for note in ingredients.get(note_key, []):
-            for field in ("name", "family", "description"):
-                val = note.get(field)
-                if val:
-                    text_parts.append(val.lower())
-    combined = " ".join(text_parts)
-
-    scored: list[tuple[dict, int]] = []
-    for booster in BOOSTERS:
-        score = sum(1 for kw in booster["keywords"] if kw in combined)
-        scored.append((booster, score))
+@catalog_service.pinned()
+def get_unmatched_allergens(user_allergens_raw: str) -> list[str]:
+    """Saisies d'allergies qui ne correspondent à aucun allergène connu du coffret."""
+    return list(_resolve_allergies("oui", user_allergens_raw)[1])
 
-    scored.sort(key=lambda x: x[1], reverse=True)
-    return [b for b, _ in scored[:count]]
 
+# ── Boosters ─────────────────────────────────────────────────────────
 
-# ── Calcul des quantités en ml ────────────────────────────────────────
-
-def _compute_quantities(
-    selected_notes: dict[str, list[dict]],
-    booster: dict,
-    formula_type: str,
-    target_ml: int,
-) -> dict:
-    """Calcule les ml pour chaque note selon le type de formule et le volume cible."""
-    config = _FORMULA_TYPE_CONFIGS[formula_type]["sizes"][target_ml]
+def _select_boosters(
+    ingredients: dict[str, list[Ingredient]],
+    count: int = 1,
+) -> list[dict]:
+    """Sélectionne les meilleurs boosters par scoring de mots-clés sur les notes.
 
-    return {
-        "target_ml": target_ml,
-        "formula_type": formula_type,
-        "top_notes": [
-            {**note, "ml": config["top_ml"]}
-            for note in selected_notes.get("top_notes", [])
-        ],
-        "heart_notes": [
-            {**note, "ml": config["heart_ml"]}
-            for note in selected_notes.get("heart_notes", [])
-        ],
-        "base_notes": [
-            {**note, "ml": config["base_ml"]}
-            for note in selected_notes.get("base_notes", [])
-        ],
-        "boosters": [{"name": booster["name"], "ml": config["booster_ml"]}],
-    }
+    Les mots-clés présents dans chaque ingrédient sont précalculés au chargement
+    du catalogue (voir booster_index) : il ne reste qu'à combiner les masques.
+    """
+    index = catalog_service.get_booster_index()
+    hits = 0
+    for note_key in NOTE_KEYS:
+        for note in ingredients.get(note_key, []):
+            hits |= index.note_hits(note)
+    return index.rank(hits, count)
 
 
 # ── Construction d'une formule ────────────────────────────────────────
@@ -475,15 +210,13 @@ def _build_formula(
     language: str,
     force_type: str | None = None,
     excluded_profiles: set[str] | None = None,
-) -> dict:
+) -> Formula:
     """Construit une formule complète à partir des scores de notes.
 
-    Retourne le dict formule enrichi d'une clé interne '_selected_en_names'
-    (noms EN des notes utilisées) pour exclure ces notes de la formule suivante.
+    Les notes sont les ingrédients du catalogue, partagés par référence ;
+    formula.note_names() donne les noms EN pour exclure ces notes de la
+    formule suivante.
     """
-    descriptions = PROFILE_DESCRIPTIONS_EN if language == "en" else PROFILE_DESCRIPTIONS
-    translate_name = (lambda n: INGREDIENT_EN_TO_FR.get(n, n)) if language == "fr" else (lambda n: n)
-
     # 1. Sélection préliminaire max 3 par catégorie pour dériver le profil
     preliminary = _select_notes_by_score(
         note_scores,
@@ -491,179 +224,410 @@ def _build_formula(
         excluded_names=excluded_names,
         blocked_names=blocked_names,
     )
+    return _formula_from_notes(preliminary, language, force_type, excluded_profiles)
+
+
+def _formula_from_notes(
+    preliminary: dict[str, list[Ingredient]],
+    language: str,
+    force_type: str | None = None,
+    excluded_profiles: set[str] | None = None,
+) -> Formula:
+    """Étapes 2 à 5 de _build_formula, à partir d'une sélection préliminaire."""
+    descriptions = PROFILE_DESCRIPTIONS_EN if language == "en" else PROFILE_DESCRIPTIONS
 
     # 2. Dériver le profil dominant et le type de formule
     profile_name = _derive_profile_from_notes(preliminary, excluded_profiles=excluded_profiles)
-    formula_type = force_type if force_type in _FORMULA_TYPE_CONFIGS else _classify_formula_type(profile_name)
+    formula_type = force_type if force_type in FORMULA_TYPE_CONFIGS else _classify_formula_type(profile_name)
 
     # 3. Ajuster la sélection au nombre de notes du type de formule
-    type_counts = _FORMULA_TYPE_CONFIGS[formula_type]["note_counts"]
+    type_counts = FORMULA_TYPE_CONFIGS[formula_type]["note_counts"]
     selected_notes = {
-        "top_notes": preliminary["top_notes"][: type_counts["top"]],
-        "heart_notes": preliminary["heart_notes"][: type_counts["heart"]],
-        "base_notes": preliminary["base_notes"][: type_counts["base"]],
+        key: tuple(preliminary[key][: type_counts[cat]])
+        for cat, key in CATEGORY_TO_KEY.items()
     }
 
     # 4. Sélectionner le booster (1 seul)
     booster_list = _select_boosters(selected_notes, count=1)
     booster = booster_list[0] if booster_list else BOOSTERS[0]
 
-    # 5. Collecter les noms EN avant traduction (pour l'exclusion formule suivante)
-    selected_en_names = {n["name"] for v in selected_notes.values() for n in v}
+    # 5. Traductions et quantités sont dérivées à la sérialisation (Formula.to_dict)
+    return Formula(
+        profile=profile_name,
+        formula_type=formula_type,
+        description=descriptions.get(profile_name, ""),
+        language=language,
+        **selected_notes,
+        booster=booster["name"],
+        catalog_version=catalog_service.current().version,
+    )
+
 
-    # 6. Traduire les noms d'ingrédients pour l'affichage
-    translated = {
-        key: [{**n, "name": translate_name(n["name"])} for n in notes]
-        for key, notes in selected_notes.items()
-    }
+# ── K meilleures formules ─────────────────────────────────────────────
 
-    # 7. Calculer les quantités pour les 3 formats
-    sizes = {}
-    for target_ml in (10, 30, 50):
-        sizes[f"{target_ml}ml"] = _compute_quantities(
-            translated, booster, formula_type, target_ml
-        )
+# Candidats retenus par catégorie et par formule demandée (élagage des classements)
+_SEARCH_CANDIDATES_PER_FORMULA = 3
+# Sous-ensembles examinés au plus pour trouver chaque alternative (quelques ms)
+_SEARCH_BUDGET = 20_000
+
+
+def _is_diverse(formula: Formula, chosen: list[Formula], max_overlap: int) -> bool:
+    names = formula.note_names()
+    return all(
+        names != other and len(names & other) <= max_overlap
+        for other in (f.note_names() for f in chosen)
+    )
+
+
+def _search_formula(
+    note_scores: dict[str, dict[str, float]],
+    blocked_names: set[str],
+    language: str,
+    force_type: str | None,
+    excluded_profiles: set[str],
+    chosen: list[Formula],
+    options: DiversityOptions,
+) -> Formula | None:
+    """Meilleure formule partageant au plus options.max_overlap notes avec chaque formule de chosen.
+
+    Le type de formule n'étant connu qu'une fois le profil dérivé, la recherche
+    minore le recouvrement par les notes que tout type conserve ; il est
+    vérifié exactement sur la formule construite.
+    """
+    index = catalog_service.get_catalog_index()
+    types = [force_type] if force_type in FORMULA_TYPE_CONFIGS else list(FORMULA_TYPE_CONFIGS)
+    taken = [f.note_names() for f in chosen]
+
+    ranked: dict[str, list[Ingredient]] = {}
+    streams = []
+    for cat in CATEGORY_TO_KEY:
+        scores = note_scores.get(cat, {})
+        candidates = index.top_k(cat, scores, _SEARCH_CANDIDATES_PER_FORMULA * options.count, blocked_names)
+        floor = min(FORMULA_TYPE_CONFIGS[t]["note_counts"][cat] for t in types)
+
+        def cost(indices: tuple[int, ...], candidates=candidates, floor=floor) -> tuple[int, ...]:
+            # Notes partagées avec chaque formule retenue, parmi celles conservées à coup sûr
+            names = {candidates[i].name for i in indices[:floor]}
+            return tuple(len(names & other) for other in taken)
+
+        ranked[cat] = candidates
+        streams.append(SubsetStream([scores.get(ing.name, 0) for ing in candidates], 3, cost))
+
+    def build(selection: tuple[tuple[int, ...], ...]) -> Formula | None:
+        preliminary = {
+            key: [ranked[cat][i] for i in indices]
+            for (cat, key), indices in zip(CATEGORY_TO_KEY.items(), selection)
+        }
+        candidate = _formula_from_notes(preliminary, language, force_type, excluded_profiles)
+        return candidate if _is_diverse(candidate, chosen, options.max_overlap) else None
+
+    return best_combination(streams, build, options.max_overlap, _SEARCH_BUDGET)
+
+
+def _build_formulas(
+    note_scores: dict[str, dict[str, float]],
+    blocked_names: set[str],
+    language: str,
+    force_type: str | None = None,
+    options: DiversityOptions = DiversityOptions(),
+) -> tuple[Formula, ...]:
+    """Construit jusqu'à options.count formules, par score décroissant, sous contraintes de diversité.
+
+    Chaque formule est la meilleure combinaison de notes (somme des scores de
+    la sélection préliminaire) compatible avec les formules déjà retenues.
+    Sans recouvrement permis, c'est la sélection des meilleures notes restantes
+    (la paire historique pour count=2) ; sinon elle est cherchée sur les
+    classements par catégorie (voir _search_formula et formula_search).
+
+    Retourne moins de formules si le catalogue (allergies comprises) ne permet
+    pas d'en trouver assez qui respectent les contraintes.
+    """
+    formulas: list[Formula] = []
+    excluded_profiles: set[str] = set()
+
+    for _ in range(options.count):
+        if options.max_overlap == 0:
+            excluded_names = set().union(*(f.note_names() for f in formulas))
+            formula = _build_formula(note_scores, blocked_names, excluded_names, language, force_type, excluded_profiles)
+            if not _is_diverse(formula, formulas, 0):
+                break  # plus aucune note disponible
+        else:
+            formula = _search_formula(
+                note_scores, blocked_names, language, force_type, excluded_profiles, formulas, options,
+            )
+            if formula is None:
+                break
+
+        formulas.append(formula)
+        if options.distinct_profiles:
+            excluded_profiles.add(formula.profile)
+
+    return tuple(formulas)
+
+
+# ── Mémoïsation ───────────────────────────────────────────────────────
+
+def _formula_cache_key(
+    kind: str | DiversityOptions,
+    rows: list[int],
+    weights: list[float],
+    blocked_names: set[str],
+    language: str,
+    force_type: str | None,
+) -> tuple:
+    """Clé canonique : indépendante de l'ordre et de l'orthographe des réponses.
+
+    kind vaut "single" pour une formule seule, ou les options de diversité
+    d'un jeu de formules (nombre et contraintes font partie de la clé).
+    """
+    return (
+        kind,
+        language,
+        force_type if force_type in FORMULA_TYPE_CONFIGS else None,
+        tuple(sorted(blocked_names)),
+        tuple(sorted(zip(rows, weights))),
+    )
+
+
+def _session_scores(session_id: str, answers: dict) -> tuple[ScoringMatrix, list[int], list[float], dict]:
+    """Scores d'une session lus depuis l'accumulateur alimenté par save_answer.
+
+    Si l'accumulateur manque, date d'une autre version du catalogue ou ne couvre
+    pas exactement les questions répondues, il est reconstruit depuis les réponses.
+    """
+    matrix = _get_scoring_matrix()
+    snapshot = session_store.get_score_snapshot(session_id)
+    if (
+        snapshot is None
+        or snapshot["catalog_version"] != matrix.catalog_version
+        or snapshot["question_ids"] != {int(qid) for qid in answers}
+    ):
+        session_store.reset_scores(session_id)
+        for qid_str, answer_data in answers.items():
+            rows, weights = _collect_score_rows({qid_str: answer_data}, matrix)
+            session_store.fold_answer_scores(session_id, int(qid_str), matrix, rows, weights)
+        snapshot = session_store.get_score_snapshot(session_id) or {"rows": [], "weights": [], "scores": matrix.score([], [])}
+    return matrix, snapshot["rows"], snapshot["weights"], snapshot["scores"]
+
+
+def _generate_formula_set(
+    answers: dict,
+    blocked_names: set[str],
+    language: str,
+    force_type: str | None = None,
+    session_id: str | None = None,
+    options: DiversityOptions = DiversityOptions(),
+) -> tuple[Formula, ...]:
+    """Score les réponses et construit les formules (voir _build_formulas), via le cache LRU.
+
+    Avec un session_id, les scores viennent de l'accumulateur de la session
+    (pas de rescoring du questionnaire).
+    """
+    if session_id is not None:
+        matrix, rows, weights, note_scores = _session_scores(session_id, answers)
+    else:
+        matrix = _get_scoring_matrix()
+        rows, weights = _collect_score_rows(answers, matrix)
+        note_scores = None
+    key = _formula_cache_key(options, rows, weights, blocked_names, language, force_type)
+
+    formulas = _formula_cache.get(key, matrix.catalog_version)
+    if formulas is None:
+        if note_scores is None:
+            note_scores = matrix.score(rows, weights)
+        formulas = _build_formulas(note_scores, blocked_names, language, force_type, options)
+        _formula_cache.put(key, formulas, matrix.catalog_version)
+    return formulas
+
+
+def get_formula_cache_stats() -> dict:
+    """Compteurs du cache de formules (hits / misses / évictions) pour le monitoring."""
+    return _formula_cache.stats()
+
+
+# ── Scores cumulés par session ────────────────────────────────────────
+
+@catalog_service.pinned()
+def record_answer_scores(session_id: str, question_id: int, top_2: list[str], bottom_2: list[str]) -> dict:
+    """Intègre une réponse sauvegardée aux scores cumulés de la session.
+
+    Retourne l'aperçu du profil en cours (voir get_profile_preview).
+    """
+    matrix = _get_scoring_matrix()
+    rows, weights = _collect_score_rows({str(question_id): {"top_2": top_2, "bottom_2": bottom_2}}, matrix)
+    session_store.fold_answer_scores(session_id, question_id, matrix, rows, weights)
+    return get_profile_preview(session_id)
+
+
+@catalog_service.pinned()
+def get_profile_preview(session_id: str) -> dict:
+    """Aperçu du profil d'après les réponses déjà données : profil dominant,
+    type de formule et notes en tête par catégorie (sans quantités ni booster)."""
+    session = session_store.get_snapshot(session_id)
+    if not session.exists or not session.answers:
+        return {"answered": 0, "profile": None, "formula_type": None}
+
+    language = session.meta.get("language", "fr")
+    blocked_names, _ = _profile_allergies(session.profile)
+    _, _, _, note_scores = _session_scores(session_id, session.answers)
+
+    leading = _select_notes_by_score(note_scores, max_per_cat=3, blocked_names=blocked_names)
+    profile_name = _derive_profile_from_notes(leading)
 
     return {
+        "answered": len(session.answers),
         "profile": profile_name,
-        "formula_type": formula_type,
-        "description": descriptions.get(profile_name, ""),
-        "top_notes": [n["name"] for n in translated["top_notes"]],
-        "heart_notes": [n["name"] for n in translated["heart_notes"]],
-        "base_notes": [n["name"] for n in translated["base_notes"]],
-        "details": translated,
-        "sizes": sizes,
-        "_selected_en_names": selected_en_names,  # clé interne, retirée avant stockage
+        "formula_type": _classify_formula_type(profile_name),
+        **{
+            key: [n.display_name(language) for n in notes]
+            for key, notes in leading.items()
+        },
     }
 
 
 # ── Génération des formules ───────────────────────────────────────────
 
-def generate_formulas(session_id: str, force_type: str | None = None) -> dict:
-    """Génère 2 formules personnalisées pour une session.
+@catalog_service.pinned()
+def generate_formulas(
+    session_id: str,
+    force_type: str | None = None,
+    options: DiversityOptions = DiversityOptions(),
+) -> dict:
+    """Génère les formules personnalisées d'une session (2 par défaut, voir options).
 
     1. Récupère les réponses depuis le session store
     2. Score les notes directement depuis les réponses (note_scoring_mapping.json)
     3. Dérive le profil et le type de formule depuis les notes sélectionnées
-    4. Retourne 2 formules avec les notes et les ml selon le type
+    4. Retourne les formules par score décroissant, sous contraintes de diversité
     """
-    session_data = session_store.get_session_answers(session_id)
-    if not session_data or not session_data.get("answers"):
+    # Réponses, langue et profil lus d'un coup
+    session = session_store.get_snapshot(session_id)
+    if not session.exists or not session.answers:
         return {"error": "Aucune réponse trouvée", "formulas": []}
 
-    session_meta = session_store.get_session_meta(session_id)
-    language = session_meta.get("language", "fr") if session_meta else "fr"
-
-    profile = session_store.get_user_profile(session_id)
-    has_allergies = profile.get("has_allergies", "non") if profile else "non"
-    user_allergens_raw = profile.get("allergies", "") if profile else ""
-
-    user_allergens = None
-    if has_allergies == "oui" and user_allergens_raw:
-        user_allergens = [
-            a.strip()
-            for a in user_allergens_raw.replace(",", ";").split(";")
-            if a.strip()
-        ]
-
-    blocked_names = _get_blocked_ingredients(user_allergens)
-
-    # Scorer toutes les notes depuis les réponses
-    note_scores = _score_notes(session_data["answers"])
-
-    # Générer 2 formules avec des notes et des profils différents
-    formulas = []
-    excluded_names: set[str] = set()
-    excluded_profiles: set[str] = set()
+    language = session.meta.get("language", "fr")
+    blocked_names, unmatched_allergens = _profile_allergies(session.profile)
 
-    for _ in range(2):
-        formula = _build_formula(note_scores, blocked_names, excluded_names, language, force_type, excluded_profiles)
-        excluded_names |= formula.pop("_selected_en_names", set())
-        excluded_profiles.add(formula["profile"])
-        formulas.append(formula)
+    # Scorer les notes et générer des formules avec des notes et des profils différents
+    formulas = _generate_formula_set(
+        session.answers, blocked_names, language, force_type, session_id=session_id, options=options,
+    )
 
-    session_store.save_generated_formulas(session_id, formulas)
-    return {"formulas": formulas}
+    session_store.save_generated_formulas(session_id, list(formulas))
+    return {"formulas": list(formulas), "unmatched_allergens": list(unmatched_allergens)}
 
 
+@catalog_service.pinned()
 def generate_formulas_stateless(
     answers: dict,
     language: str = "fr",
     has_allergies: str = "non",
     user_allergens_raw: str = "",
     force_type: str | None = None,
+    options: DiversityOptions = DiversityOptions(),
 ) -> dict:
-    """Génère 2 formules sans session — reçoit les données directement en paramètre."""
+    """Génère les formules sans session — reçoit les données directement en paramètre."""
     if not answers:
         return {"error": "Aucune réponse fournie", "formulas": []}
 
-    user_allergens = None
-    if has_allergies == "oui" and user_allergens_raw:
-        user_allergens = [
-            a.strip()
-            for a in user_allergens_raw.replace(",", ";").split(";")
-            if a.strip()
-        ]
+    blocked_names, unmatched_allergens = _resolve_allergies(has_allergies, user_allergens_raw)
+    formulas = _generate_formula_set(answers, blocked_names, language, force_type, options=options)
 
-    blocked_names = _get_blocked_ingredients(user_allergens)
-    note_scores = _score_notes(answers)
+    return {"formulas": list(formulas), "unmatched_allergens": list(unmatched_allergens)}
 
-    formulas = []
-    excluded_names: set[str] = set()
-    excluded_profiles: set[str] = set()
 
-    for _ in range(2):
-        formula = _build_formula(note_scores, blocked_names, excluded_names, language, force_type, excluded_profiles)
-        excluded_names |= formula.pop("_selected_en_names", set())
-        excluded_profiles.add(formula["profile"])
-        formulas.append(formula)
+@catalog_service.pinned()
+def generate_formulas_bulk(items: list[dict]) -> list[dict]:
+    """Génère les formules de chaque jeu de réponses d'un lot (sémantique stateless).
+
+    Chaque item reprend les paramètres de generate_formulas_stateless (options
+    de diversité sous la clé "options"). Le scoring
+    de tout le lot est fait en une seule opération matricielle ; une erreur sur
+    un item produit une entrée {"error": ...} sans interrompre le lot.
+    """
+    matrix = _get_scoring_matrix()
+    results: list[dict | None] = [None] * len(items)
+    pending: list[tuple[int, tuple, set[str]]] = []
+    batch_rows: list[list[int]] = []
+    batch_weights: list[list[float]] = []
+
+    for i, item in enumerate(items):
+        if not item.get("answers"):
+            results[i] = {"error": "Aucune réponse fournie"}
+            continue
+        try:
+            rows, weights = _collect_score_rows(item["answers"], matrix)
+        except (ValueError, TypeError, AttributeError) as e:
+            results[i] = {"error": f"Réponses invalides : {e}"}
+            continue
+
+        blocked_names, _ = _resolve_allergies(item.get("has_allergies", "non"), item.get("user_allergens_raw") or "")
 
-    return {"formulas": formulas}
+        key = _formula_cache_key(
+            item.get("options") or DiversityOptions(),
+            rows, weights, blocked_names, item.get("language", "fr"), item.get("force_type"),
+        )
+        cached = _formula_cache.get(key, matrix.catalog_version)
+        if cached is not None:
+            results[i] = {"formulas": list(cached)}
+            continue
+
+        pending.append((i, key, blocked_names))
+        batch_rows.append(rows)
+        batch_weights.append(weights)
+
+    for (i, key, blocked_names), note_scores in zip(pending, matrix.score_batch(batch_rows, batch_weights)):
+        item = items[i]
+        try:
+            formulas = _build_formulas(
+                note_scores,
+                blocked_names,
+                item.get("language", "fr"),
+                item.get("force_type"),
+                item.get("options") or DiversityOptions(),
+            )
+        except Exception as e:
+            results[i] = {"error": f"Génération impossible : {e}"}
+            continue
+        _formula_cache.put(key, formulas, matrix.catalog_version)
+        results[i] = {"formulas": list(formulas)}
+
+    return results
 
 
 # ── Sélection et personnalisation ─────────────────────────────────────
 
+@catalog_service.pinned()
 def change_selected_formula_type(session_id: str, formula_type: str) -> dict:
     """Régénère une seule formule avec un nouveau type et la sauvegarde directement comme sélectionnée."""
-    if formula_type not in _FORMULA_TYPE_CONFIGS:
-        return {"error": f"formula_type must be one of: {', '.join(_FORMULA_TYPE_CONFIGS)}"}
+    if formula_type not in FORMULA_TYPE_CONFIGS:
+        return {"error": f"formula_type must be one of: {', '.join(FORMULA_TYPE_CONFIGS)}"}
 
-    session_data = session_store.get_session_answers(session_id)
-    if not session_data or not session_data.get("answers"):
+    session = session_store.get_snapshot(session_id)
+    if not session.exists or not session.answers:
         return {"error": "Aucune réponse trouvée"}
 
-    session_meta = session_store.get_session_meta(session_id)
-    language = session_meta.get("language", "fr") if session_meta else "fr"
-
-    profile = session_store.get_user_profile(session_id)
-    has_allergies = profile.get("has_allergies", "non") if profile else "non"
-    user_allergens_raw = profile.get("allergies", "") if profile else ""
+    language = session.meta.get("language", "fr")
+    blocked_names, _ = _profile_allergies(session.profile)
 
-    user_allergens = None
-    if has_allergies == "oui" and user_allergens_raw:
-        user_allergens = [
-            a.strip()
-            for a in user_allergens_raw.replace(",", ";").split(";")
-            if a.strip()
-        ]
-
-    blocked_names = _get_blocked_ingredients(user_allergens)
-    note_scores = _score_notes(session_data["answers"])
-
-    formula = _build_formula(note_scores, blocked_names, set(), language, force_type=formula_type)
-    formula.pop("_selected_en_names", None)
+    matrix, rows, weights, note_scores = _session_scores(session_id, session.answers)
+    key = _formula_cache_key("single", rows, weights, blocked_names, language, formula_type)
+    formula = _formula_cache.get(key, matrix.catalog_version)
+    if formula is None:
+        formula = _build_formula(note_scores, blocked_names, set(), language, force_type=formula_type)
+        _formula_cache.put(key, formula, matrix.catalog_version)
 
     session_store.save_selected_formula(session_id, formula)
     return {"formula": formula}
 
 
 def select_formula(session_id: str, formula_index: int) -> dict:
-    """Sélectionne une des 2 formules générées et la stocke dans le session store."""
+    """Sélectionne une des formules générées et la stocke dans le session store."""
     formulas = session_store.get_generated_formulas(session_id)
     if not formulas:
         return {"error": "No generated formulas found"}
-    if formula_index not in (0, 1):
-        return {"error": "formula_index must be 0 or 1"}
+    if formula_index < 0:
+        return {"error": f"formula_index must be between 0 and {len(formulas) - 1}"}
     if formula_index >= len(formulas):
         return {"error": "Invalid formula index"}
 
@@ -673,62 +637,77 @@ def select_formula(session_id: str, formula_index: int) -> dict:
     return {"formula": selected}
 
 
+@catalog_service.pinned()
 def get_available_ingredients(
     session_id: str,
     note_type: str,
+    limit: int | None = None,
+    cursor: str | None = None,
+    compact: bool = False,
 ) -> dict:
-    """Retourne tous les ingrédients disponibles pour un type de note, filtré par allergènes."""
+    """Ingrédients de remplacement pour un type de note, filtrés par allergènes,
+    du meilleur score au moins bon.
+
+    Les scores sont ceux déjà cumulés pour la session (pas de rescoring du
+    questionnaire) ; sans scores à jour, l'ordre du catalogue est conservé
+    et score vaut None. Pagination par curseur : la position du dernier
+    ingrédient renvoyé ; la page suivante reprend juste après lui dans le
+    classement. compact ne garde que nom, famille et score.
+    """
     if note_type not in ("top", "heart", "base"):
         return {"error": "note_type must be top, heart, or base"}
 
-    profile = session_store.get_user_profile(session_id)
-    has_allergies = profile.get("has_allergies", "non") if profile else "non"
-    user_allergens_raw = profile.get("allergies", "") if profile else ""
-
-    user_allergens = None
-    if has_allergies == "oui" and user_allergens_raw:
-        user_allergens = [
-            a.strip()
-            for a in user_allergens_raw.replace(",", ";").split(";")
-            if a.strip()
-        ]
-
-    session_meta = session_store.get_session_meta(session_id)
-    language = session_meta.get("language", "fr") if session_meta else "fr"
-    translate_name = (
-        (lambda name: INGREDIENT_EN_TO_FR.get(name, name)) if language == "fr"
-        else (lambda name: name)
-    )
+    session = session_store.get_snapshot(session_id)
+    language = session.meta.get("language", "fr") if session.exists else "fr"
+
+    index = catalog_service.get_catalog_index()
+    blocked_ingredients, _ = _profile_allergies(session.profile)
+
+    cached = session_store.get_note_scores(session_id)
+    scored = cached is not None and cached[0] == _get_scoring_matrix().catalog_version
+    scores = cached[1].get(note_type, {}) if scored else {}
 
-    coffret = _get_coffret()
-    blocked_ingredients = _get_blocked_ingredients(user_allergens)
+    def rank(ingredient) -> tuple[float, str]:
+        return (-scores.get(ingredient.name, 0), ingredient.position)
+
+    after = None
+    if cursor:
+        anchor = index.by_position.get(cursor)
+        if anchor is None or anchor not in index.by_category[note_type]:
+            return {"error": "Invalid cursor"}
+        after = rank(anchor)
 
     # Exclure les notes déjà présentes dans la formule sélectionnée
-    selected = session_store.get_selected_formula(session_id)
+    selected = session.selected_formula
     already_in_formula: set[str] = set()
     if selected:
-        note_key = {"top": "top_notes", "heart": "heart_notes", "base": "base_notes"}[note_type]
-        for note in selected.get("details", {}).get(note_key, []):
-            already_in_formula.add(note["name"].lower())
+        for note in selected.notes(CATEGORY_TO_KEY[note_type]):
+            already_in_formula.add(note.display_name(selected.language).lower())
+
+    candidates = [
+        ingredient for ingredient in index.by_category[note_type]
+        if ingredient.name not in blocked_ingredients
+        and ingredient.display_name(language).lower() not in already_in_formula
+        and (after is None or rank(ingredient) > after)
+    ]
+    page = heapq.nsmallest(limit + 1 if limit else len(candidates), candidates, key=rank)
+    next_cursor = None
+    if limit and len(page) > limit:
+        page = page[:limit]
+        next_cursor = page[-1].position
 
     ingredients = []
-    for ingredient in coffret["ingredients"]:
-        if ingredient["note_type"] != note_type:
-            continue
-        if ingredient["name"] in blocked_ingredients:
-            continue
-        translated = translate_name(ingredient["name"])
-        if translated.lower() in already_in_formula:
-            continue
-        ingredients.append({
-            "name": translated,
-            "family": ingredient["family"],
-            "description": ingredient["description"],
-        })
+    for ingredient in page:
+        entry = {"name": ingredient.display_name(language), "family": ingredient.family}
+        if not compact:
+            entry["description"] = ingredient.description
+        entry["score"] = round(scores.get(ingredient.name, 0), 2) if scored else None
+        ingredients.append(entry)
 
-    return {"note_type": note_type, "ingredients": ingredients}
+    return {"note_type": note_type, "ingredients": ingredients, "scored": scored, "next_cursor": next_cursor}
 
 
+@catalog_service.pinned()
 def replace_note(
     session_id: str,
     note_type: str,
@@ -743,57 +722,76 @@ def replace_note(
     if not selected:
         return {"error": "No formula selected yet"}
 
-    note_key = {"top": "top_notes", "heart": "heart_notes", "base": "base_notes"}[note_type]
-    formula_type = selected.get("formula_type", "mix")
-
-    session_meta = session_store.get_session_meta(session_id)
-    language = session_meta.get("language", "fr") if session_meta else "fr"
-    translate_name = (
-        (lambda name: INGREDIENT_EN_TO_FR.get(name, name)) if language == "fr"
-        else (lambda name: name)
-    )
-
-    coffret = _get_coffret()
-    new_ingredient = None
-    for ingredient in coffret["ingredients"]:
-        if ingredient["note_type"] != note_type:
-            continue
-        translated = translate_name(ingredient["name"])
-        if translated.lower() == new_note.lower() or ingredient["name"].lower() == new_note.lower():
-            new_ingredient = {
-                "name": translated,
-                "family": ingredient["family"],
-                "description": ingredient["description"],
-                "position": ingredient["position"],
-            }
-            break
+    note_key = CATEGORY_TO_KEY[note_type]
 
-    if not new_ingredient:
+    ingredient = catalog_service.get_catalog_index().find(note_type, new_note)
+    if not ingredient:
         return {"error": f"Ingredient '{new_note}' not found in coffret for {note_type} notes"}
 
-    details = selected.get("details", {})
-    found = False
-    for i, note in enumerate(details.get(note_key, [])):
-        if note["name"].lower() == old_note.lower():
-            details[note_key][i] = new_ingredient
-            found = True
+    for i, note in enumerate(selected.notes(note_key)):
+        if note.display_name(selected.language).lower() == old_note.lower():
             break
-
-    if not found:
+    else:
         return {"error": f"Note '{old_note}' not found in current formula's {note_key}"}
 
-    selected[note_key] = [n["name"] for n in details[note_key]]
-    selected["details"] = details
+    # Le booster et le type sont conservés ; les ml sont dérivés à la sérialisation
+    selected = selected.with_note(note_key, i, ingredient)
+    session_store.save_selected_formula(session_id, selected)
 
-    # Récupérer le booster existant et recalculer les ml
-    booster_list = selected.get("sizes", {}).get("30ml", {}).get("boosters", [])
-    booster = {"name": booster_list[0]["name"] if booster_list else BOOSTERS[0]["name"], "keywords": []}
+    return {"formula": selected}
 
-    sizes = {}
-    for target_ml in (10, 30, 50):
-        sizes[f"{target_ml}ml"] = _compute_quantities(details, booster, formula_type, target_ml)
 
-    selected["sizes"] = sizes
-    session_store.save_selected_formula(session_id, selected)
+# ── Formules enregistrées en base ─────────────────────────────────────
 
-    return {"formula": selected}
+@catalog_service.pinned()
+def expand_stored_sizes(
+    formula_type: str | None,
+    notes: dict[str, list[str] | None],
+    language: str | None,
+    stored: dict | None,
+    sizes: SizesView = "all",
+) -> dict:
+    """Quantités d'une formule enregistrée (colonne sizes), au format demandé.
+
+    Les lignes récentes ne stockent que le booster (voir formula_model.stored_sizes) :
+    les blocs par format sont recalculés depuis le type et les notes, avec le
+    détail des ingrédients du catalogue courant. Les lignes plus anciennes, qui
+    contiennent encore les blocs complets, sont renvoyées telles quelles.
+    Retourne {"sizes": …}, ou {"booster": …, "quantities": …} en compact.
+    """
+    stored = stored or {}
+    legacy = "booster" not in stored
+    if formula_type not in FORMULA_TYPE_CONFIGS:
+        return {"sizes": stored}
+
+    if legacy:
+        booster = next(
+            (b[0].get("name") for block in stored.values() if isinstance(block, dict) and (b := block.get("boosters"))),
+            None,
+        )
+    else:
+        booster = stored["booster"]
+
+    if sizes == "compact":
+        return {"booster": booster, "quantities": size_quantities(formula_type)}
+    if legacy:
+        return {"sizes": {label: block for label, block in stored.items() if sizes == "all" or label == sizes}}
+
+    index = catalog_service.get_catalog_index()
+    ingredients = {
+        key: tuple(
+            index.find(cat, name) or Ingredient(
+                position="", name=name, family="", description="",
+                note_type=cat, profile_1=None, profile_2=None, name_fr=name,
+            )
+            for name in notes.get(key) or ()
+        )
+        for cat, key in CATEGORY_TO_KEY.items()
+    }
+    language = language or "fr"
+    return {
+        "sizes": {
+            f"{ml}ml": size_block(formula_type, language, ingredients, booster, ml)
+            for ml in view_sizes(sizes)
+        }
+    }
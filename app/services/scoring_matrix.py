@@ -0,0 +1,177 @@
+"""Matrice de scoring (question, choix) × ingrédient.
+
+Compile `note_scoring_mapping.json` une seule fois contre le catalogue du coffret :
+chaque ligne correspond à un choix d'une question, chaque colonne à un ingrédient
+du coffret (dans l'ordre du catalogue). Le fallback familles est intégré dans la
+matrice, si bien que le scoring d'un questionnaire se réduit à une somme
+pondérée de lignes (+2 pour top_2, −1 pour bottom_2).
+"""
+
+from dataclasses import dataclass, field
+
+import numpy as np
+
+CATEGORIES = ("top", "heart", "base")
+
+
+@dataclass(frozen=True, slots=True)
+class ScoringMatrix:
+    catalog_version: str
+    # (qid, clé anglaise du mapping) → index de ligne
+    row_index: dict[tuple[int, str], int]
+    # scores (n_lignes, n_ingrédients), notes directes + fallback familles
+    values: np.ndarray
+    # True si la ligne crée une entrée pour l'ingrédient (même à score nul)
+    touched: np.ndarray
+    # catégorie → [(index de colonne, nom EN)]
+    columns_by_category: dict[str, list[tuple[int, str]]]
+
+    def row(self, qid: int, choice_key: str) -> int | None:
+        return self.row_index.get((qid, choice_key))
+
+    def score(self, rows: list[int], weights: list[float]) -> dict[str, dict[str, float]]:
+        """Somme pondérée des lignes → scores par catégorie ({nom: score})."""
+        if not rows:
+            return {cat: {} for cat in CATEGORIES}
+
+        idx = np.asarray(rows, dtype=np.intp)
+        totals = np.asarray(weights, dtype=np.float64) @ self.values[idx]
+        touched = self.touched[idx].any(axis=0)
+        return self._to_category_dicts(totals.tolist(), touched.tolist())
+
+    def score_batch(
+        self,
+        batch_rows: list[list[int]],
+        batch_weights: list[list[float]],
+    ) -> list[dict[str, dict[str, float]]]:
+        """Score plusieurs questionnaires en une seule multiplication matricielle."""
+        n_items = len(batch_rows)
+        n_rows = self.values.shape[0]
+        if n_items == 0:
+            return []
+
+        item_idx = np.repeat(
+            np.arange(n_items, dtype=np.intp),
+            [len(rows) for rows in batch_rows],
+        )
+        row_idx = np.fromiter((r for rows in batch_rows for r in rows), dtype=np.intp, count=len(item_idx))
+        flat_weights = np.fromiter((w for ws in batch_weights for w in ws), dtype=np.float64, count=len(item_idx))
+
+        weight_matrix = np.zeros((n_items, n_rows), dtype=np.float64)
+        np.add.at(weight_matrix, (item_idx, row_idx), flat_weights)
+        used = np.zeros((n_items, n_rows), dtype=np.float64)
+        used[item_idx, row_idx] = 1.0
+
+        totals = (weight_matrix @ self.values).tolist()
+        touched = ((used @ self.touched) > 0).tolist()
+        return [self._to_category_dicts(t, m) for t, m in zip(totals, touched)]
+
+    def accumulator(self) -> "ScoreAccumulator":
+        n_cols = self.values.shape[1]
+        return ScoreAccumulator(
+            matrix=self,
+            totals=np.zeros(n_cols, dtype=np.float64),
+            touched_counts=np.zeros(n_cols, dtype=np.int32),
+        )
+
+    def _to_category_dicts(self, totals: list[float], touched: list[bool]) -> dict[str, dict[str, float]]:
+        return {
+            cat: {
+                name: totals[col]
+                for col, name in columns
+                if touched[col]
+            }
+            for cat, columns in self.columns_by_category.items()
+        }
+
+
+@dataclass(slots=True)
+class ScoreAccumulator:
+    """Scores cumulés d'une session, mis à jour réponse par réponse.
+
+    Chaque question garde sa contribution (lignes, poids) : une nouvelle réponse
+    à la même question retire l'ancienne contribution avant d'ajouter la
+    nouvelle. Les valeurs du mapping étant entières, les sommes restent exactes
+    et identiques à un rescoring complet.
+    """
+
+    matrix: ScoringMatrix
+    totals: np.ndarray
+    # nombre de lignes répondues qui créent une entrée pour chaque ingrédient
+    touched_counts: np.ndarray
+    # qid → (lignes, poids)
+    contributions: dict[int, tuple[tuple[int, ...], tuple[float, ...]]] = field(default_factory=dict)
+
+    @property
+    def catalog_version(self) -> str:
+        return self.matrix.catalog_version
+
+    def set_answer(self, qid: int, rows: list[int], weights: list[float]) -> None:
+        previous = self.contributions.pop(qid, None)
+        if previous:
+            self._apply(*previous, sign=-1)
+        if rows:
+            self._apply(rows, weights, sign=1)
+        self.contributions[qid] = (tuple(rows), tuple(weights))
+
+    def _apply(self, rows, weights, sign: int) -> None:
+        idx = np.asarray(rows, dtype=np.intp)
+        self.totals += sign * (np.asarray(weights, dtype=np.float64) @ self.matrix.values[idx])
+        self.touched_counts += sign * self.matrix.touched[idx].sum(axis=0, dtype=np.int32)
+
+    def rows_and_weights(self) -> tuple[list[int], list[float]]:
+        rows: list[int] = []
+        weights: list[float] = []
+        for qid_rows, qid_weights in self.contributions.values():
+            rows.extend(qid_rows)
+            weights.extend(qid_weights)
+        return rows, weights
+
+    def scores(self) -> dict[str, dict[str, float]]:
+        """Même résultat que ScoringMatrix.score() sur toutes les réponses."""
+        return self.matrix._to_category_dicts(self.totals.tolist(), (self.touched_counts > 0).tolist())
+
+
+def build_scoring_matrix(catalog: dict, note_mapping: dict, version: str | None = None) -> ScoringMatrix:
+    """Compile le mapping de scoring en matrice dense pour le catalogue donné.
+
+    version identifie le couple catalogue + mapping (par défaut : version du catalogue).
+    """
+    ingredients = catalog["ingredients"]
+    n_cols = len(ingredients)
+
+    row_index: dict[tuple[int, str], int] = {}
+    value_rows: list[list[float]] = []
+    touched_rows: list[list[bool]] = []
+
+    for qid_str, question in note_mapping.get("questions", {}).items():
+        qid = int(qid_str)
+        for choice_key, choice_data in question.get("choices", {}).items():
+            notes = choice_data.get("notes", {})
+            families = choice_data.get("families", {})
+            values = [0.0] * n_cols
+            touched = [False] * n_cols
+            for col, ing in enumerate(ingredients):
+                if ing["name"] in notes:
+                    values[col] = float(notes[ing["name"]])
+                    touched[col] = True
+                else:
+                    fam_score = families.get(ing["family"], 0)
+                    if fam_score:
+                        values[col] = float(fam_score)
+                        touched[col] = True
+            row_index[(qid, choice_key)] = len(value_rows)
+            value_rows.append(values)
+            touched_rows.append(touched)
+
+    columns_by_category: dict[str, list[tuple[int, str]]] = {cat: [] for cat in CATEGORIES}
+    for col, ing in enumerate(ingredients):
+        columns_by_category[ing["note_type"]].append((col, ing["name"]))
+
+    return ScoringMatrix(
+        catalog_version=version or catalog["version"],
+        row_index=row_index,
+        values=np.array(value_rows, dtype=np.float64).reshape(len(value_rows), n_cols),
+        touched=np.array(touched_rows, dtype=bool).reshape(len(touched_rows), n_cols),
+        columns_by_category=columns_by_category,
+    )
@@ -0,0 +1,1083 @@
+"""Backends du session store (voir session_store).
+
+  - MemorySessionBackend : dictionnaires du process. Par
+    défaut ; une session n'est visible que du worker qui l'a créée et ne
+    survit à un redémarrage qu'avec le journal local (SESSION_JOURNAL_DIR,
+    voir session_journal). Les sessions sont réparties en parties à verrou
+    propre (striping). Les sessions inactives depuis SESSION_TTL et, au-delà
+    de SESSION_MAX_COUNT, les moins récemment utilisées sont évincées.
+  - RedisSessionBackend : clés session:{id}:* partagées entre workers et
+    répliques (voir docs/architecture/redis.md). Chaque opération tient en
+    un aller-retour (pipeline) ; toute écriture remet le TTL de toutes les
+    clés de la session à SESSION_TTL.
+
+Le choix se fait par SESSION_STORE_BACKEND (memory | redis). Les deux
+backends exposent les mêmes méthodes et renvoient les mêmes formes.
+"""
+
+import bisect
+import heapq
+import json
+import logging
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from datetime import datetime
+from itertools import islice
+from threading import Lock
+from typing import Callable
+
+from app.services.formula_model import Formula
+from app.services.scoring_matrix import ScoreAccumulator, ScoringMatrix
+from app.services.session_journal import SessionJournal, decode_fields, resolve_questions
+
+logger = logging.getLogger("lylo.session_store")
+
+BACKEND_KINDS = ("memory", "redis")
+# Parties indépendantes (verrou chacune) du backend mémoire
+DEFAULT_STRIPES = 16
+
+REQUIRED_PROFILE_FIELDS = {"first_name", "gender", "age", "has_allergies"}
+
+
+def missing_profile_fields(profile: dict) -> list[str]:
+    missing = list(REQUIRED_PROFILE_FIELDS - profile.keys())
+    if profile.get("has_allergies", "").lower() in ("oui", "yes") and "allergies" not in profile:
+        missing.append("allergies")
+    return missing
+
+
+# Position d'une session dans l'index par date de création : (created_at en secondes, session_id)
+SessionCursor = tuple[float, str]
+
+
+def created_ts(meta: dict) -> float:
+    """created_at des métadonnées en secondes (0 si absent ou illisible)."""
+    try:
+        return datetime.fromisoformat(meta["created_at"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return 0.0
+
+
+@dataclass(frozen=True, slots=True)
+class SessionFilter:
+    """Filtres des listes paginées. Dates en secondes : created_after inclus, created_before exclu."""
+
+    created_after: float | None = None
+    created_before: float | None = None
+    language: str | None = None
+    mode: str | None = None
+
+    def matches(self, meta: dict) -> bool:
+        return (
+            (self.language is None or meta.get("language") == self.language)
+            and (self.mode is None or meta.get("mode") == self.mode)
+        )
+
+
+def _answers_view(session_id: str, meta: dict | None, answers: dict) -> dict | None:
+    """Forme de GET /session/{id}/answers : métadonnées et réponses."""
+    if meta is None:
+        return None
+    return {"session_id": session_id, **meta, "answers": answers}
+
+
+@dataclass(frozen=True, slots=True)
+class SessionRecord:
+    """État complet d'une session à une version donnée.
+
+    Immuable : chaque écriture publie un nouvel enregistrement (version + 1)
+    et les lectures partagent l'enregistrement courant sans copie. Les dict
+    qu'il contient ne doivent donc pas être modifiés par les appelants.
+    meta vaut None si la session n'existe pas (ou plus) ; profil et réponses
+    sont alors vides.
+    """
+
+    session_id: str
+    version: int
+    meta: dict | None
+    profile: dict
+    answers: dict
+    generated_formulas: tuple[Formula, ...] | None
+    selected_formula: Formula | None
+    # Réponse de get_session_answers, construite à l'écriture (None sans meta)
+    answers_view: dict | None
+
+    @classmethod
+    def empty(cls, session_id: str) -> "SessionRecord":
+        return cls(session_id, 0, None, {}, {}, None, None, None)
+
+    def updated(self, **changes) -> "SessionRecord":
+        """Nouvelle version de l'enregistrement avec les champs donnés.
+
+        Construite champ par champ plutôt que par dataclasses.replace, qui
+        recopie tous les champs dans un dict à chaque écriture.
+        """
+        get = changes.get
+        meta, answers = get("meta", self.meta), get("answers", self.answers)
+        answers_view = self.answers_view
+        if "meta" in changes or "answers" in changes:
+            answers_view = _answers_view(self.session_id, meta, answers)
+        return SessionRecord(
+            self.session_id, self.version + 1, meta, get("profile", self.profile), answers,
+            get("generated_formulas", self.generated_formulas), get("selected_formula", self.selected_formula),
+            answers_view,
+        )
+
+    @property
+    def exists(self) -> bool:
+        return self.meta is not None
+
+    @property
+    def missing_profile_fields(self) -> list[str]:
+        return missing_profile_fields(self.profile)
+
+    @property
+    def profile_complete(self) -> bool:
+        return not self.missing_profile_fields
+
+    @property
+    def state(self) -> str:
+        return "questionnaire" if self.profile_complete else "collecting_profile"
+
+
+class SessionBackend(ABC):
+    """Opérations élémentaires du session store, par session."""
+
+    kind: str
+
+    def __init__(self):
+        self._eviction_hooks: list[Callable[[str, dict | None], None]] = []
+
+    def add_eviction_hook(self, hook: Callable[[str, dict | None], None]) -> None:
+        """hook(session_id, meta) est appelé pour chaque session évincée par le backend."""
+        self._eviction_hooks.append(hook)
+
+    def _notify_eviction(self, session_id: str, meta: dict | None) -> None:
+        for hook in self._eviction_hooks:
+            try:
+                hook(session_id, meta)
+            except Exception as e:
+                logger.warning(f"[{session_id}] hook d'éviction en échec : {e}")
+
+    def sweep(self) -> list[str]:
+        """Évince les sessions échues ; renvoie leurs identifiants."""
+        return []
+
+    def recover(self) -> int:
+        """Recharge les sessions persistées par le backend ; renvoie leur nombre."""
+        return 0
+
+    def close(self) -> None:
+        """Arrêt de l'application : écrit ce qui doit l'être."""
+
+    @abstractmethod
+    def stats(self) -> dict: ...
+
+    @abstractmethod
+    def save_session_meta(self, session_id: str, mapping: dict) -> None: ...
+
+    @abstractmethod
+    def get_session_meta(self, session_id: str) -> dict | None: ...
+
+    @abstractmethod
+    def list_session_ids(self) -> list[str]: ...
+
+    @abstractmethod
+    def save_answer(self, session_id: str, question_id: int, answer: dict) -> None: ...
+
+    @abstractmethod
+    def get_session_answers(self, session_id: str) -> dict | None: ...
+
+    @abstractmethod
+    def get_snapshot(self, session_id: str) -> SessionRecord: ...
+
+    @abstractmethod
+    def get_session_version(self, session_id: str) -> int | None: ...
+
+    @abstractmethod
+    def fold_answer_scores(
+        self, session_id: str, question_id: int, matrix: ScoringMatrix, rows: list[int], weights: list[float],
+    ) -> None: ...
+
+    @abstractmethod
+    def reset_scores(self, session_id: str) -> None: ...
+
+    @abstractmethod
+    def get_score_snapshot(self, session_id: str) -> dict | None: ...
+
+    @abstractmethod
+    def get_note_scores(self, session_id: str) -> tuple[str, dict[str, dict[str, float]]] | None: ...
+
+    @abstractmethod
+    def save_user_profile(self, session_id: str, field: str, value: str) -> None: ...
+
+    @abstractmethod
+    def get_user_profile(self, session_id: str) -> dict | None: ...
+
+    @abstractmethod
+    def save_selected_formula(self, session_id: str, formula: Formula) -> None: ...
+
+    @abstractmethod
+    def get_selected_formula(self, session_id: str) -> Formula | None: ...
+
+    @abstractmethod
+    def save_generated_formulas(self, session_id: str, formulas: list[Formula]) -> None: ...
+
+    @abstractmethod
+    def get_generated_formulas(self, session_id: str) -> tuple[Formula, ...] | None: ...
+
+    @abstractmethod
+    def get_all_sessions(self) -> list[dict]: ...
+
+    @abstractmethod
+    def list_sessions(
+        self, limit: int, cursor: SessionCursor | None = None, filters: SessionFilter = SessionFilter(),
+    ) -> tuple[list[dict], SessionCursor | None]:
+        """Page de sessions (forme de get_session_answers) par date de création croissante.
+
+        Renvoie les sessions strictement après cursor qui passent les filtres
+        et le curseur de la page suivante (None si c'est la dernière).
+        """
+
+    @abstractmethod
+    def delete_session(self, session_id: str) -> bool: ...
+
+
+def _snapshot(acc: ScoreAccumulator) -> dict:
+    rows, weights = acc.rows_and_weights()
+    return {
+        "catalog_version": acc.catalog_version,
+        "question_ids": set(acc.contributions),
+        "rows": rows,
+        "weights": weights,
+        "scores": acc.scores(),
+    }
+
+
+# ── Mémoire du process ────────────────────────────────────────────────
+
+
+class _Stripe:
+    """Une partie des sessions en mémoire, sous son propre verrou.
+
+    Chaque session suivie a une échéance : dernière utilisation + ttl (toute
+    opération sur la session, lecture ou écriture ; pas les listes). Une
+    session échue est évincée au premier accès, ou par sweep() qui dépile un
+    tas d'échéances (une entrée par session, replacée si la session a servi
+    entre-temps) sans parcourir les autres. Le plafond de sessions est global
+    (voir MemorySessionBackend) : la partie signale à track() chaque session
+    qu'elle commence ou cesse de suivre, et à grown() après une création.
+    """
+
+    def __init__(
+        self,
+        ttl: int,
+        clock: Callable[[], float],
+        notify: Callable[[str, dict | None], None],
+        track: Callable[[int], None],
+        grown: Callable[[], None],
+        journal: SessionJournal | None = None,
+    ):
+        self.ttl = ttl
+        self.clock = clock
+        self.notify = notify
+        self.track = track
+        self.grown = grown
+        self.grew = False
+        self.journal = journal
+        self.lock = Lock()
+        # Enregistrement courant de chaque session, remplacé à chaque écriture
+        self.records: dict[str, SessionRecord] = {}
+        self.scores: dict[str, ScoreAccumulator] = {}
+        # Sessions avec métadonnées : session → clé dans by_created, triée par date de création
+        self.index: dict[str, SessionCursor] = {}
+        self.by_created: list[SessionCursor] = []
+        # session → dernière utilisation (horloge clock), de la moins à la plus récente
+        self.activity: OrderedDict[str, float] = OrderedDict()
+        # Tas (échéance, session) et échéance de l'entrée de chaque session dans le tas
+        self.expiry_heap: list[tuple[float, str]] = []
+        self.scheduled: dict[str, float] = {}
+        self.evictions = {"ttl": 0, "capacity": 0}
+        # Évincées sous le verrou, notifiées après sa libération
+        self.pending: list[tuple[str, dict | None]] = []
+
+    # with stripe: verrou tenu dans le bloc ; à la sortie, les évictions sont notifiées et le
+    # plafond global vérifié, hors verrou. Méthodes plutôt que @contextmanager : un générateur
+    # par prise de verrou coûtait plus que l'opération protégée
+
+    def __enter__(self) -> "_Stripe":
+        self.lock.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        evicted, grew = self.pending, self.grew
+        if evicted:
+            self.pending = []
+        if grew:
+            self.grew = False
+        self.lock.release()
+        for session_id, meta in evicted:
+            self.notify(session_id, meta)
+        if grew:
+            # Hors verrou : le plafond global peut évincer dans une autre partie
+            self.grown()
+
+    def deadline(self, used: float) -> float:
+        return used + self.ttl if self.ttl else math.inf
+
+    def oldest(self) -> tuple[float, str] | None:
+        """(dernière utilisation, session) de la session utilisée le moins récemment (verrou tenu)."""
+        session_id = next(iter(self.activity), None)
+        return (self.activity[session_id], session_id) if session_id is not None else None
+
+    def access(self, session_id: str, create: bool, idle: float = 0.0) -> None:
+        """Repousse l'échéance d'une session (verrou tenu) ; l'évince si elle est échue.
+
+        create : la session est suivie même si elle ne l'était pas (écriture).
+        idle : inactivité déjà écoulée (session rechargée du journal).
+        """
+        now = self.clock()
+        used = self.activity.get(session_id)
+        # deadline() en ligne : chemin de chaque lecture et écriture
+        if used is not None and self.ttl and used + self.ttl <= now:
+            self.evict(session_id, "ttl")
+            used = None
+        if used is None and not create:
+            return
+        self.activity[session_id] = now - idle
+        self.activity.move_to_end(session_id)
+        if used is None:
+            if self.ttl and session_id not in self.scheduled:
+                deadline = self.deadline(now - idle)
+                heapq.heappush(self.expiry_heap, (deadline, session_id))
+                self.scheduled[session_id] = deadline
+            self.track(1)
+            self.grew = True
+
+    def drop(self, session_id: str) -> None:
+        if self.journal is not None and session_id in self.activity:
+            self.journal.append(session_id, 0, None)
+        self.records.pop(session_id, None)
+        self.scores.pop(session_id, None)
+        self.unindex(session_id)
+        if self.activity.pop(session_id, None) is not None:
+            self.track(-1)
+
+    def index_session(self, session_id: str, meta: dict) -> None:
+        key = (created_ts(meta), session_id)
+        if self.index.get(session_id) == key:
+            return
+        self.unindex(session_id)
+        self.index[session_id] = key
+        bisect.insort(self.by_created, key)
+
+    def unindex(self, session_id: str) -> None:
+        key = self.index.pop(session_id, None)
+        if key is not None:
+            del self.by_created[bisect.bisect_left(self.by_created, key)]
+
+    def page(self, cursor: SessionCursor | None, filters: SessionFilter, limit: int) -> list[tuple[SessionCursor, dict]]:
+        """Au plus limit sessions de la partie après cursor (verrou tenu), depuis l'index."""
+        start = 0
+        if filters.created_after is not None:
+            start = bisect.bisect_left(self.by_created, (filters.created_after, ""))
+        if cursor is not None:
+            start = max(start, bisect.bisect_right(self.by_created, cursor))
+        found = []
+        for key in islice(self.by_created, start, None):
+            if filters.created_before is not None and key[0] >= filters.created_before:
+                break
+            record = self.records[key[1]]
+            if filters.matches(record.meta):
+                found.append((key, record.answers_view))
+                if len(found) == limit:
+                    break
+        return found
+
+    def evict(self, session_id: str, reason: str) -> None:
+        record = self.records.get(session_id)
+        self.pending.append((session_id, record.meta if record else None))
+        self.drop(session_id)
+        self.evictions[reason] += 1
+
+    def sweep(self) -> None:
+        now = self.clock()
+        heap = self.expiry_heap
+        while heap and heap[0][0] <= now:
+            _, session_id = heapq.heappop(heap)
+            used = self.activity.get(session_id)
+            actual = self.deadline(used) if used is not None else None
+            if actual is None:
+                del self.scheduled[session_id]
+            elif actual <= now:
+                del self.scheduled[session_id]
+                self.evict(session_id, "ttl")
+            else:
+                # Utilisée depuis : l'entrée est replacée à sa nouvelle échéance
+                heapq.heappush(heap, (actual, session_id))
+                self.scheduled[session_id] = actual
+
+    def record(self, session_id: str) -> SessionRecord:
+        return self.records.get(session_id) or SessionRecord.empty(session_id)
+
+    def update(self, session_id: str, merged: dict | None = None, **changes) -> None:
+        """Publie la version suivante de l'enregistrement (verrou tenu, accès fait).
+
+        merged : clés ajoutées aux dict de l'enregistrement (réponse, champ de
+        profil), journalisées seules plutôt que le dict complet.
+        """
+        record = self.record(session_id).updated(**changes)
+        self.records[session_id] = record
+        if self.journal is not None:
+            if merged is not None:
+                self.journal.append(session_id, record.version, merged, merge=True)
+            else:
+                self.journal.append(session_id, record.version, changes)
+
+    def last_used(self, session_id: str, now: float, wall: float) -> float:
+        """Dernière utilisation de la session en temps réel (time.time())."""
+        used = self.activity.get(session_id)
+        return wall if used is None else wall - (now - used)
+
+
+class MemorySessionBackend(SessionBackend):
+    """Sessions dans les dictionnaires du process, réparties en `stripes`
+    parties indépendantes (voir _Stripe) selon le hash du session_id.
+
+    Les opérations sur deux sessions de parties différentes ne se disputent
+    pas de verrou. Le plafond max_sessions porte sur l'ensemble des parties
+    (compteur partagé) : au-delà, la session utilisée le moins récemment de
+    tout le store est évincée, quelle que soit sa partie. ttl / max_sessions
+    à 0 : pas de limite.
+
+    Avec un journal (voir session_journal), chaque nouvelle version et chaque
+    suppression y est ajoutée ; recover() recharge les sessions au démarrage.
+    Les scores cumulés n'y figurent pas : ils sont reconstruits depuis les
+    réponses au premier usage (voir formula_service._session_scores).
+    """
+
+    kind = "memory"
+
+    def __init__(
+        self,
+        ttl: int = 0,
+        max_sessions: int = 0,
+        clock: Callable[[], float] = time.monotonic,
+        stripes: int = DEFAULT_STRIPES,
+        journal: SessionJournal | None = None,
+    ):
+        super().__init__()
+        self._ttl = ttl
+        self._max_sessions = max_sessions
+        self._journal = journal
+        # Sessions suivies, toutes parties confondues
+        self._live = 0
+        self._live_lock = Lock()
+        self._stripes = tuple(
+            _Stripe(ttl, clock, self._notify_eviction, self._track, self._enforce_capacity, journal)
+            for _ in range(stripes)
+        )
+
+    def _track(self, delta: int) -> None:
+        with self._live_lock:
+            self._live += delta
+
+    def _enforce_capacity(self) -> None:
+        """Au-delà de max_sessions : évince la session utilisée le moins récemment, toutes parties confondues.
+
+        Appelée après une création, verrou de la partie relâché : chaque partie
+        est verrouillée à son tour (jamais deux à la fois) pour lire sa tête LRU.
+        """
+        while self._max_sessions and self._live > self._max_sessions:
+            candidate = None
+            for stripe in self._stripes:
+                with stripe.lock:
+                    head = stripe.oldest()
+                if head is not None and (candidate is None or head < candidate[0]):
+                    candidate = (head, stripe)
+            if candidate is None:
+                return
+            (_, session_id), stripe = candidate
+            with stripe:
+                # Utilisée entre-temps : elle n'est plus la tête, on recommence
+                if stripe.oldest() == candidate[0] and self._live > self._max_sessions:
+                    stripe.evict(session_id, "capacity")
+
+    def _stripe(self, session_id: str) -> _Stripe:
+        return self._stripes[hash(session_id) % len(self._stripes)]
+
+    def sweep(self) -> list[str]:
+        evicted = []
+        for stripe in self._stripes:
+            with stripe:
+                stripe.sweep()
+                evicted.extend(session_id for session_id, _ in stripe.pending)
+        return evicted
+
+    def recover(self) -> int:
+        """Rejoue instantané et segments du journal, puis lance son thread de vidage.
+
+        Les sessions dont la dernière utilisation date de plus de ttl sont
+        écartées ; les autres gardent leur version et l'inactivité déjà écoulée.
+        """
+        if self._journal is None:
+            return 0
+        from app.services import catalog_service
+
+        started = time.perf_counter()
+        # Champs encodés, version et dernière écriture de chaque session : les
+        # enregistrements (et les formules) ne sont construits qu'une fois, à la fin
+        restored: dict[str, tuple[dict, int, float]] = {}
+        (snapshot, question_sets), entries = self._journal.load()
+        for saved in snapshot:
+            fields = resolve_questions(saved["fields"], question_sets)
+            restored[saved["session_id"]] = (fields, saved["version"], saved["at"])
+        for entry, segment_question_sets in entries:
+            session_id = entry["sid"]
+            if entry["op"] == "del":
+                restored.pop(session_id, None)
+                continue
+            previous = restored.get(session_id)
+            fields = dict(previous[0]) if previous else {}
+            if entry["op"] == "merge":
+                for name, added in entry["fields"].items():
+                    fields[name] = {**fields.get(name, {}), **added}
+            else:
+                fields.update(resolve_questions(entry["fields"], segment_question_sets))
+            restored[session_id] = (fields, entry["v"], entry["at"])
+
+        by_position = catalog_service.get_catalog_index().by_position
+        wall = time.time()
+        kept = 0
+        # Des plus anciennes aux plus récentes : l'ordre LRU de chaque partie est respecté
+        for session_id, (fields, version, at) in sorted(restored.items(), key=lambda item: item[1][2]):
+            idle = max(0.0, wall - at)
+            if self._ttl and idle >= self._ttl:
+                continue
+            fields = decode_fields(session_id, fields, by_position)
+            record = replace(SessionRecord.empty(session_id).updated(**fields), version=version)
+            stripe = self._stripe(record.session_id)
+            with stripe:
+                stripe.access(record.session_id, create=True, idle=idle)
+                stripe.records[record.session_id] = record
+                if record.exists:
+                    stripe.index_session(record.session_id, record.meta)
+            kept += 1
+        self._journal.start(self._journal_state)
+        logger.info(
+            f"Session store : {kept} session(s) rechargée(s) du journal "
+            f"en {(time.perf_counter() - started) * 1000:.0f} ms ({len(restored) - kept} expirée(s))"
+        )
+        return kept
+
+    def _journal_state(self) -> list[dict]:
+        """État de toutes les sessions pour l'instantané du journal.
+
+        Les enregistrements étant immuables, seules les références sont prises
+        sous verrou ; l'encodage se fait ensuite, hors verrou.
+        """
+        state = []
+        for stripe in self._stripes:
+            with stripe.lock:
+                now, wall = stripe.clock(), time.time()
+                state.extend(
+                    (record, stripe.last_used(session_id, now, wall))
+                    for session_id, record in stripe.records.items()
+                )
+        return [
+            {
+                "session_id": record.session_id,
+                "version": record.version,
+                "at": at,
+                "fields": {
+                    "meta": record.meta,
+                    "profile": record.profile,
+                    "answers": record.answers,
+                    "generated_formulas": record.generated_formulas,
+                    "selected_formula": record.selected_formula,
+                },
+            }
+            for record, at in state
+        ]
+
+    def close(self) -> None:
+        if self._journal is not None:
+            self._journal.close()
+
+    def stats(self) -> dict:
+        evictions = {"ttl": 0, "capacity": 0}
+        for stripe in self._stripes:
+            with stripe.lock:
+                for reason, n in stripe.evictions.items():
+                    evictions[reason] += n
+        return {
+            "backend": self.kind,
+            "stripes": len(self._stripes),
+            "live_sessions": self._live,
+            "max_sessions": self._max_sessions or None,
+            "idle_ttl": self._ttl or None,
+            "evictions": evictions,
+            "journal": self._journal.stats() if self._journal is not None else None,
+        }
+
+    def save_session_meta(self, session_id: str, mapping: dict) -> None:
+        stripe = self._stripe(session_id)
+        with stripe:
+            # Création de session : occasion de libérer les sessions échues
+            stripe.sweep()
+            stripe.access(session_id, create=True)
+            stripe.update(session_id, meta=mapping)
+            stripe.index_session(session_id, mapping)
+
+    def _read(self, session_id: str) -> SessionRecord | None:
+        stripe = self._stripe(session_id)
+        with stripe:
+            stripe.access(session_id, create=False)
+            return stripe.records.get(session_id)
+
+    # Lectures : l'enregistrement courant est partagé, sans copie
+
+    def get_session_meta(self, session_id: str) -> dict | None:
+        record = self._read(session_id)
+        return record.meta if record else None
+
+    def get_session_version(self, session_id: str) -> int | None:
+        record = self._read(session_id)
+        return record.version if record else None
+
+    def get_snapshot(self, session_id: str) -> SessionRecord:
+        return self._read(session_id) or SessionRecord.empty(session_id)
+
+    def get_session_answers(self, session_id: str) -> dict | None:
+        record = self._read(session_id)
+        return record.answers_view if record else None
+
+    def get_user_profile(self, session_id: str) -> dict | None:
+        record = self._read(session_id)
+        return (record.profile or None) if record else None
+
+    def get_selected_formula(self, session_id: str) -> Formula | None:
+        record = self._read(session_id)
+        return record.selected_formula if record else None
+
+    def get_generated_formulas(self, session_id: str) -> tuple[Formula, ...] | None:
+        record = self._read(session_id)
+        return record.generated_formulas if record else None
+
+    def list_session_ids(self) -> list[str]:
+        ids = []
+        for stripe in self._stripes:
+            with stripe:
+                stripe.sweep()
+                ids.extend(stripe.index)
+        return ids
+
+    def get_all_sessions(self) -> list[dict]:
+        # Une prise de verrou par partie ; la liste ne compte pas comme une utilisation des sessions
+        sessions = []
+        for stripe in self._stripes:
+            with stripe:
+                stripe.sweep()
+                sessions.extend(stripe.records[sid].answers_view for sid in stripe.index)
+        return sessions
+
+    def list_sessions(self, limit, cursor=None, filters=SessionFilter()):
+        # Au plus limit + 1 sessions par partie, fusionnées par date de création
+        pages = []
+        for stripe in self._stripes:
+            with stripe:
+                stripe.sweep()
+                pages.append(stripe.page(cursor, filters, limit + 1))
+        merged = list(islice(heapq.merge(*pages, key=lambda item: item[0]), limit + 1))
+        next_cursor = merged[limit - 1][0] if len(merged) > limit else None
+        return [view for _, view in merged[:limit]], next_cursor
+
+    # Écritures : nouvelle version de l'enregistrement
+
+    def save_answer(self, session_id: str, question_id: int, answer: dict) -> None:
+        stripe = self._stripe(session_id)
+        with stripe:
+            stripe.access(session_id, create=True)
+            answers = stripe.record(session_id).answers
+            stripe.update(
+                session_id, merged={"answers": {str(question_id): answer}}, answers={**answers, str(question_id): answer},
+            )
+
+    def save_user_profile(self, session_id: str, field: str, value: str) -> None:
+        stripe = self._stripe(session_id)
+        with stripe:
+            stripe.access(session_id, create=True)
+            profile = stripe.record(session_id).profile
+            stripe.update(session_id, merged={"profile": {field: value}}, profile={**profile, field: value})
+
+    def save_selected_formula(self, session_id: str, formula: Formula) -> None:
+        stripe = self._stripe(session_id)
+        with stripe:
+            stripe.access(session_id, create=True)
+            stripe.update(session_id, selected_formula=formula)
+
+    def save_generated_formulas(self, session_id: str, formulas: list[Formula]) -> None:
+        stripe = self._stripe(session_id)
+        with stripe:
+            stripe.access(session_id, create=True)
+            stripe.update(session_id, generated_formulas=tuple(formulas))
+
+    def delete_session(self, session_id: str) -> bool:
+        stripe = self._stripe(session_id)
+        with stripe:
+            record = stripe.records.get(session_id)
+            stripe.drop(session_id)
+            return record is not None and record.exists
+
+    # Scores cumulés : accumulateur mutable, hors enregistrement (dérivé des réponses)
+
+    def fold_answer_scores(self, session_id, question_id, matrix, rows, weights) -> None:
+        stripe = self._stripe(session_id)
+        with stripe:
+            stripe.access(session_id, create=True)
+            acc = stripe.scores.get(session_id)
+            if acc is None or acc.matrix is not matrix:
+                acc = matrix.accumulator()
+                stripe.scores[session_id] = acc
+            acc.set_answer(question_id, rows, weights)
+
+    def reset_scores(self, session_id: str) -> None:
+        stripe = self._stripe(session_id)
+        with stripe:
+            stripe.access(session_id, create=False)
+            stripe.scores.pop(session_id, None)
+
+    def get_score_snapshot(self, session_id: str) -> dict | None:
+        stripe = self._stripe(session_id)
+        with stripe:
+            stripe.access(session_id, create=False)
+            acc = stripe.scores.get(session_id)
+            return _snapshot(acc) if acc is not None else None
+
+    def get_note_scores(self, session_id: str) -> tuple[str, dict[str, dict[str, float]]] | None:
+        stripe = self._stripe(session_id)
+        with stripe:
+            stripe.access(session_id, create=False)
+            acc = stripe.scores.get(session_id)
+            return (acc.catalog_version, acc.scores()) if acc is not None else None
+
+
+# ── Redis ─────────────────────────────────────────────────────────────
+
+# Parties d'une session, une clé chacune : session:{id}:{partie}
+_PARTS = ("meta", "profile", "answers", "generated_formulas", "selected_formula", "scores", "version")
+# Ensemble trié des sessions (score : date de création), sans TTL : nettoyé à la lecture
+_INDEX_KEY = "sessions:index"
+# Champ du hash des scores qui porte la version du catalogue des contributions
+_SCORES_VERSION = "catalog_version"
+# Contribution d'une réponse aux scores, en une opération atomique : si le hash
+# porte une autre version du catalogue, il est vidé avant l'écriture (sinon un
+# fold concurrent, écrit entre la lecture de la version et la remise à zéro,
+# serait perdu). KEYS[1] : hash des scores ; ARGV : champ version, version,
+# question, contribution.
+_FOLD_SCORES_LUA = """
+local previous = redis.call('HGET', KEYS[1], ARGV[1])
+if previous and previous ~= ARGV[2] then
+    redis.call('DEL', KEYS[1])
+end
+redis.call('HSET', KEYS[1], ARGV[3], ARGV[4], ARGV[1], ARGV[2])
+return previous
+"""
+
+
+def _key(session_id: str, part: str) -> str:
+    return f"session:{session_id}:{part}"
+
+
+class RedisSessionBackend(SessionBackend):
+    """Sessions dans Redis. Les formules sont stockées par positions de notes
+    (Formula.to_record) et relues avec le catalogue courant ; les scores par
+    contributions (lignes, poids) de chaque question, recomposées à la lecture
+    avec la matrice de scoring de même version."""
+
+    kind = "redis"
+
+    def __init__(self, client, ttl: int = 3600):
+        # client : redis.Redis(decode_responses=True)
+        super().__init__()
+        self._redis = client
+        self._ttl = ttl
+        self._fold_scores = client.register_script(_FOLD_SCORES_LUA)
+
+    @classmethod
+    def from_url(cls, url: str, ttl: int = 3600) -> "RedisSessionBackend":
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("SESSION_STORE_BACKEND=redis nécessite le paquet redis (pip install redis)") from e
+        return cls(redis.Redis.from_url(url, decode_responses=True), ttl)
+
+    def _pipeline(self):
+        return self._redis.pipeline(transaction=False)
+
+    def stats(self) -> dict:
+        # Expiration gérée par Redis (TTL des clés) : pas d'éviction côté backend
+        return {"backend": self.kind, "indexed_sessions": self._redis.zcard(_INDEX_KEY), "idle_ttl": self._ttl}
+
+    def _touch(self, pipe, session_id: str, bump: bool = True) -> None:
+        """Après une écriture : version + 1 (bump) et TTL remis à zéro sur toutes
+        les clés de la session (sans effet sur les clés absentes)."""
+        if bump:
+            pipe.incr(_key(session_id, "version"))
+        for part in _PARTS:
+            pipe.expire(_key(session_id, part), self._ttl)
+
+    # Métadonnées et réponses
+
+    def save_session_meta(self, session_id: str, mapping: dict) -> None:
+        pipe = self._pipeline()
+        pipe.set(_key(session_id, "meta"), json.dumps(mapping, ensure_ascii=False))
+        pipe.zadd(_INDEX_KEY, {session_id: created_ts(mapping)})
+        self._touch(pipe, session_id)
+        pipe.execute()
+
+    def get_session_meta(self, session_id: str) -> dict | None:
+        raw = self._redis.get(_key(session_id, "meta"))
+        return json.loads(raw) if raw is not None else None
+
+    def list_session_ids(self) -> list[str]:
+        ids = self._redis.zrange(_INDEX_KEY, 0, -1)
+        if not ids:
+            return []
+        pipe = self._pipeline()
+        for session_id in ids:
+            pipe.exists(_key(session_id, "meta"))
+        alive = pipe.execute()
+        expired = [sid for sid, exists in zip(ids, alive) if not exists]
+        if expired:
+            self._redis.zrem(_INDEX_KEY, *expired)
+        return [sid for sid, exists in zip(ids, alive) if exists]
+
+    def save_answer(self, session_id: str, question_id: int, answer: dict) -> None:
+        pipe = self._pipeline()
+        pipe.hset(_key(session_id, "answers"), str(question_id), json.dumps(answer, ensure_ascii=False))
+        self._touch(pipe, session_id)
+        pipe.execute()
+
+    @staticmethod
+    def _answers_record(session_id: str, raw_meta: str | None, raw_answers: dict) -> dict | None:
+        if raw_meta is None:
+            return None
+        return {
+            "session_id": session_id,
+            **json.loads(raw_meta),
+            "answers": {qid: json.loads(answer) for qid, answer in raw_answers.items()},
+        }
+
+    def get_session_answers(self, session_id: str) -> dict | None:
+        pipe = self._pipeline()
+        pipe.get(_key(session_id, "meta"))
+        pipe.hgetall(_key(session_id, "answers"))
+        raw_meta, raw_answers = pipe.execute()
+        return self._answers_record(session_id, raw_meta, raw_answers)
+
+    def get_snapshot(self, session_id: str) -> SessionRecord:
+        parts = ("meta", "profile", "answers", "generated_formulas", "selected_formula", "version")
+        # MULTI/EXEC : toutes les parties au même instant. Les écritures n'incrémentent la version
+        # qu'après leurs données, la version lue ne peut donc pas annoncer plus récent que le corps
+        pipe = self._redis.pipeline(transaction=True)
+        for part in parts:
+            (pipe.hgetall if part in ("profile", "answers") else pipe.get)(_key(session_id, part))
+        raw_meta, profile, raw_answers, raw_generated, raw_selected, version = pipe.execute()
+        meta = json.loads(raw_meta) if raw_meta is not None else None
+        answers = {qid: json.loads(answer) for qid, answer in raw_answers.items()}
+        generated = self._decode_formulas(session_id, "generated_formulas", raw_generated)
+        return SessionRecord(
+            session_id=session_id,
+            version=int(version or 0),
+            meta=meta,
+            profile=profile,
+            answers=answers,
+            generated_formulas=tuple(generated) if generated is not None else None,
+            selected_formula=self._decode_formulas(session_id, "selected_formula", raw_selected),
+            answers_view=_answers_view(session_id, meta, answers),
+        )
+
+    def get_session_version(self, session_id: str) -> int | None:
+        version = self._redis.get(_key(session_id, "version"))
+        return int(version) if version is not None else None
+
+    def get_all_sessions(self) -> list[dict]:
+        ids = self.list_session_ids()
+        pipe = self._pipeline()
+        for session_id in ids:
+            pipe.get(_key(session_id, "meta"))
+            pipe.hgetall(_key(session_id, "answers"))
+        replies = pipe.execute()
+        sessions = (
+            self._answers_record(sid, replies[2 * i], replies[2 * i + 1])
+            for i, sid in enumerate(ids)
+        )
+        return [d for d in sessions if d]
+
+    def list_sessions(self, limit, cursor=None, filters=SessionFilter()):
+        # Parcours de sessions:index par tranches ; une session expirée en est retirée au passage
+        low = filters.created_after if filters.created_after is not None else "-inf"
+        if cursor is not None and (filters.created_after is None or cursor[0] >= filters.created_after):
+            low = cursor[0]
+        high = f"({filters.created_before}" if filters.created_before is not None else "+inf"
+        chunk = max(limit + 1, 32)
+        found: list[tuple[SessionCursor, dict]] = []
+        expired: list[str] = []
+        offset = 0
+        while len(found) <= limit:
+            batch = self._redis.zrangebyscore(_INDEX_KEY, low, high, start=offset, num=chunk, withscores=True)
+            if not batch:
+                break
+            offset += len(batch)
+            # Scores égaux au curseur : seuls les session_id qui le suivent
+            keys = [(score, sid) for sid, score in batch if cursor is None or (score, sid) > cursor]
+            pipe = self._pipeline()
+            for _, session_id in keys:
+                pipe.get(_key(session_id, "meta"))
+                pipe.hgetall(_key(session_id, "answers"))
+            replies = pipe.execute()
+            for i, key in enumerate(keys):
+                raw_meta = replies[2 * i]
+                if raw_meta is None:
+                    expired.append(key[1])
+                    continue
+                view = self._answers_record(key[1], raw_meta, replies[2 * i + 1])
+                if filters.matches(view):
+                    found.append((key, view))
+            if len(batch) < chunk:
+                break
+        if expired:
+            self._redis.zrem(_INDEX_KEY, *expired)
+        next_cursor = found[limit - 1][0] if len(found) > limit else None
+        return [view for _, view in found[:limit]], next_cursor
+
+    # Scores cumulés
+
+    def fold_answer_scores(self, session_id, question_id, matrix, rows, weights) -> None:
+        key = _key(session_id, "scores")
+        contribution = json.dumps([list(rows), list(weights)])
+        pipe = self._pipeline()
+        # Contributions d'une autre version du catalogue : l'accumulateur repart de zéro (dans le script)
+        self._fold_scores(
+            keys=[key], args=[_SCORES_VERSION, matrix.catalog_version, str(question_id), contribution], client=pipe,
+        )
+        # Scores dérivés des réponses : la version de la session ne change pas
+        self._touch(pipe, session_id, bump=False)
+        pipe.execute()
+
+    def reset_scores(self, session_id: str) -> None:
+        self._redis.delete(_key(session_id, "scores"))
+
+    def _accumulator(self, session_id: str) -> tuple[str, ScoreAccumulator | None] | None:
+        """(version stockée, accumulateur recomposé) ; accumulateur None si la
+        version n'est pas celle du catalogue courant."""
+        from app.services import catalog_service
+
+        raw = self._redis.hgetall(_key(session_id, "scores"))
+        version = raw.pop(_SCORES_VERSION, None)
+        if version is None:
+            return None
+        matrix = catalog_service.get_scoring_matrix()
+        if matrix.catalog_version != version:
+            return version, None
+        acc = matrix.accumulator()
+        for qid, contribution in raw.items():
+            rows, weights = json.loads(contribution)
+            acc.set_answer(int(qid), rows, weights)
+        return version, acc
+
+    def get_score_snapshot(self, session_id: str) -> dict | None:
+        stored = self._accumulator(session_id)
+        if stored is None:
+            return None
+        version, acc = stored
+        if acc is None:
+            return {"catalog_version": version, "question_ids": set(), "rows": [], "weights": [], "scores": {}}
+        return _snapshot(acc)
+
+    def get_note_scores(self, session_id: str) -> tuple[str, dict[str, dict[str, float]]] | None:
+        stored = self._accumulator(session_id)
+        if stored is None:
+            return None
+        version, acc = stored
+        return version, acc.scores() if acc is not None else {}
+
+    # Profil
+
+    def save_user_profile(self, session_id: str, field: str, value: str) -> None:
+        pipe = self._pipeline()
+        pipe.hset(_key(session_id, "profile"), field, value)
+        self._touch(pipe, session_id)
+        pipe.execute()
+
+    def get_user_profile(self, session_id: str) -> dict | None:
+        return self._redis.hgetall(_key(session_id, "profile")) or None
+
+    # Formules
+
+    def _save_formulas(self, session_id: str, part: str, value) -> None:
+        pipe = self._pipeline()
+        pipe.set(_key(session_id, part), json.dumps(value, ensure_ascii=False))
+        self._touch(pipe, session_id)
+        pipe.execute()
+
+    def _load_formulas(self, session_id: str, part: str):
+        """Formule(s) d'une clé, relue(s) avec le catalogue courant."""
+        return self._decode_formulas(session_id, part, self._redis.get(_key(session_id, part)))
+
+    @staticmethod
+    def _decode_formulas(session_id: str, part: str, raw: str | None):
+        """Formule(s) d'une valeur déjà lue (None : clé absente), sans accès à Redis."""
+        from app.services import catalog_service
+
+        if raw is None:
+            return None
+        by_position = catalog_service.get_catalog_index().by_position
+        record = json.loads(raw)
+        try:
+            if isinstance(record, list):
+                return [Formula.from_record(r, by_position) for r in record]
+            return Formula.from_record(record, by_position)
+        except KeyError as e:
+            logger.warning(f"[{session_id}] {part} illisible avec le catalogue courant (position {e} absente)")
+            return None
+
+    def save_selected_formula(self, session_id: str, formula: Formula) -> None:
+        self._save_formulas(session_id, "selected_formula", formula.to_record())
+
+    def get_selected_formula(self, session_id: str) -> Formula | None:
+        return self._load_formulas(session_id, "selected_formula")
+
+    def save_generated_formulas(self, session_id: str, formulas: list[Formula]) -> None:
+        self._save_formulas(session_id, "generated_formulas", [f.to_record() for f in formulas])
+
+    def get_generated_formulas(self, session_id: str) -> tuple[Formula, ...] | None:
+        formulas = self._load_formulas(session_id, "generated_formulas")
+        return tuple(formulas) if formulas is not None else None
+
+    def delete_session(self, session_id: str) -> bool:
+        pipe = self._pipeline()
+        pipe.exists(_key(session_id, "meta"))
+        pipe.delete(*(_key(session_id, part) for part in _PARTS))
+        pipe.zrem(_INDEX_KEY, session_id)
+        return bool(pipe.execute()[0])
+
+
+def create_backend(
+    kind: str,
+    redis_url: str = "",
+    ttl: int = 3600,
+    max_sessions: int = 0,
+    journal: SessionJournal | None = None,
+) -> SessionBackend:
+    if kind not in BACKEND_KINDS:
+        raise ValueError(f"SESSION_STORE_BACKEND doit valoir {', '.join(BACKEND_KINDS)} (reçu : {kind!r})")
+    if kind == "redis":
+        if journal is not None:
+            logger.warning("SESSION_JOURNAL_DIR ignoré avec le backend redis (persistance assurée par Redis)")
+        return RedisSessionBackend.from_url(redis_url, ttl)
+    return MemorySessionBackend(ttl, max_sessions, journal=journal)
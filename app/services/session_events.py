@@ -0,0 +1,260 @@
+"""Événements de changement des sessions, poussés aux clients abonnés.
+
+Le session store publie chaque écriture (profile_update, answer_saved,
+formulas_generated, formula_selected…) ; GET /api/session/{id}/events les
+diffuse en Server-Sent Events, à la place du polling de /state, /answers et
+/profile.
+
+  - Canal par session, créé au premier abonnement : tant que personne n'écoute
+    une session, publier se réduit à une recherche dans un dict.
+  - Chaque événement reçoit un numéro de séquence croissant dans sa session.
+    Il est encodé une fois en JSON puis partagé entre tous les abonnés.
+  - Les SESSION_EVENTS_HISTORY derniers événements restent en mémoire : un
+    client reconnecté reprend après le dernier numéro reçu (Last-Event-ID).
+  - Chaque abonné a une file asyncio bornée (SESSION_EVENTS_QUEUE_SIZE), remplie
+    depuis n'importe quel thread par call_soon_threadsafe. L'écrivain n'attend
+    jamais. Un abonné trop lent dont la file déborde rattrape son retard depuis
+    l'historique. Si l'historique ne couvre plus ce retard, il reçoit un
+    événement "reset" : l'état est à relire en entier.
+  - Suppression ou expiration de la session : dernier événement, puis le canal
+    et ses abonnements sont fermés.
+
+Les événements restent dans le process qui a fait l'écriture. Avec le backend
+redis et plusieurs workers, un abonné ne voit que les écritures de son
+worker.
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+from dataclasses import dataclass
+from threading import Lock
+
+RESET = "reset"
+
+
+@dataclass(frozen=True, slots=True)
+class SessionEvent:
+    seq: int
+    event: str
+    data: str  # JSON déjà encodé
+
+    def sse(self) -> str:
+        """Bloc Server-Sent Events ; id = numéro de séquence (Last-Event-ID à la reconnexion)."""
+        return f"id: {self.seq}\nevent: {self.event}\ndata: {self.data}\n\n"
+
+
+def _reset(seq: int) -> SessionEvent:
+    return SessionEvent(seq, RESET, json.dumps({"seq": seq}))
+
+
+def _post(loop: asyncio.AbstractEventLoop, callback, *args) -> None:
+    """Planifie callback sur la boucle ; sans réveil (écriture sur le self-pipe) depuis son propre thread."""
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    try:
+        if running is loop:
+            loop.call_soon(callback, *args)
+        else:
+            loop.call_soon_threadsafe(callback, *args)
+    except RuntimeError:
+        # Boucle fermée (arrêt) : plus personne à prévenir
+        pass
+
+
+def _offer_all(subscriptions: list["Subscription"], event: SessionEvent) -> None:
+    for subscription in subscriptions:
+        subscription._offer(event)
+
+
+def _close_all(subscriptions: list["Subscription"], final: SessionEvent) -> None:
+    for subscription in subscriptions:
+        subscription._close(final)
+
+
+class _Channel:
+    __slots__ = ("seq", "history", "subscribers", "touched")
+
+    def __init__(self, history: int):
+        self.seq = 0
+        self.history: deque[SessionEvent] = deque(maxlen=history)
+        self.subscribers: set[Subscription] = set()
+        self.touched = time.monotonic()
+
+    def since(self, after: int) -> list[SessionEvent]:
+        """Événements après le numéro after ; [reset] si l'historique ne les couvre plus."""
+        if after == self.seq:
+            return []
+        oldest = self.history[0].seq if self.history else self.seq + 1
+        if after > self.seq or oldest > after + 1:
+            return [_reset(self.seq)]
+        return [event for event in self.history if event.seq > after]
+
+
+class Subscription:
+    """Abonnement d'un client aux événements d'une session, lu depuis la boucle asyncio.
+
+    Les événements arrivent dans la file par callbacks planifiés sur la boucle
+    (_offer, _close) : la file, le retard et la fermeture ne sont manipulés que
+    depuis le thread de la boucle.
+    """
+
+    def __init__(self, bus: "SessionEventBus", session_id: str, loop: asyncio.AbstractEventLoop, queue_size: int, last_seq: int):
+        self.bus = bus
+        self.session_id = session_id
+        self.loop = loop
+        self.last_seq = last_seq
+        self.queue: asyncio.Queue[SessionEvent | None] = asyncio.Queue(queue_size)
+        self.backlog: deque[SessionEvent] = deque()
+        self.lagged = False
+        self.closed = False
+
+    def _offer(self, event: SessionEvent) -> None:
+        if self.closed or self.lagged:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Plus rien n'est mis en file : le retard est rattrapé depuis l'historique une fois la file vidée
+            self.lagged = True
+            self.bus._count("lagged")
+
+    def _close(self, final: SessionEvent) -> None:
+        self._offer(final)
+        self.closed = True
+        if self.lagged:
+            # Le canal n'existe plus pour rattraper le retard : au moins le dernier événement
+            self.backlog.append(final)
+        try:
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+    async def get(self, timeout: float | None = None) -> SessionEvent | None:
+        """Événement suivant ; None quand la session est fermée. TimeoutError si rien avant timeout."""
+        while True:
+            if self.backlog:
+                event = self.backlog.popleft()
+            elif self.queue.empty() and self.lagged:
+                self.lagged = False
+                self.backlog.extend(self.bus._since(self.session_id, self.last_seq))
+                continue
+            elif self.queue.empty() and self.closed:
+                return None
+            else:
+                event = await asyncio.wait_for(self.queue.get(), timeout)
+                if event is None:
+                    return None
+            if event.event == RESET:
+                self.bus._count("resets")
+            elif event.seq <= self.last_seq:
+                # Déjà reçu depuis l'historique (reprise ou rattrapage)
+                continue
+            self.last_seq = event.seq
+            return event
+
+    def close(self) -> None:
+        """Désabonnement (fin du flux côté client)."""
+        self.bus._unsubscribe(self)
+
+
+class SessionEventBus:
+    def __init__(self, history: int = 256, queue_size: int = 64):
+        self.history = history
+        self.queue_size = queue_size
+        self._lock = Lock()
+        self._channels: dict[str, _Channel] = {}
+        self._counters = {"published": 0, "lagged": 0, "resets": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def watched(self, session_id: str) -> bool:
+        """Vrai si la session a (ou a eu) un abonné : sinon rien n'est à publier."""
+        return session_id in self._channels
+
+    def subscribe(self, session_id: str, after: int | None = None) -> Subscription:
+        """Abonne la boucle courante aux événements de la session.
+
+        after : dernier numéro reçu par le client ; les événements suivants encore
+        dans l'historique sont rejoués avant les nouveaux, ou un "reset" s'il
+        n'en a plus. Sans after, seuls les événements à venir sont reçus.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            channel = self._channels.get(session_id)
+            if channel is None:
+                channel = self._channels[session_id] = _Channel(self.history)
+            subscription = Subscription(self, session_id, loop, self.queue_size, channel.seq if after is None else after)
+            if after is not None:
+                subscription.backlog.extend(channel.since(after))
+            channel.subscribers.add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            channel = self._channels.get(subscription.session_id)
+            if channel is not None:
+                channel.subscribers.discard(subscription)
+                channel.touched = time.monotonic()
+
+    def _since(self, session_id: str, after: int) -> list[SessionEvent]:
+        with self._lock:
+            channel = self._channels.get(session_id)
+            return channel.since(after) if channel is not None else []
+
+    def publish(self, session_id: str, event: str, data: dict, close: bool = False) -> None:
+        """Publie un événement aux abonnés de la session, depuis n'importe quel thread.
+
+        close=True : dernier événement de la session (suppression, expiration) ;
+        le canal est retiré et ses abonnements se terminent après l'avoir reçu.
+        """
+        if session_id not in self._channels:
+            return
+        encoded = json.dumps(data, ensure_ascii=False)
+        with self._lock:
+            channel = self._channels.get(session_id)
+            if channel is None:
+                return
+            channel.seq += 1
+            channel.touched = time.monotonic()
+            item = SessionEvent(channel.seq, event, encoded)
+            channel.history.append(item)
+            self._counters["published"] += 1
+            if close:
+                del self._channels[session_id]
+            # Un callback par boucle (en pratique celle d'uvicorn) plutôt qu'un réveil par abonné.
+            # Sous le verrou : les callbacks d'une boucle s'exécutent dans l'ordre des numéros
+            by_loop: dict[asyncio.AbstractEventLoop, list[Subscription]] = {}
+            for subscription in channel.subscribers:
+                by_loop.setdefault(subscription.loop, []).append(subscription)
+            for loop, subscriptions in by_loop.items():
+                _post(loop, _close_all if close else _offer_all, subscriptions, item)
+
+    def prune(self, idle: float) -> int:
+        """Retire les canaux sans abonné ni événement depuis idle secondes ; renvoie leur nombre.
+
+        Sessions expirées sans notification du backend (TTL des clés Redis) :
+        leur canal ne reçoit plus rien et son historique ne sert plus.
+        """
+        deadline = time.monotonic() - idle
+        with self._lock:
+            stale = [
+                session_id for session_id, channel in self._channels.items()
+                if not channel.subscribers and channel.touched < deadline
+            ]
+            for session_id in stale:
+                del self._channels[session_id]
+        return len(stale)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "channels": len(self._channels),
+                "subscribers": sum(len(channel.subscribers) for channel in self._channels.values()),
+                **self._counters,
+            }
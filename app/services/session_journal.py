@@ -0,0 +1,325 @@
+"""Journal local des sessions du backend mémoire (SESSION_JOURNAL_DIR).
+
+Chaque écriture du store (nouvelle version d'une session, suppression,
+éviction) est ajoutée à un tampon, sous le verrou de la partie concernée :
+un simple append, l'encodage JSON se fait plus tard. Un thread vide le
+tampon toutes les SESSION_JOURNAL_FSYNC_INTERVAL secondes dans le segment
+courant (journal-NNNNNN.ndjson, une entrée par ligne) puis fait un seul
+fsync pour tout le lot : le coût d'écriture est borné quel que soit le
+trafic, au prix d'une fenêtre de perte de cet intervalle en cas de crash.
+
+Compaction : au-delà de SESSION_JOURNAL_COMPACT_BYTES (et à l'arrêt), le
+segment est clos, un nouveau est ouvert, puis l'état de toutes les sessions
+est écrit dans snapshot.json (fichier temporaire + renommage atomique) avec
+le numéro du premier segment à rejouer ; les segments précédents sont
+supprimés. Les entrées portent les valeurs complètes des champs écrits, ou
+les clés ajoutées (merge : une réponse, un champ de profil) : rejouer sur
+l'instantané une entrée déjà prise en compte est sans effet.
+
+Les listes de questions des métadonnées (identiques d'une session à l'autre
+pour une même langue) sont écrites une fois par fichier et référencées par
+numéro ; à la relecture, les sessions d'un même jeu partagent la même liste.
+
+Au démarrage : instantané puis segments, dans l'ordre. Une dernière ligne
+tronquée (crash pendant l'écriture) est ignorée. Un répertoire par process.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterator
+
+from app.services.formula_model import Formula
+
+logger = logging.getLogger("lylo.session_journal")
+
+SNAPSHOT_FILE = "snapshot.json"
+_SEGMENT_PREFIX = "journal-"
+_SEGMENT_SUFFIX = ".ndjson"
+
+
+# Référence à une liste de questions déjà écrite : {"$questions": numéro}
+_QUESTIONS_REF = "$questions"
+
+
+class _QuestionSets:
+    """Listes de questions distinctes d'un fichier, numérotées dans l'ordre d'écriture."""
+
+    def __init__(self):
+        self.ids: dict[str, int] = {}
+
+    def ref(self, questions: list) -> tuple[dict, str | None]:
+        """Référence de la liste et, si elle est nouvelle, son JSON à écrire avant."""
+        raw = json.dumps(questions, ensure_ascii=False, separators=(",", ":"))
+        known = self.ids.get(raw)
+        if known is not None:
+            return {_QUESTIONS_REF: known}, None
+        self.ids[raw] = len(self.ids)
+        return {_QUESTIONS_REF: self.ids[raw]}, raw
+
+
+def encode_fields(fields: dict, question_sets: _QuestionSets | None = None, defined: list | None = None) -> dict:
+    """Champs d'un SessionRecord sous forme JSON (formules par positions de notes).
+
+    Avec question_sets, les questions des métadonnées sont remplacées par une
+    référence ; le JSON des listes nouvelles est ajouté à defined.
+    """
+    encoded = dict(fields)
+    meta = encoded.get("meta")
+    if question_sets is not None and meta and isinstance(meta.get("questions"), list):
+        ref, raw = question_sets.ref(meta["questions"])
+        if raw is not None:
+            defined.append(raw)
+        encoded["meta"] = {**meta, "questions": ref}
+    if "selected_formula" in encoded and encoded["selected_formula"] is not None:
+        encoded["selected_formula"] = encoded["selected_formula"].to_record()
+    if "generated_formulas" in encoded and encoded["generated_formulas"] is not None:
+        encoded["generated_formulas"] = [f.to_record() for f in encoded["generated_formulas"]]
+    return encoded
+
+
+def resolve_questions(fields: dict, question_sets: list) -> dict:
+    """Remplace la référence aux questions des métadonnées par la liste de son fichier."""
+    meta = fields.get("meta")
+    if meta and isinstance(meta.get("questions"), dict):
+        fields = {**fields, "meta": {**meta, "questions": question_sets[meta["questions"][_QUESTIONS_REF]]}}
+    return fields
+
+
+def decode_fields(session_id: str, fields: dict, by_position: dict) -> dict:
+    """Inverse d'encode_fields pour les formules ; une formule illisible avec le catalogue courant devient None."""
+    decoded = dict(fields)
+    try:
+        if decoded.get("selected_formula") is not None:
+            decoded["selected_formula"] = Formula.from_record(decoded["selected_formula"], by_position)
+        if decoded.get("generated_formulas") is not None:
+            decoded["generated_formulas"] = tuple(
+                Formula.from_record(r, by_position) for r in decoded["generated_formulas"]
+            )
+    except KeyError as e:
+        logger.warning(f"[{session_id}] formules illisibles avec le catalogue courant (position {e} absente)")
+        decoded["selected_formula"] = decoded["generated_formulas"] = None
+    return decoded
+
+
+def _segment_name(seq: int) -> str:
+    return f"{_SEGMENT_PREFIX}{seq:06d}{_SEGMENT_SUFFIX}"
+
+
+def _fsync_dir(directory: Path) -> None:
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class SessionJournal:
+    """Journal en ajout seul + instantanés compactés (voir le docstring du module)."""
+
+    def __init__(self, directory: str | Path, fsync_interval: float = 0.2, compact_bytes: int = 4_000_000):
+        self.directory = Path(directory)
+        self.fsync_interval = fsync_interval
+        self.compact_bytes = compact_bytes
+        self._lock = threading.Lock()
+        # (session_id, version, horodatage, champs | None pour une suppression, fusion)
+        self._buffer: list[tuple[str, int, float, dict | None, bool]] = []
+        self._seq = 0
+        self._file = None
+        self._segment_bytes = 0
+        self._question_sets = _QuestionSets()
+        self._snapshot_source: Callable[[], list[dict]] | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._stats = {"entries": 0, "flushes": 0, "compactions": 0, "last_flush_ms": None, "last_compaction_ms": None}
+
+    # ── Écriture ──────────────────────────────────────────────────────
+
+    def append(self, session_id: str, version: int, fields: dict | None, merge: bool = False) -> None:
+        """Entrée à journaliser : champs écrits (valeurs immuables, encodées au vidage) ou suppression (None).
+
+        merge : fields donne des clés à ajouter aux dict de la session, pas leur valeur complète.
+        """
+        with self._lock:
+            self._buffer.append((session_id, version, time.time(), fields, merge))
+
+    def start(self, snapshot_source: Callable[[], list[dict]]) -> None:
+        """Ouvre un nouveau segment et lance le thread de vidage.
+
+        snapshot_source() renvoie l'état de toutes les sessions pour la compaction
+        ({"session_id", "version", "at", "fields"} chacune).
+        """
+        self._snapshot_source = snapshot_source
+        self._open_segment(self._seq + 1)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="lylo-session-journal", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.fsync_interval):
+            try:
+                self.flush()
+                if self._segment_bytes >= self.compact_bytes:
+                    self.compact()
+            except Exception as e:
+                logger.error(f"Journal des sessions : écriture échouée : {e}")
+
+    def _open_segment(self, seq: int) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if self._file is not None:
+            self._file.close()
+        self._seq = seq
+        self._file = open(self.directory / _segment_name(seq), "ab")
+        self._segment_bytes = self._file.tell()
+        # Les références ne valent que dans leur fichier : un segment rouvert redéfinit ses listes
+        self._question_sets = _QuestionSets()
+        _fsync_dir(self.directory)
+
+    def flush(self) -> int:
+        """Écrit le tampon dans le segment courant avec un seul fsync ; renvoie le nombre d'entrées."""
+        with self._lock:
+            pending, self._buffer = self._buffer, []
+        if not pending:
+            return 0
+        started = time.perf_counter()
+        lines = []
+        for session_id, version, at, fields, merge in pending:
+            if fields is None:
+                entry = {"op": "del", "sid": session_id, "at": at}
+            elif merge:
+                entry = {"op": "merge", "sid": session_id, "v": version, "at": at, "fields": fields}
+            else:
+                defined: list[str] = []
+                encoded = encode_fields(fields, self._question_sets, defined)
+                lines.extend(f'{{"op":"questions","value":{raw}}}' for raw in defined)
+                entry = {"op": "set", "sid": session_id, "v": version, "at": at, "fields": encoded}
+            lines.append(json.dumps(entry, ensure_ascii=False, separators=(",", ":")))
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._segment_bytes += len(data)
+        self._stats["entries"] += len(pending)
+        self._stats["flushes"] += 1
+        self._stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return len(pending)
+
+    def compact(self) -> None:
+        """Nouveau segment, instantané de toutes les sessions, suppression des segments couverts."""
+        started = time.perf_counter()
+        self.flush()
+        # Les écritures qui suivent vont dans le nouveau segment, rejoué par-dessus l'instantané
+        self._open_segment(self._seq + 1)
+        sessions = self._snapshot_source() if self._snapshot_source else []
+        question_sets, defined = _QuestionSets(), []
+        encoded = [{**s, "fields": encode_fields(s["fields"], question_sets, defined)} for s in sessions]
+        head = json.dumps({"journal_from": self._seq, "written_at": time.time()}, separators=(",", ":"))
+        body = json.dumps(encoded, ensure_ascii=False, separators=(",", ":"))
+        tmp = self.directory / f"{SNAPSHOT_FILE}.tmp"
+        with open(tmp, "wb") as f:
+            # Listes de questions déjà encodées : insérées telles quelles
+            f.write(f'{head[:-1]},"question_sets":[{",".join(defined)}],"sessions":{body}}}'.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.directory / SNAPSHOT_FILE)
+        _fsync_dir(self.directory)
+        for seq, path in self._segments():
+            if seq < self._seq:
+                path.unlink(missing_ok=True)
+        self._stats["compactions"] += 1
+        self._stats["last_compaction_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        logger.info(f"Journal des sessions compacté : {len(sessions)} session(s)")
+
+    def close(self, compact: bool = True) -> None:
+        """Arrête le thread, vide le tampon et, par défaut, compacte (redémarrage rapide)."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        if self._file is None:
+            return
+        if compact:
+            self.compact()
+        else:
+            self.flush()
+        self._file.close()
+        self._file = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._buffer)
+        return {
+            "directory": str(self.directory),
+            "segment": self._seq,
+            "segment_bytes": self._segment_bytes,
+            "pending": pending,
+            **self._stats,
+        }
+
+    # ── Relecture ─────────────────────────────────────────────────────
+
+    def _segments(self) -> list[tuple[int, Path]]:
+        segments = []
+        for path in self.directory.glob(f"{_SEGMENT_PREFIX}*{_SEGMENT_SUFFIX}"):
+            try:
+                segments.append((int(path.name[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)]), path))
+            except ValueError:
+                continue
+        return sorted(segments)
+
+    def load(self) -> tuple[tuple[list[dict], list], Iterator[tuple[dict, list]]]:
+        """Instantané puis entrées des segments à rejouer ensuite, dans l'ordre.
+
+        Renvoie (sessions de l'instantané, ses listes de questions) et, pour
+        chaque entrée, (entrée, listes de questions de son segment), à passer
+        à resolve_questions.
+        """
+        sessions: list[dict] = []
+        question_sets: list = []
+        journal_from = 0
+        snapshot_path = self.directory / SNAPSHOT_FILE
+        if snapshot_path.exists():
+            with open(snapshot_path, "rb") as f:
+                snapshot = json.loads(f.read())
+            sessions = snapshot["sessions"]
+            question_sets = snapshot["question_sets"]
+            journal_from = snapshot["journal_from"]
+        all_segments = self._segments()
+        # Le prochain segment (start) suit tous les segments existants et l'instantané
+        self._seq = max([journal_from - 1, 0] + [seq for seq, _ in all_segments])
+        segments = [(seq, path) for seq, path in all_segments if seq >= journal_from]
+        return (sessions, question_sets), self._entries(segments)
+
+    @staticmethod
+    def _read_segment(path: Path) -> list[dict]:
+        """Entrées d'un segment, décodées en un seul appel (les lignes JSON ne contiennent pas de saut de ligne)."""
+        with open(path, "rb") as f:
+            data = f.read().rstrip(b"\n")
+        if not data:
+            return []
+        try:
+            return json.loads(b"[" + data.replace(b"\n", b",") + b"]")
+        except ValueError:
+            pass
+        entries = []
+        for line in data.split(b"\n"):
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # Ligne tronquée par un crash en cours d'écriture : fin du segment
+                logger.warning(f"Journal des sessions : ligne illisible ignorée dans {path.name}")
+                break
+        return entries
+
+    @classmethod
+    def _entries(cls, segments: list[tuple[int, Path]]) -> Iterator[tuple[dict, list]]:
+        for _, path in segments:
+            question_sets: list = []
+            for entry in cls._read_segment(path):
+                if entry["op"] == "questions":
+                    question_sets.append(entry["value"])
+                else:
+                    yield entry, question_sets
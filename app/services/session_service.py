@@ -1,9 +1,10 @@
+import asyncio
 import uuid
 import logging
 
 from app.config import get_settings
-from app.data.questions import QUESTIONS_EN, QUESTIONS_FR, _enrich_questions
-from app.services.livekit_service import create_token, create_room_with_agent
+from app.data.questions import question_set_key
+from app.services.livekit_service import create_token, create_room_with_agent, delete_room
 from app.services import session_store
 
 logger = logging.getLogger("lylo.session")
@@ -17,31 +18,32 @@ async def create_session(language: str, voice_gender: str, question_count: int,
     user_identity = f"user_{session_id}"
 
     voice_id = settings.voice_mapping[language][voice_gender]
-    questions_pool = QUESTIONS_FR if language == "fr" else QUESTIONS_EN
-    questions = _enrich_questions(questions_pool[:question_count])
+    # Jeu de questions partagé, référencé par sa clé dans les métadonnées
+    question_set = question_set_key(language, question_count)
 
     user_token = create_token(user_identity, room_name)
 
     # Save metadata BEFORE dispatching the agent so it can find the session immediately
-    session_store.save_session_meta(
+    await session_store.run(
+        session_store.save_session_meta,
         session_id=session_id,
         language=language,
         voice_gender=voice_gender,
         voice_id=voice_id,
         room_name=room_name,
-        questions=questions,
+        question_set=question_set,
         mode=mode,
         input_mode=input_mode,
         customer_email=customer_email,
         avatar=avatar,
     )
     logger.info(
-        "[session] session meta saved session_id=%s room=%s language=%s voice_gender=%s questions=%s mode=%s input_mode=%s avatar=%s",
+        "[session] session meta saved session_id=%s room=%s language=%s voice_gender=%s question_set=%s mode=%s input_mode=%s avatar=%s",
         session_id,
         room_name,
         language,
         voice_gender,
-        len(questions),
+        question_set,
         mode,
         input_mode,
         avatar,
@@ -53,7 +55,7 @@ async def create_session(language: str, voice_gender: str, question_count: int,
         logger.info("[session] LiveKit room ready for session_id=%s room=%s", session_id, room_name)
     except Exception:
         logger.exception("[session] failed to create LiveKit room for session_id=%s room=%s", session_id, room_name)
-        session_store.delete_session(session_id)
+        await session_store.run(session_store.delete_session, session_id)
         raise
 
     return {
@@ -71,3 +73,17 @@ def get_session(session_id: str) -> dict | None:
 
 def list_session_ids() -> list[str]:
     return session_store.list_session_ids()
+
+
+def delete_rooms_on_eviction(loop: asyncio.AbstractEventLoop) -> None:
+    """Supprime la room LiveKit de chaque session évincée par le session store.
+
+    L'éviction peut survenir dans un worker du pool : la suppression est
+    planifiée sur la boucle de l'application.
+    """
+    def hook(session_id: str, meta: dict | None) -> None:
+        room_name = (meta or {}).get("room_name") or f"room_{session_id}"
+        logger.info(f"[{session_id}] session évincée, suppression de la room {room_name}")
+        asyncio.run_coroutine_threadsafe(delete_room(room_name), loop)
+
+    session_store.add_eviction_hook(hook)
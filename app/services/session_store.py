@@ -1,17 +1,144 @@
+"""Stockage des sessions en cours : métadonnées, profil, réponses, scores
+cumulés et formules.
+
+Les fonctions du module délèguent au backend choisi par SESSION_STORE_BACKEND
+(voir session_backends) : memory (par défaut, dictionnaires du process) ou
+redis (partagé entre workers et répliques, TTL SESSION_TTL).
+
+Les lectures renvoient des données partagées, sans copie : les dict
+(métadonnées, profil, réponses) ne doivent pas être modifiés par l'appelant.
+
+Les sessions abandonnées ne restent pas : expiration après SESSION_TTL
+d'inactivité (sweep() périodique, voir app_factory) et, en mémoire, plafond
+SESSION_MAX_COUNT avec éviction de la moins récemment utilisée.
+
+En mémoire, SESSION_JOURNAL_DIR active un journal local des écritures
+(voir session_journal) : les sessions en cours survivent à un redémarrage.
+
+Les routes async appellent le store par run() : direct en mémoire, dans un
+thread avec redis, dont le client est bloquant.
+
+Chaque écriture est aussi publiée aux abonnés de la session (voir
+session_events, GET /api/session/{id}/events) ; sans abonné, rien n'est encodé.
+"""
+
+import asyncio
+import logging
 from datetime import datetime, timezone
-from threading import Lock
+from typing import Any, Callable, Iterator
+
+from app.config import get_settings
+from app.data.questions import with_questions
+from app.services.formula_model import Formula
+from app.services.scoring_matrix import ScoringMatrix
+from app.services.session_backends import (
+    SessionBackend,
+    SessionCursor,
+    SessionFilter,
+    SessionRecord,
+    create_backend,
+    missing_profile_fields,
+)
+from app.services.session_events import SessionEventBus, Subscription
+from app.services.session_journal import SessionJournal
+
+logger = logging.getLogger("lylo.session_store")
+
+_backend: SessionBackend | None = None
+_events: SessionEventBus | None = None
+
+
+def configure(backend: SessionBackend | None = None) -> SessionBackend:
+    """Installe le backend donné, ou celui de la configuration (SESSION_STORE_BACKEND)."""
+    global _backend
+    if backend is None:
+        settings = get_settings()
+        journal = None
+        if settings.session_journal_dir:
+            journal = SessionJournal(
+                settings.session_journal_dir,
+                settings.session_journal_fsync_interval,
+                settings.session_journal_compact_bytes,
+            )
+        backend = create_backend(
+            settings.session_store_backend, settings.redis_url, settings.session_ttl, settings.session_max_count,
+            journal,
+        )
+    backend.add_eviction_hook(_on_evicted)
+    _backend = backend
+    logger.info(f"Session store : backend {backend.kind}")
+    return backend
+
+
+def get_backend() -> SessionBackend:
+    """Backend installé ; celui de la configuration au premier appel."""
+    return _backend or configure()
+
+
+def get_events() -> SessionEventBus:
+    """Bus des événements de session ; créé depuis la configuration au premier appel."""
+    global _events
+    if _events is None:
+        settings = get_settings()
+        _events = SessionEventBus(settings.session_events_history, settings.session_events_queue_size)
+    return _events
+
+
+async def run(fn: Callable, *args, **kwargs) -> Any:
+    """Exécute fn (appels au session store) depuis une route async.
+
+    Backend mémoire : appel direct, il ne fait qu'attendre un verrou. Backend
+    redis : le client est synchrone et chaque appel attend le réseau ; fn
+    passe dans un thread (asyncio.to_thread) pour ne pas bloquer la boucle.
+    """
+    if get_backend().kind == "memory":
+        return fn(*args, **kwargs)
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+
+def subscribe(session_id: str, after: int | None = None) -> Subscription:
+    """Abonne la boucle courante aux changements de la session ; after : dernier numéro reçu."""
+    return get_events().subscribe(session_id, after)
+
+
+def _publish(session_id: str, event: str, data: Callable[[], dict], close: bool = False) -> None:
+    # data n'est évalué que si la session a un canal d'événements
+    events = get_events()
+    if events.watched(session_id):
+        events.publish(session_id, event, data(), close)
+
+
+def _on_evicted(session_id: str, meta: dict | None) -> None:
+    _publish(session_id, "session_expired", dict, close=True)
+
+
+def recover() -> int:
+    """Recharge les sessions du journal (SESSION_JOURNAL_DIR) au démarrage ; renvoie leur nombre."""
+    return get_backend().recover()
 
-_lock = Lock()
 
-_meta: dict[str, dict] = {}
-_answers: dict[str, dict] = {}
-_profiles: dict[str, dict] = {}
-_generated_formulas: dict[str, list] = {}
-_selected_formula: dict[str, dict] = {}
-_index: set[str] = set()
+def close() -> None:
+    """À l'arrêt : vide et compacte le journal."""
+    get_backend().close()
 
 
-REQUIRED_PROFILE_FIELDS = {"first_name", "gender", "age", "has_allergies"}
+def sweep() -> list[str]:
+    """Évince les sessions inactives depuis SESSION_TTL ; renvoie leurs identifiants."""
+    evicted = get_backend().sweep()
+    ttl = get_settings().session_ttl
+    if ttl > 0:
+        get_events().prune(ttl)
+    return evicted
+
+
+def add_eviction_hook(hook: Callable[[str, dict | None], None]) -> None:
+    """hook(session_id, meta) après chaque éviction (expiration ou plafond), hors verrou."""
+    get_backend().add_eviction_hook(hook)
+
+
+def stats() -> dict:
+    """Sessions suivies, compteurs d'évictions par motif (ttl, capacity) et des événements publiés."""
+    return {**get_backend().stats(), "events": get_events().stats()}
 
 
 def save_session_meta(
@@ -20,7 +147,7 @@ def save_session_meta(
     voice_gender: str,
     voice_id: str,
     room_name: str,
-    questions: list,
+    question_set: str,
     mode: str = "guided",
     input_mode: str = "voice",
     customer_email: str | None = None,
@@ -31,7 +158,7 @@ def save_session_meta(
         "voice_gender": voice_gender,
         "voice_id": voice_id,
         "room_name": room_name,
-        "questions": questions,
+        "question_set": question_set,
         "mode": mode,
         "input_mode": input_mode,
         "avatar": avatar,
@@ -39,19 +166,15 @@ def save_session_meta(
     }
     if customer_email:
         mapping["customer_email"] = customer_email
-    with _lock:
-        _meta[session_id] = mapping
-        _index.add(session_id)
+    get_backend().save_session_meta(session_id, mapping)
 
 
 def get_session_meta(session_id: str) -> dict | None:
-    with _lock:
-        return dict(_meta[session_id]) if session_id in _meta else None
+    return get_backend().get_session_meta(session_id)
 
 
 def list_session_ids() -> list[str]:
-    with _lock:
-        return list(_index)
+    return get_backend().list_session_ids()
 
 
 def save_answer(
@@ -61,58 +184,90 @@ def save_answer(
     top_2: list[str],
     bottom_2: list[str],
 ) -> None:
-    with _lock:
-        if session_id not in _answers:
-            _answers[session_id] = {}
-        _answers[session_id][str(question_id)] = {
-            "question": question_text,
-            "top_2": top_2,
-            "bottom_2": bottom_2,
-            "answered_at": datetime.now(timezone.utc).isoformat(),
-        }
+    answer = {
+        "question": question_text,
+        "top_2": top_2,
+        "bottom_2": bottom_2,
+        "answered_at": datetime.now(timezone.utc).isoformat(),
+    }
+    get_backend().save_answer(session_id, question_id, answer)
+    _publish(session_id, "answer_saved", lambda: {"question_id": question_id, "answer": answer})
 
 
 def get_session_answers(session_id: str) -> dict | None:
-    with _lock:
-        if session_id not in _meta:
-            return None
-        return {
-            "session_id": session_id,
-            **_meta[session_id],
-            "answers": dict(_answers.get(session_id, {})),
-        }
+    return get_backend().get_session_answers(session_id)
+
+
+def get_snapshot(session_id: str) -> SessionRecord:
+    """Métadonnées, profil, réponses et formules d'une session en une seule lecture.
+
+    Pour les routes qui ont besoin de plusieurs de ces éléments : une prise de
+    verrou (un aller-retour Redis) au lieu d'une par accesseur. En mémoire,
+    l'enregistrement courant est renvoyé tel quel (immuable, partagé).
+    """
+    return get_backend().get_snapshot(session_id)
+
+
+def get_session_version(session_id: str) -> int | None:
+    """Version de la session, incrémentée à chaque écriture (ETag) ; None si inconnue."""
+    return get_backend().get_session_version(session_id)
+
+
+def fold_answer_scores(
+    session_id: str,
+    question_id: int,
+    matrix: ScoringMatrix,
+    rows: list[int],
+    weights: list[float],
+) -> None:
+    """Intègre la contribution d'une réponse aux scores cumulés de la session.
+
+    Une nouvelle réponse à la même question remplace l'ancienne contribution.
+    Si la matrice a changé (nouvelle version du catalogue), l'accumulateur repart de zéro.
+    """
+    get_backend().fold_answer_scores(session_id, question_id, matrix, rows, weights)
+
+
+def reset_scores(session_id: str) -> None:
+    get_backend().reset_scores(session_id)
+
+
+def get_score_snapshot(session_id: str) -> dict | None:
+    """Copie cohérente des scores cumulés : version, questions couvertes, lignes/poids et scores par catégorie."""
+    return get_backend().get_score_snapshot(session_id)
+
+
+def get_note_scores(session_id: str) -> tuple[str, dict[str, dict[str, float]]] | None:
+    """Scores par catégorie déjà cumulés et leur version de catalogue, sans copier lignes ni poids."""
+    return get_backend().get_note_scores(session_id)
+
+
+def _profile_update(session_id: str, field: str, value: str) -> dict:
+    session = get_snapshot(session_id)
+    return {
+        "field": field,
+        "value": value,
+        "state": session.state,
+        "profile_complete": session.profile_complete,
+        "missing_fields": session.missing_profile_fields,
+    }
 
 
 def save_user_profile(session_id: str, field: str, value: str) -> None:
-    with _lock:
-        if session_id not in _profiles:
-            _profiles[session_id] = {}
-        _profiles[session_id][field] = value
+    get_backend().save_user_profile(session_id, field, value)
+    _publish(session_id, "profile_update", lambda: _profile_update(session_id, field, value))
 
 
 def get_user_profile(session_id: str) -> dict | None:
-    with _lock:
-        profile = _profiles.get(session_id)
-        return dict(profile) if profile else None
+    return get_backend().get_user_profile(session_id)
 
 
 def is_profile_complete(session_id: str) -> bool:
-    with _lock:
-        profile = _profiles.get(session_id, {})
-        if not REQUIRED_PROFILE_FIELDS.issubset(profile.keys()):
-            return False
-        if profile.get("has_allergies", "").lower() in ("oui", "yes") and "allergies" not in profile:
-            return False
-        return True
+    return not missing_profile_fields(get_user_profile(session_id) or {})
 
 
 def get_missing_profile_fields(session_id: str) -> list[str]:
-    with _lock:
-        profile = _profiles.get(session_id, {})
-        missing = list(REQUIRED_PROFILE_FIELDS - profile.keys())
-        if profile.get("has_allergies", "").lower() in ("oui", "yes") and "allergies" not in profile:
-            missing.append("allergies")
-        return missing
+    return missing_profile_fields(get_user_profile(session_id) or {})
 
 
 def get_session_state(session_id: str) -> str:
@@ -121,41 +276,85 @@ def get_session_state(session_id: str) -> str:
     return "collecting_profile"
 
 
-def save_selected_formula(session_id: str, formula_data: dict) -> None:
-    with _lock:
-        _selected_formula[session_id] = formula_data
+def save_selected_formula(session_id: str, formula: Formula) -> None:
+    get_backend().save_selected_formula(session_id, formula)
+    _publish(session_id, "formula_selected", lambda: {"formula": formula.to_dict("compact"), "mail_available": True})
 
 
-def get_selected_formula(session_id: str) -> dict | None:
-    with _lock:
-        data = _selected_formula.get(session_id)
-        return dict(data) if data else None
+def get_selected_formula(session_id: str) -> Formula | None:
+    return get_backend().get_selected_formula(session_id)
 
 
-def save_generated_formulas(session_id: str, formulas: list[dict]) -> None:
-    with _lock:
-        _generated_formulas[session_id] = formulas
+def save_generated_formulas(session_id: str, formulas: list[Formula]) -> None:
+    get_backend().save_generated_formulas(session_id, formulas)
+    _publish(session_id, "formulas_generated", lambda: {"formulas": [f.to_dict("compact") for f in formulas]})
 
 
-def get_generated_formulas(session_id: str) -> list[dict] | None:
-    with _lock:
-        data = _generated_formulas.get(session_id)
-        return list(data) if data is not None else None
+def get_generated_formulas(session_id: str) -> tuple[Formula, ...] | None:
+    return get_backend().get_generated_formulas(session_id)
 
 
 def get_all_sessions() -> list[dict]:
-    with _lock:
-        ids = list(_index)
-    return [d for sid in ids if (d := get_session_answers(sid))]
+    return get_backend().get_all_sessions()
+
+
+def encode_cursor(cursor: SessionCursor | None) -> str | None:
+    return f"{cursor[0]!r}:{cursor[1]}" if cursor is not None else None
+
+
+def decode_cursor(cursor: str) -> SessionCursor:
+    """Inverse d'encode_cursor ; ValueError si le curseur est illisible."""
+    created, sep, session_id = cursor.partition(":")
+    if not sep or not session_id:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return float(created), session_id
+
+
+def _timestamp(value: datetime | None) -> float | None:
+    if value is None:
+        return None
+    # Date sans fuseau : UTC, comme created_at
+    return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+
+
+def list_sessions(
+    limit: int = 100,
+    cursor: str | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    language: str | None = None,
+    mode: str | None = None,
+    questions: bool = False,
+) -> tuple[list[dict], str | None]:
+    """Page de sessions (forme de get_session_answers) par date de création croissante.
+
+    Lue depuis l'index par created_at du backend, sans parcourir les autres
+    sessions. questions=True développe la liste des questions (question_set) ;
+    sinon, seule la clé du jeu est renvoyée.
+    Renvoie la page et le curseur de la suivante (None : dernière page) ;
+    ValueError si cursor est illisible.
+    """
+    filters = SessionFilter(_timestamp(created_after), _timestamp(created_before), language, mode)
+    decoded = decode_cursor(cursor) if cursor else None
+    sessions, next_cursor = get_backend().list_sessions(limit, decoded, filters)
+    if questions:
+        sessions = [with_questions(session) for session in sessions]
+    else:
+        # Sessions antérieures aux jeux partagés : liste complète retirée
+        sessions = [{k: v for k, v in session.items() if k != "questions"} for session in sessions]
+    return sessions, encode_cursor(next_cursor)
+
+
+def iter_sessions(page_size: int = 200, cursor: str | None = None, **filters) -> Iterator[dict]:
+    """Toutes les sessions qui passent les filtres (voir list_sessions), lues page par page."""
+    while True:
+        sessions, cursor = list_sessions(page_size, cursor, **filters)
+        yield from sessions
+        if cursor is None:
+            return
 
 
 def delete_session(session_id: str) -> bool:
-    with _lock:
-        existed = session_id in _meta
-        _meta.pop(session_id, None)
-        _answers.pop(session_id, None)
-        _profiles.pop(session_id, None)
-        _generated_formulas.pop(session_id, None)
-        _selected_formula.pop(session_id, None)
-        _index.discard(session_id)
-        return existed
+    deleted = get_backend().delete_session(session_id)
+    _publish(session_id, "session_deleted", dict, close=True)
+    return deleted
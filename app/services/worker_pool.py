@@ -0,0 +1,240 @@
+"""Pool d'exécution des traitements CPU (formules, PDF) hors de la boucle asyncio.
+
+Les routes async soumettent leur travail avec `await worker_pool.run(fn, …)` :
+la boucle d'événements reste libre pour les démarrages de session LiveKit,
+les pings et les autres requêtes pendant que les formules sont générées.
+
+  - run(fn, …)          : pool de threads. Pour le travail qui lit l'état en
+                          mémoire du process (session store, cache de formules).
+  - run_portable(fn, …) : pool de processus si WORKER_POOL_KIND=process, sinon
+                          threads. Réservé aux fonctions pures dont arguments et
+                          résultat sont picklables (rendu PDF, génération stateless).
+
+WORKER_POOL_KIND=inline exécute tout directement sur la boucle (débogage,
+point de comparaison du test de charge).
+
+Les envois SMTP, qui attendent le réseau, n'y passent pas (asyncio.to_thread) :
+le pool est dimensionné pour le CPU. Avec des threads, chaque worker actif
+dispute le GIL à la boucle : au-delà d'un worker par CPU, la latence de la
+boucle augmente sans gain de débit (voir benchmarks/worker_pool_load.py).
+
+La file est bornée : au-delà de WORKER_POOL_SIZE tâches en cours plus
+WORKER_QUEUE_SIZE tâches en attente, la soumission échoue immédiatement
+(WorkerPoolSaturated, convertie en 503 par l'application). Les métriques
+(GET /api/diagnostics/workers) donnent la profondeur de file, les tâches en
+cours, l'attente avant exécution et la durée d'exécution (p50 / p99 / max).
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable
+
+from app.config import get_settings
+from app.services import catalog_service
+
+logger = logging.getLogger("lylo.workers")
+
+POOL_KINDS = ("thread", "process", "inline")
+
+# Fenêtre glissante des mesures d'attente / d'exécution
+_SAMPLE_WINDOW = 2048
+_MAX_DEFAULT_WORKERS = 4
+
+
+class WorkerPoolSaturated(Exception):
+    """File d'attente pleine : la requête doit être réessayée plus tard."""
+
+
+def _timed_call(fn: Callable, args: tuple, kwargs: dict, catalog_version: str | None = None) -> tuple[float, float, Any]:
+    """Exécute fn dans le worker : (début, fin, résultat) en temps monotone.
+
+    Dans un processus worker, le catalogue est rechargé si le process parent
+    en a publié une nouvelle version depuis le dernier appel.
+    """
+    started = time.monotonic()
+    if catalog_version is not None and catalog_service.current().version != catalog_version:
+        catalog_service.load_catalog()
+    result = fn(*args, **kwargs)
+    return started, time.monotonic(), result
+
+
+def _init_process() -> None:
+    # Catalogue chargé au démarrage du worker plutôt qu'à sa première tâche
+    catalog_service.load_catalog()
+
+
+def _percentiles(samples: deque) -> dict:
+    if not samples:
+        return {"p50_ms": None, "p99_ms": None, "max_ms": None}
+    ordered = sorted(samples)
+    last = len(ordered) - 1
+    return {
+        "p50_ms": round(ordered[round(0.50 * last)] * 1000, 2),
+        "p99_ms": round(ordered[round(0.99 * last)] * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+class _Lane:
+    """Un exécuteur et ses compteurs. Les compteurs ne sont modifiés que depuis la boucle."""
+
+    __slots__ = ("name", "executor", "workers", "queue_size", "pending", "submitted", "completed", "failed", "rejected", "waits", "runs")
+
+    def __init__(self, name: str, executor: Executor | None, workers: int, queue_size: int):
+        self.name = name
+        self.executor = executor
+        self.workers = workers
+        self.queue_size = queue_size
+        self.pending = 0  # soumises et non terminées (en cours + en file)
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.waits: deque[float] = deque(maxlen=_SAMPLE_WINDOW)
+        self.runs: deque[float] = deque(maxlen=_SAMPLE_WINDOW)
+
+    async def submit(self, fn: Callable, args: tuple, kwargs: dict, catalog_version: str | None = None) -> Any:
+        if self.pending >= self.workers + self.queue_size:
+            self.rejected += 1
+            raise WorkerPoolSaturated(
+                f"Serveur occupé : {self.pending} traitements {self.name} en cours ou en attente"
+            )
+
+        self.pending += 1
+        self.submitted += 1
+        submitted_at = time.monotonic()
+        try:
+            if self.executor is None:
+                started, finished, result = _timed_call(fn, args, kwargs)
+            else:
+                job = functools.partial(_timed_call, fn, args, kwargs, catalog_version)
+                if isinstance(self.executor, ThreadPoolExecutor):
+                    # Comme asyncio.to_thread : le contexte (snapshot catalogue épinglé…) suit la tâche
+                    job = functools.partial(contextvars.copy_context().run, job)
+                started, finished, result = await asyncio.get_running_loop().run_in_executor(self.executor, job)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+
+        self.completed += 1
+        self.waits.append(max(0.0, started - submitted_at))
+        self.runs.append(finished - started)
+        return result
+
+    def stats(self) -> dict:
+        running = min(self.pending, self.workers)
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "running": running,
+            "queued": self.pending - running,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "wait": _percentiles(self.waits),
+            "run": _percentiles(self.runs),
+        }
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class WorkerPool:
+    def __init__(self, kind: str, workers: int, queue_size: int):
+        if kind not in POOL_KINDS:
+            raise ValueError(f"WORKER_POOL_KIND doit valoir {', '.join(POOL_KINDS)} (reçu : {kind!r})")
+        workers = max(1, workers)
+        self.kind = kind
+
+        if kind == "inline":
+            self.threads = _Lane("thread", None, workers, queue_size)
+            self.processes = self.threads
+            return
+
+        self.threads = _Lane(
+            "thread",
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lylo-worker"),
+            workers,
+            queue_size,
+        )
+        if kind == "process":
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_process,
+            )
+            self.processes = _Lane("process", executor, workers, queue_size)
+        else:
+            self.processes = self.threads
+
+    def stats(self) -> dict:
+        lanes = {"thread": self.threads.stats()}
+        if self.processes is not self.threads:
+            lanes["process"] = self.processes.stats()
+        return {"kind": self.kind, "lanes": lanes}
+
+    def shutdown(self) -> None:
+        self.threads.shutdown()
+        if self.processes is not self.threads:
+            self.processes.shutdown()
+
+
+_pool: WorkerPool | None = None
+
+
+def start(kind: str | None = None, workers: int | None = None, queue_size: int | None = None) -> WorkerPool:
+    """Crée le pool (paramètres par défaut : WORKER_POOL_KIND / _SIZE, WORKER_QUEUE_SIZE)."""
+    global _pool
+    settings = get_settings()
+    workers = workers if workers is not None else settings.worker_pool_size
+    if workers <= 0:
+        workers = min(_MAX_DEFAULT_WORKERS, os.cpu_count() or 1)
+    pool = WorkerPool(
+        kind or settings.worker_pool_kind,
+        workers,
+        queue_size if queue_size is not None else settings.worker_queue_size,
+    )
+    previous, _pool = _pool, pool
+    if previous is not None:
+        previous.shutdown()
+    logger.info(f"Pool {pool.kind} démarré : {pool.threads.workers} workers, file de {pool.threads.queue_size}")
+    return pool
+
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+
+def _current() -> WorkerPool:
+    return _pool or start()
+
+
+async def run(fn: Callable, *args, **kwargs) -> Any:
+    """Exécute fn dans le pool de threads (accès à l'état en mémoire du process)."""
+    return await _current().threads.submit(fn, args, kwargs)
+
+
+async def run_portable(fn: Callable, *args, **kwargs) -> Any:
+    """Exécute une fonction pure dans le pool de processus s'il est configuré."""
+    pool = _current()
+    if pool.processes is pool.threads:
+        return await pool.threads.submit(fn, args, kwargs)
+    return await pool.processes.submit(fn, args, kwargs, catalog_service.current().version)
+
+
+def stats() -> dict:
+    return _pool.stats() if _pool is not None else {"kind": None, "lanes": {}}
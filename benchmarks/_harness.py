@@ -0,0 +1,189 @@
+"""Outils communs des benchmarks : mesures, baselines et seuils de régression.
+
+Chaque benchmark fournit un dict {nom: (fonction, entrées, préparation)} ;
+le harness mesure pour chaque fonction :
+  - la latence par appel (p50 / p99 / moyenne, en µs) ;
+  - la mémoire via tracemalloc, sur une passe séparée : pic alloué pendant
+    l'appel et mémoire encore retenue après l'appel (en KiB), plus le nombre
+    de blocs retenus.
+
+CPython n'expose pas de compteur d'allocations par appel : le pic tracemalloc
+et les blocs retenus en tiennent lieu.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+
+# Métriques comparées à la baseline (le p99 est trop bruité pour servir de seuil)
+GATED_METRICS = ("p50_us", "peak_kib")
+
+Case = tuple[Callable[[Any], Any], list, Callable[[Any], Any] | None]
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, round(q * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def measure(
+    fn: Callable[[Any], Any],
+    inputs: list,
+    prepare: Callable[[Any], Any] | None = None,
+    warmup: int = 20,
+    memory_samples: int = 100,
+) -> dict:
+    """Mesure fn sur chaque entrée. prepare(x) construit l'argument hors chronométrage."""
+    args_of = prepare or (lambda x: x)
+
+    for x in inputs[:warmup]:
+        fn(args_of(x))
+
+    durations: list[float] = []
+    for x in inputs:
+        arg = args_of(x)
+        started = time.perf_counter_ns()
+        fn(arg)
+        durations.append((time.perf_counter_ns() - started) / 1000)
+    durations.sort()
+
+    peaks: list[int] = []
+    retained: list[int] = []
+    retained_blocks: list[int] = []
+    tracemalloc.start()
+    try:
+        for x in inputs[:memory_samples]:
+            arg = args_of(x)
+            tracemalloc.clear_traces()
+            tracemalloc.reset_peak()
+            result = fn(arg)
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            del result
+            peaks.append(peak)
+            retained.append(current)
+            retained_blocks.append(sum(stat.count for stat in snapshot.statistics("filename")))
+    finally:
+        tracemalloc.stop()
+    peaks.sort()
+    retained.sort()
+    retained_blocks.sort()
+
+    return {
+        "calls": len(durations),
+        "p50_us": round(_percentile(durations, 0.50), 2),
+        "p99_us": round(_percentile(durations, 0.99), 2),
+        "mean_us": round(sum(durations) / len(durations), 2) if durations else 0.0,
+        "peak_kib": round(_percentile(peaks, 0.50) / 1024, 2),
+        "retained_kib": round(_percentile(retained, 0.50) / 1024, 2),
+        "retained_blocks": int(_percentile(retained_blocks, 0.50)),
+    }
+
+
+def _environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "platform": platform.platform(terse=True),
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def load_baseline(path: Path) -> dict | None:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def save_baseline(path: Path, results: dict, params: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {"environment": _environment(), "params": params, "results": results}
+    path.write_text(json.dumps(payload, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+
+def check_regressions(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Liste des métriques qui dépassent la baseline de plus de threshold (0.25 = +25 %)."""
+    failures = []
+    for name, current in results.items():
+        reference = baseline.get("results", {}).get(name)
+        if not reference:
+            continue
+        for metric in GATED_METRICS:
+            before, after = reference.get(metric, 0), current.get(metric, 0)
+            if before > 0 and after > before * (1 + threshold):
+                failures.append(f"{name}.{metric}: {before} → {after} (+{(after / before - 1) * 100:.0f} %)")
+    return failures
+
+
+def print_table(results: dict, baseline: dict | None) -> None:
+    reference = (baseline or {}).get("results", {})
+    header = f"{'benchmark':<40} {'p50 µs':>10} {'p99 µs':>10} {'peak KiB':>10} {'ret. KiB':>10} {'blocks':>7}  {'Δ p50':>7}"
+    print(header)
+    print("─" * len(header))
+    for name, r in results.items():
+        delta = ""
+        before = reference.get(name, {}).get("p50_us")
+        if before:
+            delta = f"{(r['p50_us'] / before - 1) * 100:+.0f} %"
+        print(
+            f"{name:<40} {r['p50_us']:>10} {r['p99_us']:>10} {r['peak_kib']:>10} "
+            f"{r['retained_kib']:>10} {r['retained_blocks']:>7}  {delta:>7}"
+        )
+
+
+def run(name: str, build_cases: Callable[[argparse.Namespace], dict[str, Case]], default_n: int = 2000) -> int:
+    """Point d'entrée CLI commun : mesure, compare à la baseline, sauvegarde avec --save."""
+    parser = argparse.ArgumentParser(prog=f"python -m benchmarks.{name}")
+    parser.add_argument("-n", type=int, default=default_n, help="nombre d'entrées synthétiques par benchmark")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--threshold", type=float, default=0.30, help="régression tolérée (0.30 = +30 %%)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_DIR / f"{name}.json")
+    parser.add_argument("--save", action="store_true", help="enregistre les résultats comme nouvelle baseline")
+    parser.add_argument("--only", help="ne lance que les benchmarks dont le nom contient ce texte")
+    args = parser.parse_args()
+
+    cases = build_cases(args)
+    results = {}
+    for case_name, (fn, inputs, prepare) in cases.items():
+        if args.only and args.only not in case_name:
+            continue
+        results[case_name] = measure(fn, inputs, prepare)
+
+    baseline = load_baseline(args.baseline)
+    print_table(results, baseline)
+
+    if args.save:
+        save_baseline(args.baseline, results, {"n": args.n, "seed": args.seed})
+        print(f"\nBaseline enregistrée : {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print(f"\nAucune baseline ({args.baseline}) : lancer avec --save pour en créer une.")
+        return 0
+
+    if baseline.get("environment", {}).get("python") != platform.python_version():
+        print(f"\nAttention : baseline enregistrée avec Python {baseline['environment'].get('python')}.")
+
+    failures = check_regressions(results, baseline, args.threshold)
+    if failures:
+        print(f"\nRégressions au-delà de +{args.threshold * 100:.0f} % :")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+    print(f"\nOK : aucune régression au-delà de +{args.threshold * 100:.0f} %.")
+    return 0
+
+
+def main(name: str, build_cases: Callable[[argparse.Namespace], dict[str, Case]], default_n: int = 2000) -> None:
+    sys.exit(run(name, build_cases, default_n))
@@ -0,0 +1,150 @@
+"""Benchmark du moteur de formules.
+
+Jeux de réponses synthétiques sur les 12 questions (QUESTIONS_FR et
+QUESTIONS_EN), avec et sans allergies. Mesure _score_notes,
+_select_notes_by_score, _build_formula, _build_formulas (paire par défaut et
+4 alternatives avec recouvrement), la sérialisation Formula.to_dict,
+generate_formulas_stateless (cache vidé / cache chaud) et replace_note.
+
+    python -m benchmarks.formula_engine            # compare à la baseline
+    python -m benchmarks.formula_engine --save     # enregistre une nouvelle baseline
+    python -m benchmarks.formula_engine --threshold 0.2 --only build
+"""
+
+import random
+from typing import Callable
+
+from app.data.questions import QUESTIONS_EN, QUESTIONS_FR
+from app.services import catalog_service, formula_service, session_store
+from app.services.formula_search import DiversityOptions
+from benchmarks._harness import main
+
+_ALLERGIES = [
+    "linalool",
+    "coumarine, eugénol",
+    "salicylate de benzyle",
+    "limonene; citral",
+    "mousse de chêne",
+]
+
+_SESSION_ID = "bench-replace-note"
+
+
+def synthetic_answers(rng: random.Random, language: str) -> dict:
+    """Réponses aux 12 questions : 2 choix préférés, 2 moins aimés, casse variable."""
+    pool = QUESTIONS_FR if language == "fr" else QUESTIONS_EN
+    answers = {}
+    for question in pool:
+        choices = rng.sample(question["choices"], 4)
+        if rng.random() < 0.2:
+            choices = [c.lower() for c in choices]
+        answers[str(question["id"])] = {
+            "question": question["question"],
+            "top_2": choices[:2],
+            "bottom_2": choices[2:],
+        }
+    return answers
+
+
+def synthetic_items(n: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    items = []
+    for i in range(n):
+        language = "fr" if i % 2 == 0 else "en"
+        allergies = rng.choice(_ALLERGIES) if i % 4 >= 2 else ""
+        items.append({
+            "answers": synthetic_answers(rng, language),
+            "language": language,
+            "has_allergies": "oui" if allergies else "non",
+            "user_allergens_raw": allergies,
+        })
+    return items
+
+
+def _replace_note_inputs(items: list[dict], seed: int) -> tuple[list, Callable]:
+    """Session en mémoire + formule sélectionnée, remise à neuf avant chaque appel."""
+    rng = random.Random(seed)
+    session_store.save_session_meta(_SESSION_ID, "fr", "female", "", "", "fr:12")
+    base = formula_service.generate_formulas_stateless(**items[0])["formulas"][0]
+    index = catalog_service.get_catalog_index()
+
+    inputs = []
+    for _ in range(len(items)):
+        note_type = rng.choice(("top", "heart", "base"))
+        current = [note.display_name("fr") for note in base.notes(f"{note_type}_notes")]
+        old_note = rng.choice(current)
+        candidates = [
+            ing.display_name("fr") for ing in index.by_category[note_type]
+            if ing.display_name("fr") not in current
+        ]
+        inputs.append((note_type, old_note, rng.choice(candidates)))
+
+    def prepare(args: tuple) -> tuple:
+        session_store.save_selected_formula(_SESSION_ID, base)
+        return args
+
+    return inputs, prepare
+
+
+def build_cases(args) -> dict:
+    catalog_service.load_catalog()
+    items = synthetic_items(args.n, args.seed)
+    scored = [
+        (
+            formula_service._score_notes(item["answers"]),
+            formula_service._resolve_allergies(item["has_allergies"], item["user_allergens_raw"])[0],
+            item["language"],
+        )
+        for item in items
+    ]
+    built = [formula_service._build_formula(s[0], s[1], set(), s[2]) for s in scored]
+    replace_inputs, replace_prepare = _replace_note_inputs(items, args.seed)
+
+    def cold(item: dict) -> dict:
+        formula_service._formula_cache.clear()
+        return item
+
+    return {
+        "score_notes": (lambda item: formula_service._score_notes(item["answers"]), items, None),
+        "select_notes_by_score": (
+            lambda s: formula_service._select_notes_by_score(s[0], max_per_cat=3, blocked_names=s[1]),
+            scored,
+            None,
+        ),
+        "build_formula": (
+            lambda s: formula_service._build_formula(s[0], s[1], set(), s[2]),
+            scored,
+            None,
+        ),
+        "build_formulas[count=2]": (
+            lambda s: formula_service._build_formulas(s[0], s[1], s[2]),
+            scored,
+            None,
+        ),
+        "build_formulas[count=4,overlap=2]": (
+            lambda s: formula_service._build_formulas(s[0], s[1], s[2], options=DiversityOptions(count=4, max_overlap=2)),
+            scored,
+            None,
+        ),
+        "formula_to_dict": (lambda formula: formula.to_dict(), built, None),
+        "generate_formulas_stateless[cold]": (
+            lambda item: formula_service.generate_formulas_stateless(**item),
+            items,
+            cold,
+        ),
+        # 200 jeux de réponses répétés : hors premier passage, uniquement des hits
+        "generate_formulas_stateless[cached]": (
+            lambda item: formula_service.generate_formulas_stateless(**item),
+            items[:200] * 10,
+            None,
+        ),
+        "replace_note": (
+            lambda a: formula_service.replace_note(_SESSION_ID, *a),
+            replace_inputs,
+            replace_prepare,
+        ),
+    }
+
+
+if __name__ == "__main__":
+    main("formula_engine", build_cases)
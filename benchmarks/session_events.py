@@ -0,0 +1,178 @@
+"""Benchmark des événements de session (session_events, GET /session/{id}/events).
+
+  - coût d'écriture : latence de save_user_profile / save_answer sans abonné
+    (aucun encodage), puis avec 1 et --subscribers abonnés sur une boucle
+    asyncio d'un autre thread ;
+  - délai de livraison : de la publication à la réception par chaque abonné,
+    pour des écritures espacées de 1 ms ;
+  - contre-pression : un abonné lent (file de 64 événements) pendant que
+    --burst écritures s'enchaînent. L'écrivain ne doit jamais l'attendre, et
+    l'abonné doit recevoir une suite de numéros sans trou ni doublon, ou un
+    "reset" si son retard dépasse l'historique.
+
+    python -m benchmarks.session_events
+    python -m benchmarks.session_events --subscribers 64 --burst 20000
+
+Le test échoue si un abonné reçoit un numéro en double ou manque un événement
+sans "reset".
+"""
+
+import argparse
+import asyncio
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from app.data.questions import question_set_key
+from app.services import session_store
+from app.services.session_backends import MemorySessionBackend
+from app.services.session_events import RESET, SessionEventBus
+from benchmarks._harness import measure
+
+_SESSION = "bench-events"
+
+
+class _Loop:
+    """Boucle asyncio dans un thread, comme celle d'uvicorn face aux workers."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+async def _consume(subscription, received: list, delay: float = 0.0, until: int | None = None) -> None:
+    while True:
+        event = await subscription.get()
+        if event is None:
+            return
+        received.append((event.seq, event.event, time.perf_counter_ns()))
+        if until is not None and event.seq >= until:
+            return
+        if delay:
+            await asyncio.sleep(delay)
+
+
+async def _subscribe():
+    return session_store.subscribe(_SESSION)
+
+
+@contextmanager
+def _subscribers(loop: _Loop, count: int, queue_size: int = 64):
+    """count abonnés à la session de test sur un bus neuf ; renvoie leurs boîtes de réception."""
+    session_store._events = SessionEventBus(queue_size=queue_size)
+    subscriptions = [loop.run(_subscribe()) for _ in range(count)]
+    inboxes = [[] for _ in subscriptions]
+    consumers = [
+        asyncio.run_coroutine_threadsafe(_consume(sub, inbox), loop.loop)
+        for sub, inbox in zip(subscriptions, inboxes)
+    ]
+    try:
+        yield inboxes
+    finally:
+        for sub, consumer in zip(subscriptions, consumers):
+            sub.close()
+            loop.loop.call_soon_threadsafe(sub.queue.put_nowait, None)
+            consumer.result()
+
+
+def _write_cases(n: int) -> dict:
+    answer = (1, "bench", ["a", "b"], ["c", "d"])
+    return {
+        "save_user_profile": (lambda i: session_store.save_user_profile(_SESSION, "first_name", f"T{i}"), list(range(n)), None),
+        "save_answer": (lambda i: session_store.save_answer(_SESSION, *answer), list(range(n)), None),
+    }
+
+
+def _check_sequence(received: list) -> str | None:
+    """Numéros strictement croissants ; un saut n'est admis qu'après un reset."""
+    previous = None
+    for seq, event, _ in received:
+        if previous is not None and event != RESET:
+            if seq <= previous:
+                return f"numéro {seq} reçu après {previous}"
+            if seq != previous + 1:
+                return f"trou {previous} → {seq} sans reset"
+        previous = seq
+    return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.session_events")
+    parser.add_argument("-n", type=int, default=5000, help="écritures mesurées par opération")
+    parser.add_argument("--subscribers", type=int, default=16)
+    parser.add_argument("--deliveries", type=int, default=1000, help="écritures espacées pour le délai de livraison")
+    parser.add_argument("--burst", type=int, default=10000)
+    args = parser.parse_args()
+
+    session_store.configure(MemorySessionBackend())
+    session_store.save_session_meta(_SESSION, "fr", "female", "", "", question_set_key("fr", 12))
+    failures = []
+    loop = _Loop()
+
+    # ── Coût d'écriture ──
+    print(f"{'abonnés':<8} {'écriture':<18} {'p50 µs':>8} {'p99 µs':>8}")
+    for count in (0, 1, args.subscribers):
+        with _subscribers(loop, count, queue_size=args.n * 2 + 64):
+            for name, (fn, inputs, prepare) in _write_cases(args.n).items():
+                result = measure(fn, inputs, prepare, warmup=10, memory_samples=0)
+                print(f"{count:<8} {name:<18} {result['p50_us']:>8} {result['p99_us']:>8}")
+    print()
+
+    # ── Délai de livraison : écritures espacées de 1 ms ──
+    with _subscribers(loop, args.subscribers) as inboxes:
+        bus = session_store.get_events()
+        published = {}
+        for i in range(args.deliveries):
+            # Un seul écrivain : le numéro de l'événement est connu avant la publication
+            published[bus._channels[_SESSION].seq + 1] = time.perf_counter_ns()
+            session_store.save_user_profile(_SESSION, "first_name", f"T{i}")
+            time.sleep(0.001)
+        time.sleep(0.2)
+        delays = sorted((at - published[seq]) / 1000 for inbox in inboxes for seq, _, at in inbox)
+    print(
+        f"livraison ({args.subscribers} abonnés, {args.deliveries} écritures) : "
+        f"p50 {delays[len(delays) // 2]:.0f} µs, p99 {delays[round(0.99 * (len(delays) - 1))]:.0f} µs"
+    )
+    print()
+
+    # ── Contre-pression : abonné lent ──
+    bus = session_store._events = SessionEventBus()
+    subscription = loop.run(_subscribe())
+    received: list = []
+    consumer = asyncio.run_coroutine_threadsafe(
+        _consume(subscription, received, delay=0.0005, until=args.burst), loop.loop
+    )
+    worst = 0
+    for i in range(args.burst):
+        started = time.perf_counter_ns()
+        session_store.save_user_profile(_SESSION, "first_name", f"T{i}")
+        worst = max(worst, time.perf_counter_ns() - started)
+    consumer.result(timeout=120)
+    subscription.close()
+    stats = bus.stats()
+    resets = sum(1 for _, event, _ in received if event == RESET)
+    print(
+        f"abonné lent : {args.burst} écritures, écriture max {worst / 1000:.0f} µs, "
+        f"{len(received)} événements reçus, {stats['lagged']} débordement(s), {resets} reset(s)"
+    )
+    if (problem := _check_sequence(received)) is not None:
+        failures.append(f"abonné lent : {problem}")
+
+    loop.stop()
+    session_store.delete_session(_SESSION)
+    for failure in failures:
+        print(f"ÉCHEC {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""Benchmark du journal des sessions (backend mémoire, SESSION_JOURNAL_DIR).
+
+  - coût d'écriture : latence de save_answer / save_user_profile sans journal
+    et avec journal (ajout au tampon sous verrou, fsync groupés par le thread) ;
+  - redémarrage : temps de recover() pour --sessions sessions complètes
+    (profil, réponses, formules), depuis l'instantané compacté (arrêt propre)
+    et après un crash : dernier instantané écrit en tâche de fond (seuil
+    SESSION_JOURNAL_COMPACT_BYTES) plus les segments qui le suivent.
+
+    python -m benchmarks.session_journal
+    python -m benchmarks.session_journal --sessions 5000 --max-recover-ms 800
+
+Le test échoue si une relecture dépasse --max-recover-ms ou si une session
+rechargée diffère de l'originale (version, profil, réponses, formules).
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app.data.questions import question_set_key
+from app.services import catalog_service, formula_service, session_store
+from app.services.session_backends import MemorySessionBackend
+from app.services.session_journal import SessionJournal
+from benchmarks._harness import measure
+from benchmarks.formula_engine import synthetic_answers
+
+
+def _fill(count: int, seed: int) -> list[str]:
+    """Sessions complètes dans le backend installé ; formules générées pour une sur deux."""
+    rng = random.Random(seed)
+    ids = []
+    for i in range(count):
+        language = "fr" if i % 2 == 0 else "en"
+        session_id = f"bench-journal-{i}"
+        session_store.save_session_meta(session_id, language, "female", "", "", question_set_key(language, 12))
+        for field, value in (("first_name", "Test"), ("gender", "f"), ("age", "30"), ("has_allergies", "non")):
+            session_store.save_user_profile(session_id, field, value)
+        for qid, answer in synthetic_answers(rng, language).items():
+            session_store.save_answer(session_id, int(qid), answer["question"], answer["top_2"], answer["bottom_2"])
+        if i % 2 == 0:
+            formula_service.generate_formulas(session_id)
+            formula_service.select_formula(session_id, 0)
+        ids.append(session_id)
+    return ids
+
+
+def _state(backend: MemorySessionBackend, ids: list[str]) -> dict:
+    state = {}
+    for session_id in ids:
+        record = backend.get_snapshot(session_id)
+        state[session_id] = (
+            record.version,
+            record.meta,
+            record.profile,
+            record.answers,
+            record.selected_formula,
+            record.generated_formulas,
+        )
+    return state
+
+
+def _write_cases(ids: list[str], n: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    picks = [rng.choice(ids) for _ in range(n)]
+    answer = {"question": "bench", "top_2": ["a", "b"], "bottom_2": ["c", "d"]}
+    return {
+        "save_answer": (
+            lambda sid: session_store.save_answer(sid, 1, answer["question"], answer["top_2"], answer["bottom_2"]),
+            picks,
+            None,
+        ),
+        "save_user_profile": (lambda sid: session_store.save_user_profile(sid, "first_name", "Test"), picks, None),
+    }
+
+
+def _recover(directory: Path) -> tuple[MemorySessionBackend, float]:
+    backend = MemorySessionBackend(journal=SessionJournal(directory))
+    started = time.perf_counter()
+    backend.recover()
+    return backend, (time.perf_counter() - started) * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.session_journal")
+    parser.add_argument("--sessions", type=int, default=3000)
+    parser.add_argument("-n", type=int, default=5000, help="écritures mesurées par opération")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-recover-ms", type=float, default=1000)
+    args = parser.parse_args()
+
+    catalog_service.load_catalog()
+    failures = []
+
+    # ── Coût d'écriture ──
+    writes = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, journal in (("sans journal", None), ("avec journal", SessionJournal(tmp))):
+            backend = session_store.configure(MemorySessionBackend(journal=journal))
+            backend.recover()
+            ids = _fill(64, args.seed)
+            writes[label] = {
+                name: measure(fn, inputs, prepare, warmup=10, memory_samples=0)
+                for name, (fn, inputs, prepare) in _write_cases(ids, args.n, args.seed).items()
+            }
+            backend.close()
+            if journal is not None:
+                journal_stats = journal.stats()
+
+    print(f"{'écriture':<20} {'sans p50':>10} {'avec p50':>10} {'sans p99':>10} {'avec p99':>10}")
+    for name in writes["sans journal"]:
+        off, on = writes["sans journal"][name], writes["avec journal"][name]
+        print(f"{name:<20} {off['p50_us']:>10} {on['p50_us']:>10} {off['p99_us']:>10} {on['p99_us']:>10}")
+    print(
+        f"(µs par appel) journal : {journal_stats['entries']} entrées en {journal_stats['flushes']} fsync, "
+        f"dernier vidage {journal_stats['last_flush_ms']} ms"
+    )
+    print()
+
+    # ── Redémarrage ──
+    for label, compact in (("instantané", True), ("crash", False)):
+        with tempfile.TemporaryDirectory() as tmp:
+            journal = SessionJournal(tmp)
+            backend = session_store.configure(MemorySessionBackend(journal=journal))
+            backend.recover()
+            ids = _fill(args.sessions, args.seed)
+            expected = _state(backend, ids)
+            journal.close(compact=compact)
+            size_mb = sum(p.stat().st_size for p in Path(tmp).iterdir()) / 1e6
+
+            restored, elapsed_ms = _recover(Path(tmp))
+            restored.close()
+            mismatches = sum(1 for sid, value in _state(restored, ids).items() if value != expected[sid])
+            print(
+                f"recover ({label:<14}) : {len(ids)} sessions, {size_mb:.1f} Mo, "
+                f"{elapsed_ms:.0f} ms, {mismatches} différence(s)"
+            )
+            if mismatches:
+                failures.append(f"{label} : {mismatches} session(s) différente(s) après relecture")
+            if elapsed_ms > args.max_recover_ms:
+                failures.append(f"{label} : relecture en {elapsed_ms:.0f} ms > {args.max_recover_ms:.0f} ms")
+
+    for failure in failures:
+        print(f"ÉCHEC {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""Mémoire par session du store : liste de questions copiée vs jeu partagé.
+
+Avant : chaque session stockait dans ses métadonnées sa propre liste de
+questions enrichie (_enrich_questions à chaque démarrage). Après : la clé du
+jeu partagé (question_set, ex. "fr:12"), développée seulement à la demande.
+
+Pour chaque forme, --sessions sessions (métadonnées, profil, 12 réponses)
+sont créées dans un backend mémoire neuf ; tracemalloc donne la mémoire
+retenue par session. La taille JSON des métadonnées (clé Redis :meta, corps
+de GET /session/{id}) est donnée à titre indicatif.
+
+    python -m benchmarks.session_memory
+    python -m benchmarks.session_memory --sessions 5000
+"""
+
+import argparse
+import gc
+import json
+import random
+import sys
+import tracemalloc
+from datetime import datetime, timezone
+
+from app.data.questions import QUESTIONS_EN, QUESTIONS_FR, _enrich_questions, question_set_key
+from app.services.session_backends import MemorySessionBackend
+from benchmarks.formula_engine import synthetic_answers
+
+
+def _meta(language: str, interned: bool) -> dict:
+    meta = {
+        "language": language,
+        "voice_gender": "female",
+        "voice_id": "voice",
+        "room_name": "room",
+        "mode": "guided",
+        "input_mode": "voice",
+        "avatar": True,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    if interned:
+        meta["question_set"] = question_set_key(language, 12)
+    else:
+        meta["questions"] = _enrich_questions(QUESTIONS_FR if language == "fr" else QUESTIONS_EN)
+    return meta
+
+
+def _fill(backend: MemorySessionBackend, count: int, interned: bool, seed: int) -> None:
+    rng = random.Random(seed)
+    for i in range(count):
+        language = "fr" if i % 2 == 0 else "en"
+        session_id = f"bench-memory-{i}"
+        backend.save_session_meta(session_id, _meta(language, interned))
+        for field, value in (("first_name", "Test"), ("gender", "f"), ("age", "30"), ("has_allergies", "non")):
+            backend.save_user_profile(session_id, field, value)
+        for qid, answer in synthetic_answers(rng, language).items():
+            backend.save_answer(session_id, int(qid), {
+                "question": answer["question"],
+                "top_2": answer["top_2"],
+                "bottom_2": answer["bottom_2"],
+                "answered_at": datetime.now(timezone.utc).isoformat(),
+            })
+
+
+def measure_form(count: int, interned: bool, seed: int) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    backend = MemorySessionBackend()
+    before = tracemalloc.get_traced_memory()[0]
+    _fill(backend, count, interned, seed)
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    meta = backend.get_session_meta("bench-memory-0")
+    return {
+        "form": "question_set" if interned else "questions",
+        "bytes_per_session": round(retained / count),
+        "meta_json_bytes": len(json.dumps(meta, ensure_ascii=False).encode("utf-8")),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.session_memory")
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rows = [measure_form(args.sessions, interned, args.seed) for interned in (False, True)]
+    header = f"{'métadonnées':<14} {'octets/session':>15} {'JSON meta':>10}"
+    print(header)
+    print("─" * len(header))
+    for r in rows:
+        print(f"{r['form']:<14} {r['bytes_per_session']:>15} {r['meta_json_bytes']:>10}")
+    print(f"gain : {1 - rows[1]['bytes_per_session'] / rows[0]['bytes_per_session']:.0%} par session ({args.sessions} sessions)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""Benchmark du session store : latence par appel selon le backend.
+
+Les mêmes opérations (écriture de réponse et de profil, lecture des réponses,
+scores cumulés, formule sélectionnée, liste des sessions) sont mesurées sur
+chaque backend demandé. Avec redis, chaque appel paie au moins un aller-retour
+réseau : le tableau donne l'ordre de grandeur par rapport au backend mémoire.
+
+    python -m benchmarks.session_store                                   # memory + redis (REDIS_URL)
+    python -m benchmarks.session_store --backends redis --redis-url redis://cache:6379/1
+
+Les sessions créées (bench-store-*) sont supprimées à la fin.
+"""
+
+import argparse
+import random
+import sys
+
+from app.config import get_settings
+from app.data.questions import question_set_key
+from app.services import catalog_service, formula_service, session_store
+from app.services.session_backends import BACKEND_KINDS, RedisSessionBackend, create_backend
+from benchmarks._harness import measure
+from benchmarks.formula_engine import synthetic_answers
+
+
+def _prepare_sessions(count: int, seed: int) -> list[tuple[str, dict]]:
+    """Sessions complètes (profil, réponses, scores, formules) dans le backend installé."""
+    rng = random.Random(seed)
+    sessions = []
+    for i in range(count):
+        language = "fr" if i % 2 == 0 else "en"
+        session_id = f"bench-store-{i}"
+        session_store.save_session_meta(session_id, language, "female", "", "", question_set_key(language, 12))
+        for field, value in (("first_name", "Test"), ("gender", "f"), ("age", "30"), ("has_allergies", "non")):
+            session_store.save_user_profile(session_id, field, value)
+        answers = synthetic_answers(rng, language)
+        for qid, answer in answers.items():
+            session_store.save_answer(session_id, int(qid), answer["question"], answer["top_2"], answer["bottom_2"])
+            formula_service.record_answer_scores(session_id, int(qid), answer["top_2"], answer["bottom_2"])
+        formula_service.generate_formulas(session_id)
+        formula_service.select_formula(session_id, 0)
+        sessions.append((session_id, answers))
+    return sessions
+
+
+def _cases(sessions: list[tuple[str, dict]], n: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    matrix = formula_service._get_scoring_matrix()
+    picks = [rng.choice(sessions) for _ in range(n)]
+    answer_inputs = []
+    for session_id, answers in picks:
+        qid = rng.choice(list(answers))
+        answer_inputs.append((session_id, int(qid), answers[qid]))
+    fold_inputs = [
+        (session_id, qid, *formula_service._collect_score_rows({str(qid): answer}, matrix))
+        for session_id, qid, answer in answer_inputs
+    ]
+    formula = session_store.get_selected_formula(sessions[0][0])
+    ids = [session_id for session_id, _ in picks]
+
+    return {
+        "save_answer": (
+            lambda a: session_store.save_answer(a[0], a[1], a[2]["question"], a[2]["top_2"], a[2]["bottom_2"]),
+            answer_inputs,
+            None,
+        ),
+        "get_session_answers": (session_store.get_session_answers, ids, None),
+        "save_user_profile": (lambda sid: session_store.save_user_profile(sid, "first_name", "Test"), ids, None),
+        "is_profile_complete": (session_store.is_profile_complete, ids, None),
+        "fold_answer_scores": (lambda a: session_store.fold_answer_scores(a[0], a[1], matrix, a[2], a[3]), fold_inputs, None),
+        "get_score_snapshot": (session_store.get_score_snapshot, ids, None),
+        "save_selected_formula": (lambda sid: session_store.save_selected_formula(sid, formula), ids, None),
+        "get_selected_formula": (session_store.get_selected_formula, ids, None),
+        # Une lecture de toutes les sessions par appel : moins d'entrées
+        "get_all_sessions": (lambda _: session_store.get_all_sessions(), ids[: max(1, n // 20)], None),
+    }
+
+
+def run_backend(kind: str, args: argparse.Namespace) -> dict | None:
+    try:
+        backend = create_backend(kind, args.redis_url, get_settings().session_ttl)
+        if isinstance(backend, RedisSessionBackend):
+            backend._redis.ping()
+    except Exception as e:
+        print(f"{kind} : ignoré ({e})")
+        return None
+
+    session_store.configure(backend)
+    sessions = _prepare_sessions(args.sessions, args.seed)
+    try:
+        return {
+            name: measure(fn, inputs, prepare, warmup=10, memory_samples=0)
+            for name, (fn, inputs, prepare) in _cases(sessions, args.n, args.seed).items()
+        }
+    finally:
+        for session_id, _ in sessions:
+            session_store.delete_session(session_id)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.session_store")
+    parser.add_argument("--backends", default=",".join(BACKEND_KINDS), help="backends à comparer (memory, redis)")
+    parser.add_argument("--redis-url", default=get_settings().redis_url)
+    parser.add_argument("-n", type=int, default=2000, help="appels par opération")
+    parser.add_argument("--sessions", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    catalog_service.load_catalog()
+    results = {}
+    for kind in args.backends.split(","):
+        measured = run_backend(kind.strip(), args)
+        if measured is not None:
+            results[kind.strip()] = measured
+    if not results:
+        return 1
+
+    kinds = list(results)
+    operations = list(next(iter(results.values())))
+    header = f"{'opération':<24}" + "".join(f" {kind + ' p50':>12} {kind + ' p99':>12}" for kind in kinds)
+    print(header)
+    print("─" * len(header))
+    for op in operations:
+        print(f"{op:<24}" + "".join(f" {results[k][op]['p50_us']:>12} {results[k][op]['p99_us']:>12}" for k in kinds))
+    print("(µs par appel)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""Test de contention du session store mémoire : verrou unique vs striping.
+
+Des threads (comme les workers du pool et les routes) enchaînent, sur des
+centaines de sessions, le mélange d'opérations d'un questionnaire : réponse
++ scores cumulés, lecture de l'état (/state), aperçu des scores, lecture des
+formules. Chaque configuration de `--stripes` est mesurée tour à tour ;
+`1` équivaut à l'ancien verrou global.
+
+    python -m benchmarks.session_store_contention
+    python -m benchmarks.session_store_contention --stripes 1,4,16,64 --threads 16 --sessions 500
+"""
+
+import argparse
+import random
+import sys
+import threading
+import time
+
+from app.services import catalog_service, formula_service, session_store
+from app.services.session_backends import MemorySessionBackend
+from benchmarks.formula_engine import synthetic_answers
+from benchmarks.worker_pool_load import _percentile
+
+
+def _prepare(sessions: int, seed: int) -> list[tuple[str, list]]:
+    """Sessions avec profil et formules ; renvoie les réponses à rejouer par session."""
+    rng = random.Random(seed)
+    matrix = formula_service._get_scoring_matrix()
+    prepared = []
+    for i in range(sessions):
+        language = "fr" if i % 2 == 0 else "en"
+        session_id = f"contention-{i}"
+        session_store.save_session_meta(session_id, language, "female", "", "", f"{language}:12")
+        for field, value in (("first_name", "Test"), ("gender", "f"), ("age", "30"), ("has_allergies", "non")):
+            session_store.save_user_profile(session_id, field, value)
+        replay = []
+        for qid, answer in synthetic_answers(rng, language).items():
+            rows, weights = formula_service._collect_score_rows({qid: answer}, matrix)
+            session_store.fold_answer_scores(session_id, int(qid), matrix, rows, weights)
+            replay.append((int(qid), answer, rows, weights))
+        formula_service.generate_formulas(session_id)
+        formula_service.select_formula(session_id, 0)
+        prepared.append((session_id, replay))
+    return prepared
+
+
+def _worker(prepared: list, operations: int, seed: int, latencies: list[float], start: threading.Event) -> None:
+    rng = random.Random(seed)
+    matrix = formula_service._get_scoring_matrix()
+    local = []
+    start.wait()
+    for _ in range(operations):
+        session_id, replay = rng.choice(prepared)
+        action = rng.random()
+        started = time.perf_counter()
+        if action < 0.3:
+            qid, answer, rows, weights = rng.choice(replay)
+            session_store.save_answer(session_id, qid, answer["question"], answer["top_2"], answer["bottom_2"])
+            session_store.fold_answer_scores(session_id, qid, matrix, rows, weights)
+        elif action < 0.6:
+            session = session_store.get_snapshot(session_id)
+            _ = (session.state, session.missing_profile_fields, session.selected_formula is not None)
+        elif action < 0.85:
+            session_store.get_score_snapshot(session_id)
+        else:
+            session_store.get_generated_formulas(session_id)
+            session_store.get_selected_formula(session_id)
+        local.append(time.perf_counter() - started)
+    latencies.extend(local)
+
+
+def run_contention(stripes: int, args: argparse.Namespace) -> dict:
+    session_store.configure(MemorySessionBackend(stripes=stripes))
+    prepared = _prepare(args.sessions, args.seed)
+
+    latencies: list[float] = []
+    start = threading.Event()
+    threads = [
+        threading.Thread(target=_worker, args=(prepared, args.operations, args.seed + i, latencies, start))
+        for i in range(args.threads)
+    ]
+    for thread in threads:
+        thread.start()
+    started = time.perf_counter()
+    start.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "stripes": stripes,
+        "ops": len(latencies),
+        "ops_s": round(len(latencies) / elapsed),
+        "p50_us": round(_percentile(latencies, 0.50) * 1e6, 1),
+        "p99_us": round(_percentile(latencies, 0.99) * 1e6, 1),
+        "max_us": round(max(latencies, default=0) * 1e6, 1),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.session_store_contention")
+    parser.add_argument("--stripes", default="1,16", help="nombres de parties à comparer (1 = verrou global)")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--operations", type=int, default=5000, help="opérations par thread")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    catalog_service.load_catalog()
+    sys.setswitchinterval(0.0005)  # bascules de threads fréquentes : la contention devient visible
+    rows = [run_contention(int(n), args) for n in args.stripes.split(",")]
+
+    header = f"{'stripes':>8} {'ops':>8} {'ops/s':>9} {'p50 µs':>9} {'p99 µs':>9} {'max µs':>10}"
+    print(header)
+    print("─" * len(header))
+    for r in rows:
+        print(f"{r['stripes']:>8} {r['ops']:>8} {r['ops_s']:>9} {r['p50_us']:>9} {r['p99_us']:>9} {r['max_us']:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
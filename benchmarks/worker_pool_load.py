@@ -0,0 +1,176 @@
+"""Test de charge : latence de la boucle asyncio pendant la génération de formules.
+
+L'application tourne en mémoire (httpx + ASGITransport, une seule boucle) ;
+des clients concurrents enchaînent generate-formulas, formula/pdf et
+/formulas/generate pendant qu'une sonde mesure :
+  - le retard de la boucle (réveil d'un asyncio.sleep de 2 ms) ;
+  - la latence d'une requête légère (GET /api/diagnostics/catalog).
+
+Chaque type de pool demandé est mesuré tour à tour ; `inline` (tout sur la
+boucle) sert de point de comparaison. Le test échoue si le p99 du retard de
+boucle dépasse --max-lag-ms avec un pool thread ou process.
+
+    python -m benchmarks.worker_pool_load
+    python -m benchmarks.worker_pool_load --kinds thread,process --clients 32 --requests 20
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+import httpx
+
+from app.core.app_factory import create_app
+from app.data.questions import question_set_key
+from app.services import catalog_service, formula_service, session_store, worker_pool
+from benchmarks.formula_engine import synthetic_answers
+
+_PROBE_SLEEP = 0.002
+_PROBE_INTERVAL = 0.01
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+
+def _prepare_sessions(count: int, seed: int) -> list[str]:
+    """Sessions complètes en mémoire, avec une formule sélectionnée (pour le PDF)."""
+    rng = random.Random(seed)
+    session_ids = []
+    for i in range(count):
+        language = "fr" if i % 2 == 0 else "en"
+        session_id = f"load-{seed}-{i}"
+        session_store.save_session_meta(session_id, language, "female", "", "", question_set_key(language, 12))
+        for field, value in (("first_name", "Test"), ("gender", "f"), ("age", "30"), ("has_allergies", "non"), ("allergies", "")):
+            session_store.save_user_profile(session_id, field, value)
+        for qid, answer in synthetic_answers(rng, language).items():
+            session_store.save_answer(session_id, int(qid), answer["question"], answer["top_2"], answer["bottom_2"])
+        formula_service.generate_formulas(session_id)
+        formula_service.select_formula(session_id, 0)
+        session_ids.append(session_id)
+    return session_ids
+
+
+def _stateless_body(rng: random.Random) -> dict:
+    language = rng.choice(("fr", "en"))
+    return {
+        "language": language,
+        "gender": "female",
+        "age": "30",
+        "has_allergies": "non",
+        "answers": [
+            {"question_id": int(qid), "question_text": a["question"], "top_2": a["top_2"], "bottom_2": a["bottom_2"]}
+            for qid, a in synthetic_answers(rng, language).items()
+        ],
+    }
+
+
+async def _client(http: httpx.AsyncClient, session_ids: list[str], requests: int, rng: random.Random, statuses: dict) -> None:
+    for _ in range(requests):
+        session_id = rng.choice(session_ids)
+        action = rng.random()
+        if action < 0.5:
+            formula_type = rng.choice(("frais", "mix", "puissant"))
+            response = await http.post(f"/api/session/{session_id}/generate-formulas", json={"formula_type": formula_type})
+        elif action < 0.8:
+            response = await http.post("/api/formulas/generate", json=_stateless_body(rng))
+        else:
+            response = await http.get(f"/api/session/{session_id}/formula/pdf")
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+
+async def _probe(http: httpx.AsyncClient, stop: asyncio.Event, lags: list[float], latencies: list[float]) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(_PROBE_SLEEP)
+        lags.append(time.perf_counter() - started - _PROBE_SLEEP)
+
+        started = time.perf_counter()
+        await http.get("/api/diagnostics/catalog")
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(_PROBE_INTERVAL)
+
+
+async def run_load(kind: str, args: argparse.Namespace, session_ids: list[str]) -> dict:
+    worker_pool.start(kind, args.workers, args.queue)
+    # Premier passage hors mesure : démarrage des workers (processus), imports reportlab
+    app = create_app()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load") as http:
+        await _client(http, session_ids, 3, random.Random(0), {})
+
+        stop = asyncio.Event()
+        lags: list[float] = []
+        latencies: list[float] = []
+        statuses: dict[int, int] = {}
+        probe = asyncio.create_task(_probe(http, stop, lags, latencies))
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            _client(http, session_ids, args.requests, random.Random(args.seed + i), statuses)
+            for i in range(args.clients)
+        ))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe
+
+    pool_stats = worker_pool.stats()
+    worker_pool.shutdown()
+    waits = [lane["wait"]["p99_ms"] or 0 for lane in pool_stats["lanes"].values()]
+    total = sum(statuses.values())
+    return {
+        "kind": kind,
+        "requests": total,
+        "req_s": round(total / elapsed, 1),
+        "errors": sum(n for code, n in statuses.items() if code >= 400),
+        "lag_p50_ms": round(_percentile(lags, 0.50) * 1000, 2),
+        "lag_p99_ms": round(_percentile(lags, 0.99) * 1000, 2),
+        "lag_max_ms": round(max(lags, default=0) * 1000, 2),
+        "probe_p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+        "probe_p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+        "pool_wait_p99_ms": max(waits, default=0),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.worker_pool_load")
+    parser.add_argument("--kinds", default="inline,thread", help="types de pool à comparer (inline, thread, process)")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=15, help="requêtes par client")
+    parser.add_argument("--sessions", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=0, help="0 = un worker par CPU (défaut du service)")
+    parser.add_argument("--queue", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-lag-ms", type=float, default=25.0, help="p99 maximal du retard de boucle avec un pool")
+    args = parser.parse_args()
+
+    catalog_service.load_catalog()
+    session_ids = _prepare_sessions(args.sessions, args.seed)
+
+    rows = []
+    for kind in args.kinds.split(","):
+        formula_service._formula_cache.clear()
+        rows.append(asyncio.run(run_load(kind.strip(), args, session_ids)))
+
+    header = f"{'pool':<8} {'req':>5} {'req/s':>7} {'err':>4} {'lag p50':>8} {'lag p99':>8} {'lag max':>8} {'probe p50':>10} {'probe p99':>10} {'wait p99':>9}"
+    print(header)
+    print("─" * len(header))
+    for r in rows:
+        print(
+            f"{r['kind']:<8} {r['requests']:>5} {r['req_s']:>7} {r['errors']:>4} {r['lag_p50_ms']:>8} {r['lag_p99_ms']:>8} "
+            f"{r['lag_max_ms']:>8} {r['probe_p50_ms']:>10} {r['probe_p99_ms']:>10} {r['pool_wait_p99_ms']:>9}"
+        )
+    print("(ms)")
+
+    failures = [r for r in rows if r["kind"] != "inline" and (r["lag_p99_ms"] > args.max_lag_ms or r["errors"])]
+    for r in failures:
+        print(f"\nÉchec {r['kind']} : retard de boucle p99 {r['lag_p99_ms']} ms (max {args.max_lag_ms}), {r['errors']} erreurs")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())